@@ -0,0 +1,34 @@
+"""Make custom command triggers unique per guild
+
+Revision ID: 3e9b7c5a2f61
+Revises: 7b2e5d91c4a3
+Create Date: 2026-10-19 21:03:44.108265
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e9b7c5a2f61'
+down_revision: Union[str, None] = '7b2e5d91c4a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only one command could ever run for a repeated trigger, keep the oldest and clear the rest
+    op.execute("""
+        UPDATE custom_commands AS cc SET trigger = NULL
+        FROM (
+            SELECT guild_id, name, row_number() OVER (PARTITION BY guild_id, trigger ORDER BY created_at, name) AS n
+            FROM custom_commands WHERE trigger IS NOT NULL
+        ) AS ranked
+        WHERE cc.guild_id = ranked.guild_id AND cc.name = ranked.name AND ranked.n > 1
+    """)
+    op.create_unique_constraint('uq_custom_commands_guild_trigger', 'custom_commands', ['guild_id', 'trigger'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_custom_commands_guild_trigger', 'custom_commands', type_='unique')
@@ -0,0 +1,36 @@
+"""Tune levels and blacklist indexes
+
+Revision ID: 6f3a91c2d7e0
+Revises: 0b6d4e8a27c5
+Create Date: 2026-10-19 17:26:48.512374
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f3a91c2d7e0'
+down_revision: Union[str, None] = '0b6d4e8a27c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_levels_guild_id_xp', 'levels', ['guild_id', sa.text('xp DESC')], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_blacklisted_users_active', 'blacklisted_users', ['user_id'], unique=False, postgresql_concurrently=True,
+                        postgresql_where=sa.text('is_actively_blacklisted'))
+        op.drop_index('ix_user_guild', table_name='levels', postgresql_concurrently=True)
+        op.drop_index('ix_guild', table_name='levels', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_user_guild', 'levels', ['user_id', 'guild_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_guild', 'levels', ['guild_id'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_blacklisted_users_active', table_name='blacklisted_users', postgresql_concurrently=True)
+        op.drop_index('ix_levels_guild_id_xp', table_name='levels', postgresql_concurrently=True)
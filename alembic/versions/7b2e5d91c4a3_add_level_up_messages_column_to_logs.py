@@ -0,0 +1,26 @@
+"""Add level up messages column to logs
+
+Revision ID: 7b2e5d91c4a3
+Revises: 4c8e2a7d19f6
+Create Date: 2026-10-19 19:12:05.337512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e5d91c4a3'
+down_revision: Union[str, None] = '4c8e2a7d19f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('logs', sa.Column('level_up_messages', sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('logs', 'level_up_messages')
@@ -0,0 +1,27 @@
+"""Add image type column to custom commands
+
+Revision ID: 8d4f1a6e3b27
+Revises: 3e9b7c5a2f61
+Create Date: 2026-10-19 21:40:17.529903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4f1a6e3b27'
+down_revision: Union[str, None] = '3e9b7c5a2f61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Images already stored keep a null type, their extension is sniffed from the file when sent
+    op.add_column('custom_commands', sa.Column('image_type', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('custom_commands', 'image_type')
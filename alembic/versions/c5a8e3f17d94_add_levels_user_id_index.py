@@ -0,0 +1,28 @@
+"""Add levels user id index
+
+Revision ID: c5a8e3f17d94
+Revises: 8d4f1a6e3b27
+Create Date: 2026-10-19 22:15:36.840127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a8e3f17d94'
+down_revision: Union[str, None] = '8d4f1a6e3b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Dropping ix_user_guild left nothing leading with user_id, the primary key leads with guild_id
+    with op.get_context().autocommit_block():
+        op.create_index('ix_levels_user_id', 'levels', ['user_id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_levels_user_id', table_name='levels', postgresql_concurrently=True)
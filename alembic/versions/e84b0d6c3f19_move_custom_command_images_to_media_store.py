@@ -0,0 +1,66 @@
+"""Move custom command images to the media store
+
+Revision ID: e84b0d6c3f19
+Revises: 5a7f2c9d18e3
+Create Date: 2026-10-19 15:04:52.660193
+
+"""
+import base64
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.media_store import media_store
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e84b0d6c3f19'
+down_revision: Union[str, None] = '5a7f2c9d18e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 200
+
+
+def upgrade() -> None:
+    op.add_column('custom_commands', sa.Column('image_hash', sa.String(length=64), nullable=True))
+    # Only a batch of decoded images is held at once, keyset paging keeps each query cheap
+    conn = op.get_bind()
+    last = (-1, "")
+    while True:
+        rows = conn.execute(sa.text(
+            "SELECT guild_id, name, image FROM custom_commands "
+            "WHERE image IS NOT NULL AND (guild_id, name) > (:guild_id, :name) "
+            "ORDER BY guild_id, name LIMIT :limit"),
+            {"guild_id": last[0], "name": last[1], "limit": BATCH_SIZE}).all()
+        if not rows:
+            break
+        for guild_id, name, image in rows:
+            conn.execute(sa.text(
+                "UPDATE custom_commands SET image_hash = :digest WHERE guild_id = :guild_id AND name = :name"),
+                {"digest": media_store.put(base64.b64decode(image)), "guild_id": guild_id, "name": name})
+        last = (rows[-1][0], rows[-1][1])
+    op.drop_column('custom_commands', 'image')
+
+
+def downgrade() -> None:
+    op.add_column('custom_commands', sa.Column('image', sa.String(), nullable=True))
+    conn = op.get_bind()
+    last = (-1, "")
+    while True:
+        rows = conn.execute(sa.text(
+            "SELECT guild_id, name, image_hash FROM custom_commands "
+            "WHERE image_hash IS NOT NULL AND (guild_id, name) > (:guild_id, :name) "
+            "ORDER BY guild_id, name LIMIT :limit"),
+            {"guild_id": last[0], "name": last[1], "limit": BATCH_SIZE}).all()
+        if not rows:
+            break
+        for guild_id, name, digest in rows:
+            with open(media_store.path(digest), "rb") as file:
+                image = base64.b64encode(file.read()).decode()
+            conn.execute(sa.text(
+                "UPDATE custom_commands SET image = :image WHERE guild_id = :guild_id AND name = :name"),
+                {"image": image, "guild_id": guild_id, "name": name})
+        last = (rows[-1][0], rows[-1][1])
+    op.drop_column('custom_commands', 'image_hash')
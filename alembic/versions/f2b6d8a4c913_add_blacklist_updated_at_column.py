@@ -0,0 +1,34 @@
+"""Add blacklist updated_at column
+
+Revision ID: f2b6d8a4c913
+Revises: c5a8e3f17d94
+Create Date: 2026-10-19 23:02:18.514730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6d8a4c913'
+down_revision: Union[str, None] = 'c5a8e3f17d94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('blacklisted_users', sa.Column('updated_at', sa.BigInteger(), nullable=True))
+    # The latest of the two dates is when each row last changed, which is what the sync compared before
+    op.execute("UPDATE blacklisted_users SET updated_at = greatest(date_blacklisted, coalesce(date_unblacklisted, 0))")
+    op.alter_column('blacklisted_users', 'updated_at', nullable=False)
+    with op.get_context().autocommit_block():
+        op.create_index('ix_blacklisted_users_updated_at', 'blacklisted_users', ['updated_at'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_blacklisted_users_updated_at', table_name='blacklisted_users', postgresql_concurrently=True)
+    op.drop_column('blacklisted_users', 'updated_at')
@@ -9,16 +9,31 @@ It contains the bot class and the main function to run the bot.
 import platform
 import asyncio
 import json
+import math
 import os
+import time
 import traceback
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, List, Union
 import discord
+from discord import app_commands
 from discord.app_commands import CheckFailure
 from discord.ext import commands
 from discord.ext.commands import ExtensionError, Context, errors
 from dotenv import load_dotenv
-from utils.redis import load_blacklist_from_db, close_redis, is_user_blacklisted
+from utils.redis import close_redis, is_user_blacklisted, pool_stats
+from utils.spam_detector import SpamDetector
+from utils.cooldowns import XpCooldown
+from utils.ipc import ClusterIPC, report_health
+from utils.eligibility import attach_ipc
+from utils.log_delivery import LogDelivery
+from utils.member_cache import member_cache_options
+from utils.message_snapshots import SnapshotCache
+from utils.outbound import OutboundScheduler, Priority
+from utils.errors import ContentNotAllowed
+from utils.logger import logger, bind_log_context
 from database.db_io import BlacklistedUsers
+from database.makedb import pool_stats as db_pool_stats
+from database.query_advisor import dump_capture
 
 
 load_dotenv()
@@ -26,9 +41,10 @@ intents = discord.Intents.default()
 intents.guilds = True
 intents.messages = True
 intents.message_content = True
-intents.members = True
+intents.members = True  # Member events only, how many members are kept is up to MEMBER_CACHE
 
 if TYPE_CHECKING:
+    import datetime
     from typing import Any
 
 async def cog_loader(bot_instance: commands.Bot) -> None:
@@ -45,14 +61,52 @@ async def cog_loader(bot_instance: commands.Bot) -> None:
                 print(traceback.format_exc())
 
 
-class Cynix(commands.Bot): # type: ignore
+def shard_config() -> Dict[str, Union[int, List[int]]]:
+    """Reads the shard range this process owns, set by cluster.py. Empty means let discord.py decide."""
+    shard_count = os.getenv("SHARD_COUNT")
+    shard_ids = os.getenv("SHARD_IDS")
+    if not shard_count:
+        return {}
+    config: Dict[str, Union[int, List[int]]] = {"shard_count": int(shard_count)}
+    if shard_ids:
+        config["shard_ids"] = [int(shard_id) for shard_id in shard_ids.split(",")]
+    return config
+
+
+def _latency_ms(created_at: "datetime.datetime") -> int:
+    """Milliseconds from when Discord created the message or interaction until now"""
+    return int((discord.utils.utcnow() - created_at).total_seconds() * 1000)
+
+
+class CynixTree(app_commands.CommandTree): # type: ignore
+    """Command tree that tags everything a slash command logs with its guild and name"""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # This runs in the same task as the command, so the bound fields last for the whole invocation
+        bind_log_context(guild=interaction.guild_id,
+                         command=interaction.command.qualified_name if interaction.command else None)
+        return True
+
+
+class Cynix(commands.AutoShardedBot): # type: ignore
     """This is the main bot class."""
     def __init__(self, *args, **kwargs) -> None: # type: ignore
         super().__init__(*args, **kwargs)
+        self.cluster_id = int(os.getenv("CLUSTER_ID", "0"))
+        self.started_at = time.time()
+        self.ipc = ClusterIPC(self.cluster_id)
+        self._health_task: "asyncio.Task[None] | None" = None
         self.stage = "Development"
         self.version = "0.0.5"
         self.session_command_count = 0
         self.command_count = self.load_command_count()  # Load saved count
+        self.spam_detector = SpamDetector()
+        self.xp_cooldown = XpCooldown()
+        self.outbound = OutboundScheduler()
+        self.log_delivery = LogDelivery(self)
+        self.before_invoke(self._bind_command_context)
+        self.message_snapshots = SnapshotCache(
+            budget_bytes=int(os.getenv("MESSAGE_CACHE_MB", "64")) * 1024 * 1024,
+            per_channel=int(os.getenv("MESSAGE_CACHE_PER_CHANNEL", "500")))
 
     @staticmethod
     def load_command_count() -> int:
@@ -88,49 +142,117 @@ class Cynix(commands.Bot): # type: ignore
         with open("utils/command_count.json", "w", encoding="utf-8") as f:
             json.dump({"count": self.command_count}, f)
 
-    async def on_command_completion(self, context: commands.Context) -> None: # pylint: disable=W0613
+    @staticmethod
+    async def _bind_command_context(context: commands.Context) -> None:
+        """Tags everything a prefix command logs with its guild and name"""
+        bind_log_context(guild=context.guild.id if context.guild else None, command=context.command.qualified_name)
+
+    async def on_command_completion(self, context: commands.Context) -> None:
         """Triggered when a command is used."""
         self.command_count += 1
+        self.session_command_count += 1
         self.save_command_count()
+        logger.info("Command %s completed", context.command.qualified_name,
+                    extra={"guild": context.guild.id if context.guild else None,
+                           "command": context.command.qualified_name,
+                           "latency_ms": _latency_ms(context.message.created_at)})
+
+    async def on_app_command_completion(self, interaction: discord.Interaction,
+                                        command: "app_commands.Command[Any, ..., Any]") -> None:
+        """Triggered when a slash command finishes, logs how long it took from the user's side"""
+        logger.info("Command %s completed", command.qualified_name,
+                    extra={"guild": interaction.guild_id, "command": command.qualified_name,
+                           "latency_ms": _latency_ms(interaction.created_at)})
 
     async def setup_hook(self) -> None:
         """This function is called before the bot is ready, to load cogs."""
         await cog_loader(self)
-        user_dicts = await BlacklistedUsers.load_all_blacklisted_users()
-        if user_dicts:
-            await load_blacklist_from_db(user_dicts)
-            print(f"Successfully loaded {len(user_dicts)} blacklisted users.")
+        self.ipc.register("reload", self._ipc_reload)
+        self.ipc.register("sync", self._ipc_sync)
+        attach_ipc(self.ipc)
+        self.ipc.start()
+        self._health_task = asyncio.create_task(self._report_health_loop())
+        print(await BlacklistedUsers.sync_to_redis())
+
+    async def _ipc_reload(self, args: Dict[str, str]) -> None:
+        """Reloads a cog when another cluster asks us to"""
+        cog = args.get("cog")
+        if cog in self.extensions:
+            await self.reload_extension(cog)
+            logger.info("Cluster %s reloaded %s over IPC", self.cluster_id, cog)
+
+    async def _ipc_sync(self, _: Dict[str, str]) -> None:
+        """Syncs the command tree when another cluster asks us to"""
+        await self.tree.sync()
+        logger.info("Cluster %s synced commands over IPC", self.cluster_id)
+
+    async def _report_health_loop(self) -> None:
+        """Reports this cluster's health to Redis so any cluster can show it"""
+        while not self.is_closed():
+            try:
+                await report_health(
+                    self.cluster_id,
+                    shards=sorted(self.shards),
+                    shard_count=self.shard_count,
+                    guilds=len(self.guilds),
+                    latency=None if math.isnan(self.latency) else round(self.latency * 1000),
+                    ready=self.is_ready(),
+                    uptime=int(time.time() - self.started_at),
+                    commands=self.session_command_count,
+                    redis_pool=pool_stats(),
+                    db_pools=db_pool_stats(),
+                    outbound=self.outbound.metrics(),
+                    message_cache=self.message_snapshots.stats(),
+                )
+            except Exception as e: # pylint: disable=W0718
+                logger.error("Failed to report cluster health: %s", e)
+            await asyncio.sleep(15)
 
     async def on_ready(self) -> None:
         """This function is called when the bot is ready."""
-        print(f'Logged in as {self.user.name}')
+        print(f'Logged in as {self.user.name} (cluster {self.cluster_id}, shards {sorted(self.shards)})')
         print("Ready to recieve commands!")
 
     async def close(self) -> None:
         """This function is called when the bot is closed."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+        await self.ipc.stop()
+        await self.log_delivery.close()
         await close_redis()
+        capture_path = os.getenv("QUERY_CAPTURE")
+        if capture_path:
+            print(f"Captured {dump_capture(capture_path)} query fingerprints")
         await super().close()
 
     async def on_command_error(self, context: Context, exception: errors.CommandError) -> None:
         """This function is called when an error occurs."""
         if isinstance(exception, CheckFailure):
             if await is_user_blacklisted(context.author.id):
-                await context.send(f"You are blacklisted from using this bot!\n"
-                                   f"If you feel this is incorrect, please contact SpiritTheWalf", delete_after=10)
+                await self.outbound.send(context, Priority.INTERACTIVE,
+                                         content="You are blacklisted from using this bot!\n"
+                                                 "If you feel this is incorrect, please contact SpiritTheWalf",
+                                         delete_after=10)
                 await context.message.delete()
         else:
             await super().on_command_error(context, exception)
 
-bot = Cynix(command_prefix=commands.when_mentioned_or("!"), intents=intents)
+# discord.py's own message cache is off, the message logs keep compact snapshots instead.
+# Without it on_message_edit, on_message_delete, on_bulk_message_delete and on_reaction_* never fire for any cog,
+# listeners have to use the on_raw_* events
+bot = Cynix(command_prefix=commands.when_mentioned_or("!"), intents=intents, max_messages=None, **shard_config(),
+            tree_cls=CynixTree, **member_cache_options())
 
-@bot.tree.error
+@bot.tree.error # type: ignore
 async def on_app_command_error(interaction: discord.Interaction, error: Exception) -> None:
     """This function is called when the bot encountered an error."""
-    if isinstance(error, CheckFailure):
+    if isinstance(error, ContentNotAllowed):
+        await interaction.response.send_message(str(error), ephemeral=True)
+    elif isinstance(error, CheckFailure):
         if await is_user_blacklisted(interaction.user.id):
             await interaction.response.send_message("You are blacklisted from using this bot!\n"
                                                     "If you feel this is incorrect, please contact "
                                                     "SpiritTheWalf", ephemeral=True)
 
 if __name__ == "__main__":
-    bot.run(os.getenv("TOKEN"))
\ No newline at end of file
+    bot.run(os.getenv("TOKEN"), log_handler=None)  # utils.logger already routes discord.py's records
\ No newline at end of file
@@ -0,0 +1,128 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+This is the cluster launcher for the bot.
+It splits the shards into ranges and runs one bot.py process per range, restarting any that crash.
+
+Usage: python cluster.py --clusters 4 [--shards 16] [--only 0,1]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+from typing import Dict, List, Optional, Tuple
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IDENTIFY_INTERVAL = 5.0  # Discord allows one identify per 5 seconds per concurrency bucket
+MIN_RESTART_DELAY = 5.0
+MAX_RESTART_DELAY = 300.0
+HEALTHY_RUN = 600.0  # A process that stayed up this long crashed on its own, not in a loop, so backoff starts over
+
+
+async def gateway_info(token: str) -> Tuple[int, int]:
+    """Gets the recommended shard count and identify concurrency from Discord"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get("https://discord.com/api/v10/gateway/bot",
+                               headers={"Authorization": f"Bot {token}"}) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return int(data["shards"]), int(data["session_start_limit"]["max_concurrency"])
+
+
+def shard_ranges(shard_count: int, clusters: int) -> List[List[int]]:
+    """Splits the shards into `clusters` contiguous ranges as evenly as possible"""
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for cluster_id in range(clusters):
+        end = start + size + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+class Cluster:
+    """A single bot.py process that owns a range of shards"""
+    def __init__(self, cluster_id: int, shard_ids: List[int], shard_count: int) -> None:
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.stopping = False
+
+    @property
+    def env(self) -> Dict[str, str]:
+        """The environment that tells bot.py which shards it owns"""
+        return {
+            **os.environ,
+            "CLUSTER_ID": str(self.cluster_id),
+            "SHARD_COUNT": str(self.shard_count),
+            "SHARD_IDS": ",".join(map(str, self.shard_ids)),
+        }
+
+    async def run(self) -> None:
+        """Runs the process and restarts it with backoff until asked to stop"""
+        delay = MIN_RESTART_DELAY
+        loop = asyncio.get_running_loop()
+        while not self.stopping:
+            print(f"[cluster {self.cluster_id}] starting shards {self.shard_ids[0]}-{self.shard_ids[-1]}")
+            started = loop.time()
+            self.process = await asyncio.create_subprocess_exec(sys.executable, "bot.py", env=self.env)
+            code = await self.process.wait()
+            if self.stopping:
+                break
+            if loop.time() - started >= HEALTHY_RUN:
+                delay = MIN_RESTART_DELAY
+            print(f"[cluster {self.cluster_id}] exited with code {code}, restarting in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+
+    def stop(self) -> None:
+        """Asks the process to shut down"""
+        self.stopping = True
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+
+
+async def main() -> None:
+    """Works out the shard layout and launches the clusters"""
+    parser = argparse.ArgumentParser(description="Run Cynix as several clustered processes")
+    parser.add_argument("--clusters", type=int, default=1, help="Number of processes to split the shards over")
+    parser.add_argument("--shards", type=int, default=None, help="Total shard count, defaults to Discord's recommendation")
+    parser.add_argument("--only", type=str, default=None,
+                        help="Comma separated cluster IDs to run on this host, defaults to all of them")
+    args = parser.parse_args()
+
+    recommended, concurrency = await gateway_info(os.getenv("TOKEN", ""))
+    shard_count = args.shards or recommended
+    ranges = shard_ranges(shard_count, args.clusters)
+    wanted = {int(i) for i in args.only.split(",")} if args.only else set(range(len(ranges)))
+    clusters = [Cluster(i, shard_ids, shard_count) for i, shard_ids in enumerate(ranges) if i in wanted]
+
+    def stop_all() -> None:
+        for cluster in clusters:
+            cluster.stop()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_all)
+        except NotImplementedError:  # Windows
+            pass
+
+    runners = []
+    for cluster in clusters:
+        runners.append(asyncio.create_task(cluster.run()))
+        # Stagger the launches so the clusters don't fight over identify buckets
+        await asyncio.sleep(IDENTIFY_INTERVAL * len(cluster.shard_ids) / concurrency)
+    await asyncio.gather(*runners)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
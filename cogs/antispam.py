@@ -0,0 +1,55 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""Cog that watches messages for duplicate message spam waves"""
+from typing import TYPE_CHECKING
+import discord
+from discord.ext import tasks
+from discord.ext.commands import Cog
+from utils.logger import logger
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+
+class AntiSpam(Cog): # type: ignore
+    """Feeds every guild message into the spam detector and dispatches an event for each spam wave"""
+    def __init__(self, bot: "Cynix") -> None:
+        self.bot = bot
+        self.detector = bot.spam_detector
+
+    async def cog_load(self) -> None:
+        self.prune_detector.start()
+
+    async def cog_unload(self) -> None:
+        self.prune_detector.cancel()
+
+    @tasks.loop(minutes=5) # type: ignore
+    async def prune_detector(self) -> None:
+        """Drops expired flags and idle guild windows"""
+        self.detector.prune()
+
+    @Cog.listener() # type: ignore
+    async def on_message(self, message: discord.Message) -> None:
+        """Checks every message against the guild's recent fingerprints"""
+        if message.guild is None or message.author.bot or not message.content:
+            return
+        hit = self.detector.observe(message.guild.id, message.author.id, message.content)
+        if hit is None:
+            return
+        if hit.first_trip:
+            logger.warning("Spam wave detected in guild %s from %s users", hit.guild_id, len(hit.author_ids))
+        # Nothing listens for this yet, it is there for moderation to hook into with on_spam_wave.
+        # XP is already withheld through SpamDetector.is_flagged
+        self.bot.dispatch("spam_wave", message, hit)
+
+    @Cog.listener() # type: ignore
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        """Drops the detector state for a guild we left"""
+        self.detector.forget_guild(guild.id)
+
+
+async def setup(bot: "Cynix") -> None:
+    """Adds the cog to the bot"""
+    await bot.add_cog(AntiSpam(bot))
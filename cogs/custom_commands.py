@@ -0,0 +1,238 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""Cog for per-guild custom commands and their keyword triggers"""
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+import discord
+from discord import app_commands
+from discord.app_commands import command, describe
+from discord.ext.commands import Cog, GroupCog
+from database.db_io import CustomCommands as CcDb
+from database.makedb import CustomCommands as DbCc
+from utils.anti_zalgo import normalise_text
+from utils.checks import app_not_blacklisted
+from utils.cooldowns import ExpiringKeys
+from utils.eligibility import NSFW_REQUIRES_REGISTRATION, UserFlags, get_flags, may_view_nsfw
+from utils.logger import logger
+from utils.media_store import MAX_IMAGE_BYTES, media_store
+from utils.outbound import Priority
+from utils.trigger_matcher import TriggerMatcher
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+# Seconds before a trigger can fire again in the same channel, so repeating a trigger can't make the bot spam
+TRIGGER_COOLDOWN = float(os.getenv("CC_TRIGGER_COOLDOWN", "5"))
+
+
+class _GuildTriggers:
+    """A guild's compiled matcher plus which command each trigger runs"""
+    __slots__ = ("matcher", "names")
+
+    def __init__(self, triggers: Dict[str, str]) -> None:
+        self.names = {normalise_text(trigger): name for trigger, name in triggers.items()}
+        self.matcher = TriggerMatcher(self.names)
+
+    def set(self, trigger: str, name: str) -> None:
+        """Adds or repoints a trigger"""
+        self.names[normalise_text(trigger)] = name
+        self.matcher.add(trigger)
+
+    def remove_command(self, name: str) -> None:
+        """Drops every trigger that runs a command"""
+        for trigger in [trigger for trigger, target in self.names.items() if target == name]:
+            del self.names[trigger]
+            self.matcher.discard(trigger)
+
+
+@app_commands.guild_only()
+class CustomCommands(GroupCog, group_name="cc", group_description="Custom commands for this server"): # type: ignore
+    """Custom commands, keyword triggers for a guild are matched in one pass per message"""
+    def __init__(self, bot: "Cynix") -> None:
+        self.bot = bot
+        self._triggers: Dict[int, _GuildTriggers] = {}
+        self._loading: Dict[int, "asyncio.Future[_GuildTriggers]"] = {}
+        self._cooldown = ExpiringKeys(TRIGGER_COOLDOWN, 50_000)
+
+    async def _get_triggers(self, guild_id: int) -> _GuildTriggers:
+        """Gets the guild's matcher, loading it once even if a burst of messages asks at the same time"""
+        triggers = self._triggers.get(guild_id)
+        if triggers is not None:
+            return triggers
+        pending = self._loading.get(guild_id)
+        if pending is not None:
+            return await pending
+        future: "asyncio.Future[_GuildTriggers]" = asyncio.get_running_loop().create_future()
+        self._loading[guild_id] = future
+        try:
+            triggers = self._triggers[guild_id] = _GuildTriggers(await CcDb.get_triggers(guild_id))
+            future.set_result(triggers)
+            return triggers
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._loading[guild_id]
+
+    @staticmethod
+    def _message_kwargs(entry: DbCc) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"content": entry.text or None}
+        if entry.image_hash:
+            file = media_store.as_file(entry.image_hash, entry.image_type)
+            if file is not None:
+                kwargs["file"] = file
+            else:
+                logger.warning("Image %s for custom command %s is missing from the media store",
+                               entry.image_hash, entry.name)
+        return kwargs
+
+    @Cog.listener() # type: ignore
+    async def on_message(self, message: discord.Message) -> None:
+        """Runs the first custom command whose trigger appears in the message"""
+        if message.guild is None or message.author.bot or not message.content:
+            return
+        try:
+            triggers = await self._get_triggers(message.guild.id)
+        except Exception as e: # pylint: disable=W0718
+            logger.error("Failed to load custom command triggers for %s: %s", message.guild.id, e)
+            return
+        trigger = triggers.matcher.first(message.content)
+        if trigger is None:
+            return
+        flags = await get_flags(message.author.id)
+        if flags & UserFlags.BLACKLISTED:
+            return
+        if not self._cooldown.add_if_absent(message.channel.id, time.monotonic()):
+            return
+        entry = await CcDb.get_custom_command(message.guild.id, triggers.names[trigger])
+        if entry is None:
+            return
+        if entry.nsfw and not getattr(message.channel, "nsfw", False):
+            return
+        if entry.nsfw and NSFW_REQUIRES_REGISTRATION and not may_view_nsfw(flags):
+            return
+        await self.bot.outbound.send(message.channel, Priority.NORMAL, **self._message_kwargs(entry))
+
+    @command(name="add", description="Add a custom command") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @app_commands.default_permissions(manage_messages=True) # type: ignore
+    @describe(name="The command's name", text="What the command says", # type: ignore
+              trigger="A word or phrase that runs the command when someone says it",
+              image="An image the command sends", nsfw="Only run in NSFW channels")
+    async def add(self, inter: discord.Interaction, name: str, text: Optional[str] = None, # pylint: disable=R0913,R0917
+                  trigger: Optional[str] = None, image: Optional[discord.Attachment] = None,
+                  nsfw: bool = False) -> None:
+        """Adds a custom command"""
+        if not text and not image:
+            await inter.response.send_message("A custom command needs text, an image or both.", ephemeral=True)
+            return
+        # Stored normalised, so the per-guild unique constraint sees triggers the way the matcher does
+        trigger = normalise_text(trigger) if trigger is not None else None
+        if trigger == "":
+            await inter.response.send_message("That trigger is empty once cleaned up.", ephemeral=True)
+            return
+        if image is not None and media_store.extension(image.content_type) is None:
+            await inter.response.send_message("The image has to be a PNG, JPEG, GIF or WebP.", ephemeral=True)
+            return
+        if image is not None and image.size > MAX_IMAGE_BYTES:
+            await inter.response.send_message(f"The image can be at most {MAX_IMAGE_BYTES // (1024 * 1024)} MB.",
+                                              ephemeral=True)
+            return
+        await inter.response.defer(ephemeral=True)
+        digest = await media_store.put_async(await image.read()) if image else None
+        result = await CcDb.add_custom_command(inter.guild_id, name=name.lower(), owner_id=inter.user.id,
+                                               text=text, image_hash=digest, nsfw=nsfw, trigger=trigger,
+                                               image_type=image.content_type if image else None)
+        if "successfully" in result and trigger is not None and inter.guild_id in self._triggers:
+            self._triggers[inter.guild_id].set(trigger, name.lower())
+        await inter.followup.send(result, ephemeral=True)
+
+    @command(name="edit", description="Edit one of your custom commands") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(name="The command's name", text="The new text", trigger="The new trigger", # type: ignore
+              clear_trigger="Remove the trigger, so the command only runs with /cc run")
+    async def edit(self, inter: discord.Interaction, name: str, text: Optional[str] = None,
+                   trigger: Optional[str] = None, clear_trigger: bool = False) -> None:
+        """Edits a custom command, only its owner or someone with Manage Server can"""
+        entry = await CcDb.get_custom_command(inter.guild_id, name.lower())
+        if entry is None:
+            await inter.response.send_message("No custom command was found.", ephemeral=True)
+            return
+        if entry.owner_id != inter.user.id and not inter.permissions.manage_guild:
+            await inter.response.send_message("You can only edit your own custom commands.", ephemeral=True)
+            return
+        if clear_trigger and trigger is not None:
+            await inter.response.send_message("Give a new trigger or clear it, not both.", ephemeral=True)
+            return
+        trigger = normalise_text(trigger) if trigger is not None else None
+        if trigger == "":
+            await inter.response.send_message("That trigger is empty once cleaned up.", ephemeral=True)
+            return
+        clear = ["trigger"] if clear_trigger else []
+        result = await CcDb.edit_custom_command(inter.guild_id, name.lower(), clear=clear, text=text, trigger=trigger)
+        if "successfully" in result and (trigger is not None or clear_trigger) and inter.guild_id in self._triggers:
+            guild_triggers = self._triggers[inter.guild_id]
+            guild_triggers.remove_command(name.lower())
+            if trigger is not None:
+                guild_triggers.set(trigger, name.lower())
+        await inter.response.send_message(result, ephemeral=True)
+
+    @command(name="delete", description="Delete one of your custom commands") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(name="The command's name") # type: ignore
+    async def delete(self, inter: discord.Interaction, name: str) -> None:
+        """Deletes a custom command, only its owner or someone with Manage Server can"""
+        entry = await CcDb.get_custom_command(inter.guild_id, name.lower())
+        if entry is None:
+            await inter.response.send_message("No custom command was found.", ephemeral=True)
+            return
+        if entry.owner_id != inter.user.id and not inter.permissions.manage_guild:
+            await inter.response.send_message("You can only delete your own custom commands.", ephemeral=True)
+            return
+        result = await CcDb.delete_custom_command(inter.guild_id, name.lower())
+        if "successfully" in result and inter.guild_id in self._triggers:
+            self._triggers[inter.guild_id].remove_command(name.lower())
+        await inter.response.send_message(result, ephemeral=True)
+
+    @command(name="claim", description="Move one of your custom commands from before they were per server here") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @app_commands.default_permissions(manage_messages=True) # type: ignore
+    @describe(name="The command's name") # type: ignore
+    async def claim(self, inter: discord.Interaction, name: str) -> None:
+        """Moves a command made before commands were per server into this server, only its owner can"""
+        result = await CcDb.claim_legacy_command(inter.guild_id, name.lower(), inter.user.id)
+        if "successfully" in result:
+            self._triggers.pop(inter.guild_id, None)  # Reloaded with the claimed trigger on the next message
+        await inter.response.send_message(result, ephemeral=True)
+
+    @command(name="run", description="Run a custom command") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(name="The command's name") # type: ignore
+    async def run(self, inter: discord.Interaction, name: str) -> None:
+        """Runs a custom command by name"""
+        entry = await CcDb.get_custom_command(inter.guild_id, name.lower())
+        if entry is None:
+            await inter.response.send_message("No custom command was found.", ephemeral=True)
+            return
+        if entry.nsfw and not getattr(inter.channel, "nsfw", False):
+            await inter.response.send_message("That command can only be used in NSFW channels.", ephemeral=True)
+            return
+        if entry.nsfw and NSFW_REQUIRES_REGISTRATION and not may_view_nsfw(await get_flags(inter.user.id)):
+            await inter.response.send_message("You need to be registered, age verified and opted in to NSFW "
+                                              "content to use that command.", ephemeral=True)
+            return
+        await inter.response.send_message(**self._message_kwargs(entry))
+
+    @Cog.listener() # type: ignore
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        """Drops the matcher for a guild we left"""
+        self._triggers.pop(guild.id, None)
+
+
+async def setup(bot: "Cynix") -> None:
+    """Adds the cog to the bot"""
+    await bot.add_cog(CustomCommands(bot))
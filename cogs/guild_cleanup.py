@@ -0,0 +1,94 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""Cog that sets up the database row of guilds the bot joins and purges the data of guilds it has left"""
+import asyncio
+import os
+from typing import TYPE_CHECKING
+import discord
+from discord.ext import tasks
+from discord.ext.commands import Cog
+from database.db_io import GuildCleanup as CleanupDb, Logs
+from utils.logger import logger
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+GRACE_SECONDS = int(os.getenv("GUILD_PURGE_GRACE_DAYS", "7")) * 86400
+CHUNK_SIZE = int(os.getenv("GUILD_PURGE_CHUNK_SIZE", "5000"))
+CHUNK_PAUSE = 0.5  # Seconds between chunks, so the purge never hogs the pool
+
+
+class GuildCleanup(Cog): # type: ignore
+    """
+    Schedules a purge when the bot leaves a guild and cancels it if the bot is re-added.
+    The job deletes rows in bounded chunks, each in its own transaction. Nothing is tracked besides the
+    cleanup row itself, so after a restart it just carries on deleting whatever is left.
+    """
+    def __init__(self, bot: "Cynix") -> None:
+        self.bot = bot
+        self._backfilled = False
+
+    async def cog_load(self) -> None:
+        self.purge.start()
+
+    async def cog_unload(self) -> None:
+        self.purge.cancel()
+
+    @Cog.listener() # type: ignore
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        """Schedules the guild's data to be purged after the grace period"""
+        await CleanupDb.schedule(guild.id, GRACE_SECONDS)
+
+    @Cog.listener() # type: ignore
+    async def on_guild_join(self, guild: discord.Guild) -> None:
+        """
+        Adds the guild's logs row, which levels and the other per-guild tables reference,
+        and keeps the guild's data if we were re-added in time
+        """
+        await Logs.ensure_guilds([guild.id])
+        if await CleanupDb.cancel(guild.id):
+            logger.info("Re-added to guild %s, cancelled its data purge", guild.id)
+
+    @Cog.listener() # type: ignore
+    async def on_ready(self) -> None:
+        """Adds the logs row of every guild joined while the bot was offline, once per process"""
+        if self._backfilled:
+            return
+        added = await Logs.ensure_guilds([guild.id for guild in self.bot.guilds])
+        self._backfilled = added is not None
+        if added:
+            logger.info("Added missing logs rows for %s guilds", added)
+
+    @tasks.loop(minutes=10) # type: ignore
+    async def purge(self) -> None:
+        """Purges guilds whose grace period is over"""
+        # Only the cluster running the guild's shard purges it, so clusters don't race each other
+        for guild_id in await CleanupDb.get_due(list(self.bot.shards), self.bot.shard_count or 1):
+            await self._purge_guild(guild_id)
+
+    @purge.before_loop # type: ignore
+    async def before_purge(self) -> None:
+        await self.bot.wait_until_ready()
+
+    async def _purge_guild(self, guild_id: int) -> None:
+        total = 0
+        for model in CleanupDb.PURGE_ORDER:
+            while True:
+                if self.bot.get_guild(guild_id) is not None:
+                    return  # Re-added mid purge, on_guild_join has cancelled it
+                deleted = await CleanupDb.purge_chunk(model, guild_id, CHUNK_SIZE)
+                if deleted is None:
+                    return  # Picked up again on the next run
+                total += deleted
+                if deleted < CHUNK_SIZE:
+                    break
+                await asyncio.sleep(CHUNK_PAUSE)
+        await CleanupDb.finish(guild_id)
+        logger.info("Purged %s rows for guild %s", total, guild_id)
+
+
+async def setup(bot: "Cynix") -> None:
+    """Adds the cog to the bot"""
+    await bot.add_cog(GuildCleanup(bot))
@@ -0,0 +1,183 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""Cog that grants XP for message activity"""
+import asyncio
+import random
+from typing import TYPE_CHECKING, Dict, Optional
+import discord
+from discord import app_commands
+from discord.app_commands import describe
+from discord.ext.commands import Cog
+from database.db_io import Levels, LevelRoles, Logs
+from database.makedb import Levels as DbLvl
+from utils.checks import app_not_blacklisted, role_grant_refusal
+from utils.level_curve import get_guild_levelling, level_up_messages_enabled
+from utils.logger import logger
+from utils.outbound import Priority
+from utils.role_reconcile import ReconcileProgress, RoleReconciler
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+XP_PER_MESSAGE = (15, 25)
+LEADERBOARD_PAGE_SIZE = 10
+
+
+class LevelsCog(Cog, name="Levels"): # type: ignore
+    """Grants XP for messages, at most once per user per cooldown window"""
+    levelroles = app_commands.Group(name="levelroles", description="Manage level reward roles",
+                                    guild_only=True, default_permissions=discord.Permissions(manage_roles=True))
+    levels = app_commands.Group(name="levels", description="Manage levelling for this server",
+                                guild_only=True, default_permissions=discord.Permissions(manage_guild=True))
+
+    def __init__(self, bot: "Cynix") -> None:
+        self.bot = bot
+        self._rewards: Dict[int, Dict[int, int]] = {}
+        self._reconciling: Dict[int, "asyncio.Task[ReconcileProgress]"] = {}
+
+    async def cog_unload(self) -> None:
+        for task in self._reconciling.values():
+            task.cancel()
+
+    async def _get_rewards(self, guild_id: int) -> Dict[int, int]:
+        if guild_id not in self._rewards:
+            self._rewards[guild_id] = await LevelRoles.get_rewards(guild_id)
+        return self._rewards[guild_id]
+
+    async def _grant_rewards(self, member: discord.Member, levels: range) -> None:
+        """Gives the reward roles for levels just reached, the reconcile job handles anything older"""
+        rewards = await self._get_rewards(member.guild.id)
+        held = {role.id for role in member.roles}
+        roles = [discord.Object(rewards[level]) for level in levels if level in rewards and rewards[level] not in held]
+        if not roles:
+            return
+        try:
+            await member.add_roles(*roles, reason=f"Reached level {levels[-1]}")
+        except discord.HTTPException as e:
+            logger.warning("Failed to give level rewards to %s in %s: %s", member.id, member.guild.id, e)
+
+    @Cog.listener() # type: ignore
+    async def on_message(self, message: discord.Message) -> None:
+        """Grants XP for a message if the user is off cooldown"""
+        if message.guild is None or message.author.bot:
+            return
+        # The cooldown is checked first so most messages are turned away before any lookup
+        if not await self.bot.xp_cooldown.try_acquire(message.guild.id, message.author.id):
+            return
+        if self.bot.spam_detector.is_flagged(message.guild.id, message.author.id):
+            return
+        grant = await Levels.award_xp(message.guild.id, message.author.id, random.randint(*XP_PER_MESSAGE))
+        if grant is not None and grant.levels:
+            await self._grant_rewards(message.author, grant.levels)
+            if await level_up_messages_enabled(message.guild.id):
+                await self.bot.outbound.send(message.channel, Priority.NORMAL,
+                                             content=f"🎉 {message.author.mention} reached level **{grant.level}**!")
+
+    @app_commands.command(name="rank", description="Show your level in this server") # type: ignore
+    @app_commands.guild_only() # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(member="The member to show the level of") # type: ignore
+    async def rank(self, inter: discord.Interaction, member: Optional[discord.Member] = None) -> None:
+        """Shows a member's level and progress to the next one"""
+        member = member or inter.user
+        entry = await Levels.get_user_in_guild(inter.guild_id, member.id)
+        xp = entry.xp if isinstance(entry, DbLvl) else 0
+        curve, _ = await get_guild_levelling(inter.guild_id)
+        progress = curve.progress(xp)
+        embed = discord.Embed(title=f"{member.display_name}'s rank", colour=discord.Colour.from_str("#1010D1"))
+        embed.set_thumbnail(url=member.display_avatar.url)
+        embed.add_field(name="Level", value=progress.level)
+        embed.add_field(name="Total XP", value=xp)
+        embed.add_field(name="Next level",
+                        value=f"{progress.xp_into_level}/{progress.xp_for_next} XP" if progress.xp_for_next else "Max level")
+        await inter.response.send_message(embed=embed)
+
+    @app_commands.command(name="leaderboard", description="Show the top members in this server") # type: ignore
+    @app_commands.guild_only() # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(page="Which page of the leaderboard to show") # type: ignore
+    async def leaderboard(self, inter: discord.Interaction, page: app_commands.Range[int, 1, 100] = 1) -> None:
+        """Shows a page of the server's members by XP"""
+        start = (page - 1) * LEADERBOARD_PAGE_SIZE
+        top = await Levels.get_leaderboard(inter.guild_id, limit=LEADERBOARD_PAGE_SIZE, offset=start)
+        if not top:
+            await inter.response.send_message("Nobody is on that page yet.", ephemeral=True)
+            return
+        curve, _ = await get_guild_levelling(inter.guild_id)
+        lines = [f"**{rank}.** <@{user_id}> - level {curve.level_for(xp)} ({xp} XP)"
+                 for rank, (user_id, xp) in enumerate(top, start=start + 1)]
+        embed = discord.Embed(title=f"{inter.guild.name} leaderboard", description="\n".join(lines),
+                              colour=discord.Colour.from_str("#1010D1"))
+        embed.set_footer(text=f"Page {page}")
+        await inter.response.send_message(embed=embed)
+
+    @levels.command(name="announcements", description="Turn level up messages on or off") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(enabled="Whether reaching a level is announced in the channel the message was sent in") # type: ignore
+    async def levels_announcements(self, inter: discord.Interaction, enabled: bool) -> None:
+        """Turns the level up messages on or off for this server"""
+        await Logs.ensure_guilds([inter.guild_id])
+        result = await Logs.update_guild(inter.guild_id, level_up_messages=enabled)
+        await inter.response.send_message(result, ephemeral=True)
+
+    @levelroles.command(name="add", description="Reward a role at a level") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(level="The level the role is given at", role="The role to give") # type: ignore
+    async def levelroles_add(self, inter: discord.Interaction, level: app_commands.Range[int, 1, 1000],
+                             role: discord.Role) -> None:
+        """Sets the reward role for a level"""
+        refusal = role_grant_refusal(inter.user, role)
+        if refusal is not None:
+            await inter.response.send_message(refusal, ephemeral=True)
+            return
+        result = await LevelRoles.set_reward(inter.guild_id, level, role.id)
+        self._rewards.pop(inter.guild_id, None)
+        await inter.response.send_message(result, ephemeral=True)
+
+    @levelroles.command(name="remove", description="Stop rewarding a role at a level") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(level="The level to remove the reward from") # type: ignore
+    async def levelroles_remove(self, inter: discord.Interaction, level: app_commands.Range[int, 1, 1000]) -> None:
+        """Removes the reward role for a level"""
+        result = await LevelRoles.remove_reward(inter.guild_id, level)
+        self._rewards.pop(inter.guild_id, None)
+        await inter.response.send_message(result, ephemeral=True)
+
+    @levelroles.command(name="sync", description="Give and remove reward roles so every member matches their level") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(restart="Start from the beginning instead of resuming an interrupted sync") # type: ignore
+    async def levelroles_sync(self, inter: discord.Interaction, restart: bool = False) -> None:
+        """Runs the reconciliation job for this server, progress is edited into the response"""
+        running = self._reconciling.get(inter.guild_id)
+        if running is not None and not running.done():
+            await inter.response.send_message("A sync is already running for this server.", ephemeral=True)
+            return
+        await inter.response.defer(ephemeral=True, thinking=True)
+        rewards = await self._get_rewards(inter.guild_id)
+        if not rewards:
+            await inter.followup.send("This server has no level reward roles.", ephemeral=True)
+            return
+        curve, _ = await get_guild_levelling(inter.guild_id)
+
+        async def report(progress: ReconcileProgress) -> None:
+            try:
+                await inter.edit_original_response(content=str(progress))
+            except discord.HTTPException:
+                pass  # The interaction token only lasts 15 minutes, the job carries on regardless
+
+        reconciler = RoleReconciler(inter.guild, rewards, curve, on_progress=report)
+        task = asyncio.create_task(reconciler.run(resume=not restart), name=f"levelroles-sync-{inter.guild_id}")
+        self._reconciling[inter.guild_id] = task
+        task.add_done_callback(lambda done: self._sync_done(inter.guild_id, done))
+
+    def _sync_done(self, guild_id: int, task: "asyncio.Task[ReconcileProgress]") -> None:
+        self._reconciling.pop(guild_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Level role sync failed in %s", guild_id, exc_info=task.exception())
+
+
+async def setup(bot: "Cynix") -> None:
+    """Adds the cog to the bot"""
+    await bot.add_cog(LevelsCog(bot))
@@ -0,0 +1,148 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""Cog that logs message edits and deletions to the guild's message log channel"""
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import discord
+from discord.ext.commands import Cog
+from utils.log_delivery import get_log_channel
+from utils.message_snapshots import MessageSnapshot
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+MAX_FIELD_LENGTH = 1024
+MAX_DESCRIPTION_LENGTH = 4096
+
+
+def _clip(text: str, limit: int = MAX_FIELD_LENGTH) -> str:
+    """Cuts text down to what fits in an embed, empty content gets a placeholder"""
+    if not text:
+        return "*No text*"
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _edit_embed(before: MessageSnapshot, content: str) -> discord.Embed:
+    url = f"https://discord.com/channels/{before.guild_id}/{before.channel_id}/{before.message_id}"
+    embed = discord.Embed(title="Message edited",
+                          description=f"<@{before.author_id}> in <#{before.channel_id}> [Jump to message]({url})",
+                          colour=discord.Colour.gold(),
+                          timestamp=discord.utils.utcnow())
+    embed.add_field(name="Before", value=_clip(before.content), inline=False)
+    embed.add_field(name="After", value=_clip(content), inline=False)
+    embed.set_footer(text=f"Author ID: {before.author_id} | Message ID: {before.message_id}")
+    return embed
+
+
+def _delete_embed(snapshot: MessageSnapshot) -> discord.Embed:
+    embed = discord.Embed(title="Message deleted",
+                          description=f"<@{snapshot.author_id}> in <#{snapshot.channel_id}>, "
+                                      f"sent <t:{int(snapshot.created_at)}:R>",
+                          colour=discord.Colour.red(),
+                          timestamp=discord.utils.utcnow())
+    embed.add_field(name="Content", value=_clip(snapshot.content), inline=False)
+    if snapshot.attachments:
+        embed.add_field(name="Attachments", value=_clip("\n".join(snapshot.attachments)), inline=False)
+    embed.set_footer(text=f"Author ID: {snapshot.author_id} | Message ID: {snapshot.message_id}")
+    return embed
+
+
+def _bulk_embed(channel_id: int, total: int, snapshots: List[MessageSnapshot]) -> discord.Embed:
+    lines: List[str] = []
+    length = 0
+    for snapshot in sorted(snapshots, key=lambda snapshot: snapshot.message_id):
+        line = f"<@{snapshot.author_id}>: {_clip(snapshot.content, 100)}"
+        length += len(line) + 1
+        if length > MAX_DESCRIPTION_LENGTH - 40:
+            lines.append(f"…and {len(snapshots) - len(lines)} more")
+            break
+        lines.append(line)
+    embed = discord.Embed(title=f"{total} messages purged",
+                          description="\n".join(lines) or "*None of them were cached*",
+                          colour=discord.Colour.dark_red(),
+                          timestamp=discord.utils.utcnow())
+    embed.add_field(name="Channel", value=f"<#{channel_id}>")
+    embed.add_field(name="Cached", value=f"{len(snapshots)}/{total}")
+    return embed
+
+
+class MessageLogs(Cog): # type: ignore
+    """
+    Logs edits and deletions from the bot's snapshot cache, so it works off raw events without discord.py's
+    message cache. Only guilds with a message log channel have their messages snapshotted.
+    """
+    def __init__(self, bot: "Cynix") -> None:
+        self.bot = bot
+
+    async def _log_channel(self, guild_id: Optional[int], channel_id: int) -> Optional[int]:
+        if guild_id is None:
+            return None
+        log_channel_id = await get_log_channel(guild_id, "message_logs")
+        return log_channel_id if log_channel_id != channel_id else None
+
+    @Cog.listener() # type: ignore
+    async def on_message(self, message: discord.Message) -> None:
+        """Snapshots a message so an edit or delete can show the original"""
+        if message.guild is None or message.author.bot:
+            return
+        if await self._log_channel(message.guild.id, message.channel.id) is None:
+            return
+        self.bot.message_snapshots.add(MessageSnapshot(
+            message.id, message.guild.id, message.channel.id, message.author.id, message.content,
+            tuple(attachment.url for attachment in message.attachments)))
+
+    @Cog.listener() # type: ignore
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        """Logs a text edit of a snapshotted message"""
+        data: Dict[str, Any] = payload.data
+        if "content" not in data:
+            return  # Embeds resolving, not an edit by the author
+        attachments = tuple(attachment["url"] for attachment in data["attachments"]) \
+            if "attachments" in data else None
+        before = self.bot.message_snapshots.edit(payload.channel_id, payload.message_id, data["content"], attachments)
+        if before is None or before.content == data["content"]:
+            return
+        log_channel_id = await self._log_channel(payload.guild_id, payload.channel_id)
+        if log_channel_id is not None:
+            self.bot.log_delivery.enqueue(log_channel_id, _edit_embed(before, data["content"]))
+
+    @Cog.listener() # type: ignore
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
+        """Logs a deleted message"""
+        snapshot = self.bot.message_snapshots.pop(payload.channel_id, payload.message_id)
+        if snapshot is None:
+            return
+        log_channel_id = await self._log_channel(payload.guild_id, payload.channel_id)
+        if log_channel_id is not None:
+            self.bot.log_delivery.enqueue(log_channel_id, _delete_embed(snapshot))
+
+    @Cog.listener() # type: ignore
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent) -> None:
+        """Logs a purge as one embed"""
+        snapshots = [snapshot for message_id in payload.message_ids
+                     if (snapshot := self.bot.message_snapshots.pop(payload.channel_id, message_id)) is not None]
+        log_channel_id = await self._log_channel(payload.guild_id, payload.channel_id)
+        if log_channel_id is not None:
+            self.bot.log_delivery.enqueue(log_channel_id,
+                                          _bulk_embed(payload.channel_id, len(payload.message_ids), snapshots))
+
+    @Cog.listener() # type: ignore
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        """Frees a deleted channel's snapshots"""
+        self.bot.message_snapshots.forget_channel(channel.id)
+
+    @Cog.listener() # type: ignore
+    async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent) -> None:
+        """Frees a deleted thread's snapshots"""
+        self.bot.message_snapshots.forget_channel(payload.thread_id)
+
+    @Cog.listener() # type: ignore
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        """Frees every snapshot of a guild the bot left"""
+        self.bot.message_snapshots.forget_guild(guild.id)
+
+
+async def setup(bot: "Cynix") -> None:
+    """Adds the cog to the bot"""
+    await bot.add_cog(MessageLogs(bot))
@@ -14,7 +14,9 @@ from discord.ext import commands
 from discord.ext.commands import Cog, ExtensionFailed, Context
 from utils.logger import logger
 from utils.error_reporting import send_error
-from database.db_io import BlacklistedUsers
+from utils.ipc import get_cluster_health
+from database.db_io import BlacklistedUsers, CustomCommands, RegistrationStats
+from utils.media_store import SWEEP_GRACE_SECONDS, media_store
 
 class Owner(Cog): # type: ignore
     """Owner commands"""
@@ -23,9 +25,11 @@ class Owner(Cog): # type: ignore
 
     @commands.command(name="sync", hidden=True) # type: ignore
     @commands.is_owner() # type: ignore
-    async def sync(self, ctx: Context) -> None:
-        """Command to sync the tree"""
+    async def sync(self, ctx: Context, scope: Optional[str] = None) -> None:
+        """Command to sync the tree, `!sync all` also asks every other cluster to sync"""
         await self.bot.tree.sync()
+        if scope == "all":
+            await self.bot.ipc.broadcast("sync")
         await ctx.send("Commands synced, you will need to reload Discord to see them.")
         await ctx.message.delete()
         logger.info("Commands synced")
@@ -94,7 +98,7 @@ class Owner(Cog): # type: ignore
                title=f"Information for {guild.name}",
                 colour= discord.Colour.from_str("#1010D1")
             )
-            embed.add_field(name="Owner", value=f"{guild.owner}")
+            embed.add_field(name="Owner", value=f"<@{guild.owner_id}>")
             embed.set_thumbnail(url=guild.icon.url)
             embed.add_field(name="Members", value=f"{guild.member_count}")
             embed.add_field(name="Text Channels", value=len(guild.text_channels))
@@ -104,7 +108,7 @@ class Owner(Cog): # type: ignore
             f" | {discord.utils.format_dt(guild.created_at, 'R')}")
             embed.add_field(
                 name="Bot Joined At",
-                value=guild.get_member(self.bot.user.id).joined_at.strftime('%Y-%m-%d %H:%M:%S'))
+                value=guild.me.joined_at.strftime('%Y-%m-%d %H:%M:%S'))
             embed.add_field(name="NSFW Level", value=guild.nsfw_level)
 
             await ctx.send(embed=embed)
@@ -157,8 +161,9 @@ class Owner(Cog): # type: ignore
         try:
             if cog in self.bot.extensions:
                 await self.bot.reload_extension(cog)
+                clusters = await self.bot.ipc.broadcast("reload", cog=cog)
                 await asyncio.sleep(5)  # Adjust sleep time as needed
-                await message.edit(content=f"Reloaded {cog} successfully!")
+                await message.edit(content=f"Reloaded {cog} successfully! Sent to {clusters} other cluster(s).")
             else:
                 await ctx.send(f"Cog {cog} not found")
         except ExtensionFailed as e:
@@ -167,6 +172,41 @@ class Owner(Cog): # type: ignore
             await message.edit(content=f"Failed to reload {cog}:\n{e}")
         await ctx.message.delete()
 
+    @commands.command(name="clusters", hidden=True) # type: ignore
+    @commands.is_owner() # type: ignore
+    async def clusters(self, ctx: Context) -> None:
+        """Show the health of every running cluster"""
+        reports = await get_cluster_health()
+        if not reports:
+            await ctx.send("No clusters have reported in.")
+            return
+        embed = discord.Embed(title="Cluster health", colour=discord.Colour.from_str("#1010D1"))
+        for report in reports:
+            pools = ", ".join(f"{name} {pool['checked_out']}/{pool['size']}"
+                              for name, pool in report.get("db_pools", {}).items())
+            snapshots = report.get("message_cache") or {}
+            cache = f"{snapshots.get('messages', 0)} messages, {snapshots.get('bytes', 0) // 1048576} MiB" \
+                if snapshots else "unknown"
+            embed.add_field(
+                name=f"Cluster {report['cluster_id']}",
+                value=(f"Shards: {', '.join(map(str, report.get('shards', [])))}\n"
+                       f"Guilds: {report.get('guilds')}\n"
+                       f"Latency: {report.get('latency')}ms\n"
+                       f"Ready: {report.get('ready')}\n"
+                       f"Uptime: {report.get('uptime')}s\n"
+                       f"DB connections: {pools or 'unknown'}\n"
+                       f"Message cache: {cache}\n"
+                       f"Last report: <t:{int(report['reported_at'])}:R>"))
+        await ctx.send(embed=embed)
+
+    @commands.command(name="outbound", hidden=True) # type: ignore
+    @commands.is_owner() # type: ignore
+    async def outbound(self, ctx: Context) -> None:
+        """Show the outbound send queue metrics"""
+        metrics = self.bot.outbound.metrics()
+        lines = [f"{name}: {value}" for name, value in metrics.items()]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
     @commands.command(name="test_mb", hidden=True) # type: ignore
     async def test_mb(self, ctx: commands.Context) -> None:
         """Just a simple function to check if my error sending is working as intended"""
@@ -190,6 +230,42 @@ class Owner(Cog): # type: ignore
         response = await BlacklistedUsers.remove_blacklisted_user(user_id, unblacklist_reason=reason)
         await ctx.send(response)
 
+    @commands.command(name="rebuildblacklist", hidden=True) # type: ignore
+    @commands.is_owner() # type: ignore
+    async def rebuildblacklist(self, ctx: commands.Context) -> None:
+        """Rebuild the Redis blacklist from the database"""
+        response = await BlacklistedUsers.sync_to_redis(full=True)
+        await ctx.send(response)
+
+    @commands.command(name="regstats", hidden=True) # type: ignore
+    @commands.is_owner() # type: ignore
+    async def regstats(self, ctx: commands.Context, field: Optional[str] = None) -> None:
+        """Show how many registered users picked each option"""
+        if field is not None and field not in RegistrationStats.FIELDS:
+            await ctx.send(f"Unknown field, pick one of: {', '.join(RegistrationStats.FIELDS)}.")
+            return
+        stats = await RegistrationStats.get_stats(field)
+        embed = discord.Embed(title="Registration stats", colour=discord.Colour.from_str("#1010D1"))
+        for name, counts in stats.items():
+            embed.add_field(name=name.capitalize(),
+                            value="\n".join(f"{value}: {count}" for value, count in counts.items()) or "None")
+        await ctx.send(embed=embed)
+
+    @commands.command(name="rebuildregstats", hidden=True) # type: ignore
+    @commands.is_owner() # type: ignore
+    async def rebuildregstats(self, ctx: commands.Context) -> None:
+        """Recount the registration stats from the registrations table"""
+        await ctx.send(await RegistrationStats.rebuild())
+
+    @commands.command(name="sweepmedia", hidden=True) # type: ignore
+    @commands.is_owner() # type: ignore
+    async def sweepmedia(self, ctx: commands.Context) -> None:
+        """Delete media store files no custom command uses anymore, once they are past the grace period"""
+        live = await CustomCommands.get_image_hashes()
+        removed = await asyncio.to_thread(media_store.sweep, live, SWEEP_GRACE_SECONDS)
+        await ctx.send(f"Removed {removed} unused file(s) older than {SWEEP_GRACE_SECONDS / 3600:g} hour(s), "
+                       f"{len(live)} still in use.")
+
     @commands.command(name="checkblacklist", hidden=True)
     @commands.is_owner()
     async def checkblacklist(self, ctx: commands.Context, user_id: int) -> None:
@@ -0,0 +1,205 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""Cog for PluralKit/Tupperbox style message proxying"""
+import io
+import json
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import aiohttp
+import discord
+from discord.app_commands import command, describe
+from discord.ext.commands import Cog, GroupCog
+from redis.exceptions import RedisError
+from database.db_io import ProxyMembers
+from utils.checks import app_not_blacklisted
+from utils.eligibility import UserFlags, get_flags
+from utils.log_delivery import WebhookCache
+from utils.logger import logger
+from utils.outbound import Priority
+from utils.proxy import ProxyMember, TagMatcher, export_pluralkit, stream_import
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+MATCHER_CACHE_SIZE = 50_000
+# Edits reach other clusters over IPC, this only bounds how stale a matcher gets if one of those messages is lost
+MATCHER_TTL = 600.0
+IMPORT_BATCH = 500
+MAX_IMPORT_BYTES = 50 * 1024 * 1024
+MAX_MEMBERS = 5000
+
+
+class Proxy(GroupCog, group_name="proxy", group_description="Speak as your proxy members"): # type: ignore
+    """Resends tagged messages through a channel webhook under the matching member's name and avatar"""
+    def __init__(self, bot: "Cynix") -> None:
+        self.bot = bot
+        self.webhooks = WebhookCache(bot, "Cynix Proxy")
+        # Users without members are cached too, so they only ever cost one lookup
+        self._matchers: "OrderedDict[int, Tuple[float, TagMatcher]]" = OrderedDict()
+
+    async def cog_load(self) -> None:
+        self.bot.ipc.register("proxy_invalidate", self._ipc_invalidate)
+
+    async def cog_unload(self) -> None:
+        self.bot.ipc.unregister("proxy_invalidate")
+
+    async def _ipc_invalidate(self, args: Dict[str, Any]) -> None:
+        """Drops a user's matcher after another cluster changed their members"""
+        self._matchers.pop(int(args["user_id"]), None)
+
+    async def _forget(self, user_id: int) -> None:
+        """Drops a user's matcher here and on every other cluster after their members changed"""
+        self._matchers.pop(user_id, None)
+        try:
+            await self.bot.ipc.broadcast("proxy_invalidate", user_id=user_id)
+        except RedisError as e:
+            logger.warning("Couldn't tell other clusters about %s's proxy change, it shows there within %ss: %s",
+                           user_id, MATCHER_TTL, e)
+
+    async def _get_matcher(self, user_id: int) -> TagMatcher:
+        cached = self._matchers.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            self._matchers.move_to_end(user_id)
+            return cached[1]
+        matcher = TagMatcher(await ProxyMembers.get_members(user_id))
+        self._matchers[user_id] = (time.monotonic() + MATCHER_TTL, matcher)
+        self._matchers.move_to_end(user_id)
+        if len(self._matchers) > MATCHER_CACHE_SIZE:
+            self._matchers.popitem(last=False)
+        return matcher
+
+    @Cog.listener() # type: ignore
+    async def on_message(self, message: discord.Message) -> None:
+        """Proxies a message if it carries one of the author's tags"""
+        if message.guild is None or message.author.bot or message.webhook_id is not None:
+            return
+        channel = message.channel
+        parent = channel.parent if isinstance(channel, discord.Thread) else channel
+        if not isinstance(parent, (discord.TextChannel, discord.ForumChannel)):
+            return
+        matcher = await self._get_matcher(message.author.id)
+        if not matcher:
+            return
+        match = matcher.match(message.content)
+        if match is None or await get_flags(message.author.id) & UserFlags.BLACKLISTED:
+            return
+
+        kwargs: Dict[str, Any] = {
+            "content": match.content,
+            "username": (match.member.display_name or match.member.name)[:80],
+            "avatar_url": match.member.avatar_url or discord.utils.MISSING,
+            "files": [await attachment.to_file() for attachment in message.attachments],
+            "allowed_mentions": discord.AllowedMentions(everyone=False, roles=False),
+        }
+        if isinstance(channel, discord.Thread):
+            kwargs["thread"] = channel
+        for attempt in range(2):
+            webhook = await self.webhooks.get(parent)
+            try:
+                await self.bot.outbound.send(webhook, Priority.INTERACTIVE, **kwargs)
+                break
+            except discord.NotFound:
+                # Someone deleted our webhook, make a new one once
+                self.webhooks.invalidate(parent.id)
+                if attempt:
+                    return
+            except discord.HTTPException as e:
+                logger.warning("Failed to proxy message %s: %s", message.id, e)
+                return
+        self.bot.message_snapshots.pop(channel.id, message.id)  # A proxied message isn't a deletion worth logging
+        try:
+            await message.delete()
+        except discord.HTTPException:
+            pass
+
+    @command(name="add", description="Add or replace a proxy member") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(name="The member's name", prefix="Text before a message, e.g. 'a:'", # type: ignore
+              suffix="Text after a message", avatar_url="A link to the member's avatar")
+    async def add(self, inter: discord.Interaction, name: str, prefix: Optional[str] = None,
+                  suffix: Optional[str] = None, avatar_url: Optional[str] = None) -> None:
+        """Adds a member with one proxy tag"""
+        if not prefix and not suffix:
+            await inter.response.send_message("A proxy member needs a prefix, a suffix or both.", ephemeral=True)
+            return
+        written = await ProxyMembers.upsert_members(
+            inter.user.id, [ProxyMember(name, None, avatar_url, ((prefix or "", suffix or ""),))])
+        await self._forget(inter.user.id)
+        await inter.response.send_message(f"Saved {name}." if written else
+                                          "Something went wrong, please check error logs.", ephemeral=True)
+
+    @command(name="remove", description="Remove a proxy member") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(name="The member's name") # type: ignore
+    async def remove(self, inter: discord.Interaction, name: str) -> None:
+        """Removes a member"""
+        result = await ProxyMembers.remove_member(inter.user.id, name)
+        await self._forget(inter.user.id)
+        await inter.response.send_message(result, ephemeral=True)
+
+    @command(name="list", description="List your proxy members") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    async def list_members(self, inter: discord.Interaction) -> None:
+        """Lists the user's members and their tags"""
+        members = await ProxyMembers.get_members(inter.user.id)
+        if not members:
+            await inter.response.send_message("You have no proxy members.", ephemeral=True)
+            return
+        lines = [f"**{member.name}**: " + ", ".join(f"`{prefix}text{suffix}`" for prefix, suffix in member.tags)
+                 for member in members]
+        text = "\n".join(lines)
+        await inter.response.send_message(text if len(text) <= 2000 else text[:1990] + "\n…", ephemeral=True)
+
+    @command(name="import", description="Import members from a PluralKit or Tupperbox export") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(file="The JSON file from pk;export or tul!export") # type: ignore
+    async def import_members(self, inter: discord.Interaction, file: discord.Attachment) -> None:
+        """Streams the export in, members are written in batches as they are read"""
+        if file.size > MAX_IMPORT_BYTES:
+            await inter.response.send_message("That file is too big to be an export.", ephemeral=True)
+            return
+        await inter.response.defer(ephemeral=True, thinking=True)
+        imported = 0
+        batch: Dict[str, ProxyMember] = {}  # Keyed by name, a later duplicate replaces an earlier one
+        try:
+            async with aiohttp.ClientSession() as http, http.get(file.url) as response:
+                response.raise_for_status()
+                async for member in stream_import(response.content.iter_chunked(64 * 1024)):
+                    batch[member.name] = member
+                    if len(batch) >= IMPORT_BATCH:
+                        imported += await self._write_batch(inter.user.id, batch)
+                    if imported + len(batch) >= MAX_MEMBERS:
+                        break
+            imported += await self._write_batch(inter.user.id, batch)
+        except (ValueError, aiohttp.ClientError) as e:
+            await inter.followup.send(f"Couldn't read that export after {imported} members: {e}", ephemeral=True)
+            return
+        finally:
+            await self._forget(inter.user.id)
+        await inter.followup.send(f"Imported {imported} members.", ephemeral=True)
+
+    @staticmethod
+    async def _write_batch(user_id: int, batch: Dict[str, ProxyMember]) -> int:
+        members: List[ProxyMember] = list(batch.values())
+        batch.clear()
+        written = await ProxyMembers.upsert_members(user_id, members)
+        if written is None:
+            raise ValueError("the database write failed")
+        return written
+
+    @command(name="export", description="Export your proxy members in PluralKit's format") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    async def export(self, inter: discord.Interaction) -> None:
+        """Sends the user's members as a file PluralKit and this bot can import"""
+        members = await ProxyMembers.get_members(inter.user.id)
+        data = json.dumps(export_pluralkit(members), ensure_ascii=False).encode()
+        await inter.response.send_message(file=discord.File(io.BytesIO(data), filename="proxies.json"),
+                                          ephemeral=True)
+
+
+async def setup(bot: "Cynix") -> None:
+    """Adds the cog to the bot"""
+    await bot.add_cog(Proxy(bot))
@@ -0,0 +1,112 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""Cog that logs reaction changes to the guild's reaction log channel"""
+from typing import TYPE_CHECKING, Dict, List, Tuple
+import discord
+from discord.ext import tasks
+from discord.ext.commands import Cog
+from utils.log_delivery import get_log_channel
+from utils.reaction_aggregator import ReactionAggregator, ReactionSummary
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+MAX_FIELD_LENGTH = 1024
+MAX_FIELDS = 25
+MAX_EMBED_LENGTH = 6000  # Discord's limit for the title, description, fields and footer together
+MIN_FIELD_LENGTH = 64  # Not worth a field below this, the rest go in the "+N more" line instead
+MORE_RESERVE = 32  # Room kept for that line
+
+
+def _mentions(user_ids: List[int], limit: int = MAX_FIELD_LENGTH) -> str:
+    """Joins user mentions, ending with how many more there are when they don't all fit in `limit`"""
+    text = ""
+    for shown, user_id in enumerate(user_ids):
+        mention = f"<@{user_id}> "
+        suffix = f"and {len(user_ids) - shown} more"
+        if len(text) + len(mention) + len(suffix) > limit:
+            return text + suffix
+        text += mention
+    return text.strip()
+
+
+def _field_value(lines: List[Tuple[str, List[int]]], limit: int) -> str:
+    """One line per label, each gets an even share of `limit` and is cut between mentions, never inside one"""
+    share = (limit - len(lines) + 1) // len(lines)
+    return "\n".join(f"{label} {_mentions(user_ids, share - len(label) - 1)}" for label, user_ids in lines)
+
+
+def _build_embed(summary: ReactionSummary) -> discord.Embed:
+    """Builds the log embed for a reaction summary, kept under Discord's total embed length"""
+    url = f"https://discord.com/channels/{summary.guild_id}/{summary.channel_id}/{summary.message_id}"
+    embed = discord.Embed(title="Reactions updated",
+                          description=f"[Jump to message]({url}) in <#{summary.channel_id}>",
+                          colour=discord.Colour.blurple(),
+                          timestamp=discord.utils.utcnow())
+    embed.set_footer(text=f"Message ID: {summary.message_id}")
+    changes: Dict[str, List[Tuple[str, List[int]]]] = {}
+    for label, emojis in (("**Added:**", summary.added), ("**Removed:**", summary.removed)):
+        for emoji, user_ids in emojis.items():
+            changes.setdefault(emoji, []).append((label, user_ids))
+    remaining = MAX_EMBED_LENGTH - len(embed) - MORE_RESERVE
+    shown = 0
+    for emoji, lines in changes.items():
+        limit = min(MAX_FIELD_LENGTH, remaining - len(emoji))
+        if shown == MAX_FIELDS or limit < MIN_FIELD_LENGTH:
+            break
+        value = _field_value(lines, limit)
+        embed.add_field(name=emoji, value=value, inline=False)
+        remaining -= len(emoji) + len(value)
+        shown += 1
+    if shown < len(changes):
+        embed.description = f"{embed.description}\n+{len(changes) - shown} more emojis"
+    return embed
+
+
+class ReactionLogs(Cog): # type: ignore
+    """Listens to raw reaction events, so no message cache is needed, and logs the net change per message"""
+    def __init__(self, bot: "Cynix") -> None:
+        self.bot = bot
+        self.aggregator = ReactionAggregator()
+
+    async def cog_load(self) -> None:
+        self.flush.start()
+
+    async def cog_unload(self) -> None:
+        self.flush.cancel()
+        self._deliver(self.aggregator.pop_all())
+
+    @tasks.loop(seconds=2) # type: ignore
+    async def flush(self) -> None:
+        """Sends the bursts whose window has closed"""
+        self._deliver(self.aggregator.pop_expired())
+
+    def _deliver(self, summaries: List[ReactionSummary]) -> None:
+        for summary in summaries:
+            self.bot.log_delivery.enqueue(summary.log_channel_id, _build_embed(summary))
+
+    async def _record(self, payload: discord.RawReactionActionEvent, delta: int) -> None:
+        if payload.guild_id is None:
+            return
+        log_channel_id = await get_log_channel(payload.guild_id, "reaction_logging")
+        if log_channel_id is None or log_channel_id == payload.channel_id:
+            return
+        self.aggregator.add(payload.guild_id, payload.channel_id, payload.message_id, log_channel_id,
+                            payload.user_id, str(payload.emoji), delta)
+
+    @Cog.listener() # type: ignore
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
+        """Records a reaction being added"""
+        await self._record(payload, 1)
+
+    @Cog.listener() # type: ignore
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent) -> None:
+        """Records a reaction being removed"""
+        await self._record(payload, -1)
+
+
+async def setup(bot: "Cynix") -> None:
+    """Adds the cog to the bot"""
+    await bot.add_cog(ReactionLogs(bot))
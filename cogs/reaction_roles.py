@@ -0,0 +1,176 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""Cog for reaction roles"""
+import asyncio
+import re
+from typing import TYPE_CHECKING, FrozenSet, Optional, Tuple
+import discord
+from discord import app_commands
+from discord.app_commands import command, describe
+from discord.ext.commands import Cog, GroupCog
+from database.db_io import ReactionRoles as ReactionRolesDb
+from utils.checks import app_not_blacklisted, role_grant_refusal
+from utils.logger import logger
+from utils.reaction_roles import ReactionRoleIndex, RoleBatcher
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+MESSAGE_LINK = re.compile(r"discord(?:app)?\.com/channels/(\d+)/(\d+)/(\d+)")
+
+
+def emoji_key(emoji: discord.PartialEmoji) -> str:
+    """Custom emojis are keyed by ID so renaming one doesn't break its roles"""
+    return str(emoji.id) if emoji.id else str(emoji.name)
+
+
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_roles=True)
+class ReactionRoles(GroupCog, group_name="reactionroles", group_description="Manage reaction roles"): # type: ignore
+    """Gives and takes roles as members react, a burst of reactions from one member becomes one role edit"""
+    def __init__(self, bot: "Cynix") -> None:
+        self.bot = bot
+        self.index: Optional[ReactionRoleIndex] = None
+        self._index_lock = asyncio.Lock()
+        self.batcher = RoleBatcher(self._apply)
+
+    async def cog_unload(self) -> None:
+        await self.batcher.close()
+
+    async def _load_index(self) -> ReactionRoleIndex:
+        async with self._index_lock:
+            if self.index is None:
+                # Reactions only arrive for guilds on our own shards, so other clusters' rows would never be read
+                self.index = ReactionRoleIndex(await ReactionRolesDb.get_all(list(self.bot.shards),
+                                                                             self.bot.shard_count or 1))
+                logger.info("Loaded %s reaction role messages", len(self.index))
+        return self.index
+
+    async def _refresh(self, message_id: int) -> None:
+        """Reloads one message's roles after its config changed"""
+        if self.index is not None:
+            self.index.replace(message_id, await ReactionRolesDb.get_message(message_id))
+
+    async def _reaction(self, payload: discord.RawReactionActionEvent, add: bool) -> None:
+        if payload.guild_id is None:
+            return
+        index = self.index if self.index is not None else await self._load_index()
+        role_id = index.lookup(payload.message_id, emoji_key(payload.emoji))
+        if role_id is None or payload.user_id == self.bot.user.id:
+            return
+        if payload.member is not None and payload.member.bot:
+            return
+        self.batcher.queue(payload.guild_id, payload.user_id, role_id, add)
+
+    async def _apply(self, guild_id: int, user_id: int, add: FrozenSet[int], remove: FrozenSet[int]) -> None:
+        """Applies one member's batched changes with a single edit"""
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
+        member = guild.get_member(user_id)
+        if member is None:
+            try:
+                member = await guild.fetch_member(user_id)
+            except discord.NotFound:
+                return
+        held = {role.id for role in member.roles if not role.is_default()}
+        # Roles that were deleted or moved above ours since they were configured are skipped, not retried
+        add = frozenset(role_id for role_id in add if (role := guild.get_role(role_id)) and role.is_assignable())
+        wanted = (held - remove) | add
+        if wanted == held:
+            return
+        try:
+            await member.edit(roles=[discord.Object(role_id) for role_id in wanted], reason="Reaction roles")
+        except discord.HTTPException as e:
+            logger.warning("Failed to update reaction roles for %s in %s: %s", user_id, guild_id, e)
+
+    @Cog.listener() # type: ignore
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
+        """Queues the role for a configured reaction"""
+        await self._reaction(payload, True)
+
+    @Cog.listener() # type: ignore
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent) -> None:
+        """Queues taking the role back for a configured reaction"""
+        await self._reaction(payload, False)
+
+    @staticmethod
+    def _resolve(inter: discord.Interaction, message: str) -> Optional[Tuple[int, int]]:
+        """Gets (channel ID, message ID) from a message link, or a message ID in the current channel"""
+        match = MESSAGE_LINK.search(message)
+        if match is not None:
+            if int(match.group(1)) != inter.guild_id:
+                return None
+            return int(match.group(2)), int(match.group(3))
+        message = message.strip()
+        return (inter.channel_id, int(message)) if message.isdigit() else None
+
+    @command(name="add", description="Give a role when members react to a message") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(message="A link to the message, or its ID if it is in this channel", emoji="The emoji to react with", # type: ignore
+              role="The role to give")
+    async def add(self, inter: discord.Interaction, message: str, emoji: str, role: discord.Role) -> None:
+        """Adds a reaction role and reacts to the message so members can click it"""
+        resolved = self._resolve(inter, message)
+        if resolved is None:
+            await inter.response.send_message("That isn't a message in this server.", ephemeral=True)
+            return
+        refusal = role_grant_refusal(inter.user, role)
+        if refusal is not None:
+            await inter.response.send_message(refusal, ephemeral=True)
+            return
+        channel_id, message_id = resolved
+        channel = inter.guild.get_channel_or_thread(channel_id)
+        if not isinstance(channel, (discord.TextChannel, discord.Thread)):
+            await inter.response.send_message("I can't see that channel.", ephemeral=True)
+            return
+        await inter.response.defer(ephemeral=True, thinking=True)
+        partial = discord.PartialEmoji.from_str(emoji.strip())
+        try:
+            # Reacting first also checks the emoji is real and usable by the bot
+            await channel.get_partial_message(message_id).add_reaction(partial)
+        except discord.HTTPException:
+            await inter.followup.send("I couldn't react to that message with that emoji.", ephemeral=True)
+            return
+        result = await ReactionRolesDb.set_role(inter.guild_id, channel_id, message_id, emoji_key(partial), role.id)
+        await self._refresh(message_id)
+        await inter.followup.send(result, ephemeral=True)
+
+    @command(name="remove", description="Stop giving a role for a reaction") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(message="A link to the message, or its ID if it is in this channel", # type: ignore
+              emoji="The emoji to remove, leave empty to remove every reaction role on the message")
+    async def remove(self, inter: discord.Interaction, message: str, emoji: Optional[str] = None) -> None:
+        """Removes one or all reaction roles from a message"""
+        resolved = self._resolve(inter, message)
+        if resolved is None:
+            await inter.response.send_message("That isn't a message in this server.", ephemeral=True)
+            return
+        key = emoji_key(discord.PartialEmoji.from_str(emoji.strip())) if emoji else None
+        result = await ReactionRolesDb.remove_role(inter.guild_id, resolved[1], key)
+        await self._refresh(resolved[1])
+        await inter.response.send_message(result, ephemeral=True)
+
+    @command(name="list", description="List this server's reaction roles") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    async def list_roles(self, inter: discord.Interaction) -> None:
+        """Lists every reaction role in the guild"""
+        entries = await ReactionRolesDb.get_guild(inter.guild_id)
+        if not entries:
+            await inter.response.send_message("This server has no reaction roles.", ephemeral=True)
+            return
+        lines = []
+        for entry in entries:
+            emoji = self.bot.get_emoji(int(entry.emoji)) if entry.emoji.isdigit() else entry.emoji
+            link = f"https://discord.com/channels/{inter.guild_id}/{entry.channel_id}/{entry.message_id}"
+            lines.append(f"{emoji or entry.emoji} → <@&{entry.role_id}> on {link}")
+        text = "\n".join(lines)
+        await inter.response.send_message(text if len(text) <= 2000 else text[:1990] + "\n…", ephemeral=True,
+                                          allowed_mentions=discord.AllowedMentions.none())
+
+
+async def setup(bot: "Cynix") -> None:
+    """Adds the cog to the bot"""
+    await bot.add_cog(ReactionRoles(bot))
@@ -14,9 +14,10 @@ from discord.ext.commands import GroupCog
 from discord.app_commands import command, Choice, check, describe
 from discord.ext import commands
 import utils.errors
-from utils.checks import app_not_blacklisted, nsfw_endpoint
+from utils.checks import app_eligible, nsfw_endpoint
 from utils.error_reporting import send_error
 from utils.errors import NSFWEndpointCalled
+from utils.outbound import Priority
 
 if TYPE_CHECKING:
     from bot import Cynix
@@ -86,7 +87,7 @@ class Sheri(GroupCog):
         self.bot = bot
 
     @command(name="image", description="Get a (SFW) image from the Sheri API")
-    @app_not_blacklisted()
+    @app_eligible()
     @describe(endpoint="The endpoint to call from")
     async def image(self, inter: discord.Interaction, endpoint: str):
         await inter.response.defer(thinking=True)
@@ -97,7 +98,7 @@ class Sheri(GroupCog):
             return
 
         message = await fetch_from_api(endpoint)
-        await inter.followup.send(embed=message)
+        await self.bot.outbound.send(inter.followup, Priority.INTERACTIVE, embed=message)
 
     @image.autocomplete("endpoint")
     async def image_autocomplete(self, inter: discord.Interaction, current: str) -> List[Choice[str]]:
@@ -0,0 +1,180 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""Cog for the starboard"""
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+import discord
+from discord import app_commands
+from discord.app_commands import command, describe
+from discord.ext import tasks
+from discord.ext.commands import Cog, GroupCog
+from database.db_io import Starboard as StarboardDb
+from utils.checks import app_not_blacklisted
+from utils.logger import logger
+from utils.outbound import Priority
+from utils.starboard import StarboardCache, StarboardSettings, StarState
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+# Each row is 6 bind parameters and Postgres takes at most 32767 per statement
+UPSERT_CHUNK = 1000
+
+
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True)
+class Starboard(GroupCog): # type: ignore
+    """Starboard with in-memory star counts, database writes and post edits are debounced"""
+    def __init__(self, bot: "Cynix") -> None:
+        self.bot = bot
+        self.cache = StarboardCache()
+        self._settings: Dict[int, Optional[StarboardSettings]] = {}
+        self._loading: Dict[int, "asyncio.Future[Optional[StarState]]"] = {}
+
+    async def cog_load(self) -> None:
+        self.flush.start()
+
+    async def cog_unload(self) -> None:
+        self.flush.cancel()
+        await self._flush()
+
+    async def _get_settings(self, guild_id: int) -> Optional[StarboardSettings]:
+        if guild_id not in self._settings:
+            config = await StarboardDb.get_config(guild_id)
+            self._settings[guild_id] = StarboardSettings(config.channel_id, config.threshold, config.emoji) \
+                if config else None
+        return self._settings[guild_id]
+
+    async def _load_state(self, payload: discord.RawReactionActionEvent, emoji: str) -> Optional[StarState]:
+        """Loads a message's star state from the database, or counts it from Discord the first time"""
+        entry = await StarboardDb.get_entry(payload.message_id)
+        if entry is not None:
+            return StarState(entry.message_id, entry.guild_id, entry.channel_id, entry.author_id,
+                             entry.stars, entry.star_message_id)
+        channel = self.bot.get_channel(payload.channel_id)
+        if not isinstance(channel, (discord.TextChannel, discord.Thread)):
+            return None
+        try:
+            message = await channel.fetch_message(payload.message_id)
+        except discord.HTTPException:
+            return None
+        stars = next((reaction.count for reaction in message.reactions if str(reaction.emoji) == emoji), 0)
+        state = StarState(message.id, payload.guild_id, channel.id, message.author.id, stars)
+        # The fetched count already includes this reaction, so it counts as the change
+        state.db_dirty = state.post_dirty = True
+        return state
+
+    async def _reaction(self, payload: discord.RawReactionActionEvent, delta: int) -> None:
+        if payload.guild_id is None:
+            return
+        settings = await self._get_settings(payload.guild_id)
+        if settings is None or payload.channel_id == settings.channel_id or str(payload.emoji) != settings.emoji:
+            return
+        state = self.cache.get(payload.message_id)
+        if state is not None:
+            self.cache.apply(state, delta)
+            return
+
+        # Only one load per message, reactions that arrive meanwhile wait for it
+        pending = self._loading.get(payload.message_id)
+        if pending is not None:
+            state = await pending
+            if state is not None:
+                self.cache.apply(state, delta)
+            return
+        future: "asyncio.Future[Optional[StarState]]" = asyncio.get_running_loop().create_future()
+        self._loading[payload.message_id] = future
+        try:
+            state = await self._load_state(payload, settings.emoji)
+            if state is not None:
+                if not state.db_dirty:
+                    self.cache.apply(state, delta)
+                self.cache.put(state)
+            future.set_result(state)
+        except Exception as e: # pylint: disable=W0718
+            future.set_result(None)
+            logger.error("Failed to load starboard state for %s: %s", payload.message_id, e, exc_info=True)
+        finally:
+            del self._loading[payload.message_id]
+
+    @Cog.listener() # type: ignore
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
+        """Counts a star"""
+        await self._reaction(payload, 1)
+
+    @Cog.listener() # type: ignore
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent) -> None:
+        """Removes a star"""
+        await self._reaction(payload, -1)
+
+    @tasks.loop(seconds=5) # type: ignore
+    async def flush(self) -> None:
+        """Writes the changed counts and updates the starboard posts"""
+        await self._flush()
+
+    async def _flush(self) -> None:
+        thresholds = {guild_id: settings.threshold for guild_id, settings in self._settings.items() if settings}
+        for state in self.cache.take_due_posts(thresholds, time.monotonic()):
+            try:
+                await self._update_post(state)
+            except discord.NotFound:
+                pass  # The starred message or its post is gone, trying again won't bring it back
+            except discord.HTTPException as e:
+                state.post_dirty = True  # Picked up again once the edit interval has passed
+                logger.error("Failed to update starboard post for %s: %s", state.message_id, e)
+        dirty = self.cache.take_db_dirty()
+        for start in range(0, len(dirty), UPSERT_CHUNK):
+            chunk = dirty[start:start + UPSERT_CHUNK]
+            if not await StarboardDb.upsert_entries([state.to_row() for state in chunk]):
+                for state in chunk:
+                    state.db_dirty = True
+
+    async def _update_post(self, state: StarState) -> None:
+        settings = self._settings.get(state.guild_id)
+        if settings is None:
+            return
+        starboard = self.bot.get_channel(settings.channel_id)
+        if not isinstance(starboard, discord.TextChannel):
+            return
+        content = f"{settings.emoji} **{state.stars}** | <#{state.channel_id}>"
+        if state.star_message_id is not None:
+            # Partial messages need no fetch, the edit is the only API call
+            await starboard.get_partial_message(state.star_message_id).edit(content=content)
+            return
+
+        source = self.bot.get_channel(state.channel_id)
+        if not isinstance(source, (discord.TextChannel, discord.Thread)):
+            return
+        message = await source.fetch_message(state.message_id)
+        embed = discord.Embed(description=message.content or None,
+                              colour=discord.Colour.gold(),
+                              timestamp=message.created_at)
+        embed.set_author(name=message.author.display_name, icon_url=message.author.display_avatar.url)
+        embed.add_field(name="Source", value=f"[Jump to message]({message.jump_url})")
+        image = next((attachment.url for attachment in message.attachments
+                      if attachment.content_type and attachment.content_type.startswith("image/")), None)
+        if image:
+            embed.set_image(url=image)
+        post = await self.bot.outbound.send(starboard, Priority.NORMAL, content=content, embed=embed)
+        state.star_message_id = post.id
+        state.db_dirty = True
+
+    @command(name="setup", description="Set up the starboard for this server") # type: ignore
+    @app_not_blacklisted() # type: ignore
+    @describe(channel="The channel starred messages are posted in", # type: ignore
+              threshold="How many stars a message needs",
+              emoji="The emoji that counts as a star")
+    async def setup_starboard(self, inter: discord.Interaction, channel: discord.TextChannel,
+                              threshold: app_commands.Range[int, 1, 100] = 3, emoji: str = "⭐") -> None:
+        """Sets the starboard channel, threshold and emoji"""
+        result = await StarboardDb.set_config(inter.guild_id, channel_id=channel.id, threshold=threshold, emoji=emoji)
+        self._settings.pop(inter.guild_id, None)
+        await inter.response.send_message(result, ephemeral=True)
+
+
+async def setup(bot: "Cynix") -> None:
+    """Adds the cog to the bot"""
+    await bot.add_cog(Starboard(bot))
@@ -4,24 +4,52 @@
 # To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
 """Contains the functions to interact with the database"""
 import traceback
-from typing import Union, Any, cast, Optional, List, Dict
+from enum import Enum
+from typing import Union, Any, cast, Optional, List, Dict, Set, AsyncIterator, Tuple, Sequence
 from datetime import datetime as dt, timezone as tz
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy import select, func, delete, tuple_, text, literal
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
 from utils.logger import logger
 from utils.error_reporting import send_error
 from utils import enums
+from database.projections import fetch_one, fetch_all
 from database.makedb import (
     session_factory,
+    read_session_factory,
     Logs as DbLog,
     Punishments as DbPunishments,
     CustomCommands as DbCc,
     Registration as DbReg,
+    RegistrationStats as DbRegStats,
     Levels as DbLvl,
+    LevelRoles as DbLvlRoles,
+    ReactionRoles as DbReactRoles,
     RegRoles as DbRr,
-    BlacklistedUsers as DbBl,)
-from utils.redis import blacklist_user_redis, is_user_blacklisted, remove_user_redis
+    BlacklistedUsers as DbBl,
+    StarboardConfig as DbSbConfig,
+    StarboardEntries as DbSbEntry,
+    GuildCleanup as DbCleanup,
+    ProxyMembers as DbProxy,)
+from utils.redis import (blacklist_user_redis,
+                         is_user_blacklisted,
+                         remove_user_redis,
+                         filter_blacklisted,
+                         get_blacklist_hwm,
+                         apply_blacklist_delta,
+                         rebuild_blacklist)
+from utils.log_delivery import invalidate_log_config, LOG_KINDS
+from utils.level_curve import invalidate_guild_levelling, get_guild_levelling, XpGrant
+from utils.eligibility import invalidate_eligibility, clear_eligibility
+from utils.proxy import ProxyMember
+
+
+def on_shards(guild_id: Any, shard_ids: List[int], shard_count: int) -> Any:
+    """Filters a guild ID column to the guilds on `shard_ids`, worked out from the ID the same way Discord does"""
+    return (guild_id.op(">>")(22) % shard_count).in_(shard_ids)
+
 
 class Logs: # Checked and working, finalized
     """Defines the log structure"""
@@ -37,13 +65,13 @@ class Logs: # Checked and working, finalized
     @staticmethod
     async def check_guild(guild_id: int) -> bool:
         """Checks if the guild is already in the database"""
-        async with session_factory() as session:
+        async with read_session_factory() as session:
             return await Logs._get_guild_entry(guild_id, session) is not None
 
     @staticmethod
     async def get_guild(guild_id: int) -> Union[DbLog, None, str]:
         """Gets a guild from the database"""
-        async with session_factory() as session:
+        async with read_session_factory() as session:
             try:
                 return await Logs._get_guild_entry(guild_id, session)
             except SQLAlchemyError as e:
@@ -62,6 +90,8 @@ class Logs: # Checked and working, finalized
                     raise ValueError(f"No guild found with id {guild_id}")
                 await session.delete(entry)
                 await session.commit()
+                invalidate_log_config(guild_id)
+                invalidate_guild_levelling(guild_id)
                 return f"Guild with id {guild_id} was removed."
             except SQLAlchemyError as e:
                 tb_str = traceback.format_exc()
@@ -89,6 +119,30 @@ class Logs: # Checked and working, finalized
                 logger.error("Database error while adding guild entry on guild join: %s\nRolling back...", e, exc_info=True)
                 return "Something went wrong, please check error logs."
 
+    @staticmethod
+    async def ensure_guilds(guild_ids: List[int], chunk_size: int = 1000) -> Optional[int]:
+        """
+        Adds a row for each guild that doesn't have one yet, rows other tables reference must exist before
+        anything is stored for a guild. Returns how many were added, None if the write failed.
+        """
+        added = 0
+        async with session_factory() as session:
+            try:
+                for start in range(0, len(guild_ids), chunk_size):
+                    statement = insert(DbLog).values(
+                        [{"guild_id": guild_id} for guild_id in guild_ids[start:start + chunk_size]])
+                    result = await session.execute(statement.on_conflict_do_nothing(index_elements=[DbLog.guild_id]))
+                    added += result.rowcount
+                await session.commit()
+                return added
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while adding guild entries: %s\nRolling back...", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("ensure_guilds", f"{str(e)}\n{tb_str}")
+                return None
+
 
     @staticmethod
     async def update_guild(guild_id: int, **kwargs: Any) -> str:
@@ -103,6 +157,8 @@ class Logs: # Checked and working, finalized
                         setattr(guild_entry, key, value)
 
                     await session.commit()
+                    invalidate_log_config(guild_id)
+                    invalidate_guild_levelling(guild_id)
                     return "The operation completed successfully."
                 except SQLAlchemyError as e:
                     tb_str = traceback.format_exc()
@@ -122,6 +178,24 @@ class Logs: # Checked and working, finalized
                       ).scalars().one_or_none()
             return result if result is not None else None
 
+    @staticmethod
+    async def get_levelling_config(guild_id: int) -> Tuple[Optional[str], Optional[float], bool]:
+        """Gets a guild's XP curve name, multiplier and whether level ups are announced in one query"""
+        async with read_session_factory() as session:
+            row = (await session.execute(
+                select(DbLog.xp_curve, DbLog.xp_multiplier, DbLog.level_up_messages).filter(DbLog.guild_id == guild_id))
+                   ).first()
+            return (row[0], row[1], bool(row[2])) if row else (None, None, False)
+
+    @staticmethod
+    async def get_log_channels(guild_id: int) -> Optional[Dict[str, Optional[int]]]:
+        """Gets just the log channel IDs for a guild"""
+        async with read_session_factory() as session:
+            row = (await session.execute(
+                select(*(getattr(DbLog, kind) for kind in LOG_KINDS)).filter(DbLog.guild_id == guild_id))
+                   ).first()
+            return dict(zip(LOG_KINDS, row)) if row else None
+
 
 class Punishments: # Checked and working, finalized
     """Defines the punishment structure"""
@@ -219,19 +293,20 @@ class CustomCommands: # pylint: disable=R0903
     """Defines the custom commands structure"""
 
     @staticmethod
-    async def _get_command_entry(name: str, session: AsyncSession) -> Optional[DbCc]:
+    async def _get_command_entry(guild_id: int, name: str, session: AsyncSession) -> Optional[DbCc]:
         """Helper method to get a command entry"""
-        result = await session.execute(select(DbCc).filter(DbCc.name == name))
+        result = await session.execute(select(DbCc).filter(DbCc.guild_id == guild_id, DbCc.name == name))
         entry = result.scalars().first()
         return entry if isinstance(entry, DbCc) else None
 
     @staticmethod
-    async def add_custom_command(**kwargs: Any) -> str:
+    async def add_custom_command(guild_id: int, **kwargs: Any) -> str:
         """Adds a custom command to the database"""
         async with session_factory() as session:
             try:
                 valid_fields = {c.name for c in DbCc.__table__.columns}
                 updates = {k: v for k, v in kwargs.items() if k in valid_fields and v is not None}
+                updates["guild_id"] = guild_id
 
                 custom_command_entry = DbCc(**updates)
                 session.add(custom_command_entry)
@@ -239,6 +314,9 @@ class CustomCommands: # pylint: disable=R0903
 
                 return "The custom command was added to the database successfully."
 
+            except IntegrityError:
+                await session.rollback()
+                return "This server already has a custom command with that name or trigger."
             except SQLAlchemyError as e:
                 tb_str = traceback.format_exc()
                 await send_error("add_custom_command", f"{str(e)}\n{tb_str}")
@@ -248,21 +326,37 @@ class CustomCommands: # pylint: disable=R0903
                 return "Something went wrong, please check error logs."
 
     @staticmethod
-    async def get_custom_command(name: str) -> Union[DbCc, None]:
+    async def get_custom_command(guild_id: int, name: str) -> Union[DbCc, None]:
         """Gets a custom command from the database"""
         async with session_factory() as session:
-            entry = await CustomCommands._get_command_entry(name, session)
+            entry = await CustomCommands._get_command_entry(guild_id, name, session)
             return entry or None
 
     @staticmethod
-    async def edit_custom_command(name: str, **kwargs: Any) -> str:
-        """Edits a custom command from the database"""
+    async def get_triggers(guild_id: int) -> Dict[str, str]:
+        """Gets a guild's keyword triggers as trigger -> command name"""
+        async with read_session_factory() as session:
+            rows = (await session.execute(select(DbCc.trigger, DbCc.name).filter(
+                DbCc.guild_id == guild_id, DbCc.trigger.isnot(None)))).all()
+            return {trigger: name for trigger, name in rows}
+
+    @staticmethod
+    async def get_image_hashes() -> Set[str]:
+        """Gets every image hash still referenced, for sweeping the media store"""
+        async with read_session_factory() as session:
+            rows = await session.execute(select(DbCc.image_hash).filter(DbCc.image_hash.isnot(None)).distinct())
+            return set(rows.scalars())
+
+    @staticmethod
+    async def edit_custom_command(guild_id: int, name: str, clear: Sequence[str] = (), **kwargs: Any) -> str:
+        """Edits a custom command from the database, None values are left alone and fields in clear are set to NULL"""
         async with session_factory() as session:
-            custom_command_entry = await CustomCommands._get_command_entry(name, session)
+            custom_command_entry = await CustomCommands._get_command_entry(guild_id, name, session)
             if custom_command_entry:
                 try:
-                    valid_fields = {c.name for c in DbCc.__table__.columns}
+                    valid_fields = {c.name for c in DbCc.__table__.columns} - {"guild_id", "name"}
                     updates = {k: v for k, v in kwargs.items() if k in valid_fields and v is not None}
+                    updates.update({k: None for k in clear if k in valid_fields})
                     for key, value in updates.items():
                         setattr(custom_command_entry, key, value)
 
@@ -270,6 +364,9 @@ class CustomCommands: # pylint: disable=R0903
                     await session.commit()
                     return "The custom command was updated successfully."
 
+                except IntegrityError:
+                    await session.rollback()
+                    return "This server already has a custom command with that trigger."
                 except SQLAlchemyError as e:
                     tb_str = traceback.format_exc()
                     await send_error("edit_custom_command", f"{str(e)}\n{tb_str}")
@@ -277,11 +374,37 @@ class CustomCommands: # pylint: disable=R0903
             return "No custom command was found."
 
     @staticmethod
-    async def delete_custom_command(name: str) -> str:
+    async def claim_legacy_command(guild_id: int, name: str, owner_id: int) -> str:
+        """
+        Moves a command made before commands were per guild into a guild.
+        Those were migrated to guild 0, which nothing reads, so only the user who made one can claim it.
+        """
+        async with session_factory() as session:
+            try:
+                entry = await CustomCommands._get_command_entry(0, name, session)
+                if entry is None or entry.owner_id != owner_id:
+                    return "You have no unclaimed custom command with that name."
+                entry.guild_id = guild_id
+                await session.commit()
+                return "The custom command was moved to this server successfully."
+
+            except IntegrityError:
+                await session.rollback()
+                return "This server already has a custom command with that name or trigger."
+            except SQLAlchemyError as e:
+                tb_str = traceback.format_exc()
+                await send_error("claim_legacy_command", f"{str(e)}\n{tb_str}")
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while claiming custom command: %s\nRolling back....", e, exc_info=True)
+                return "Something went wrong, please check error logs."
+
+    @staticmethod
+    async def delete_custom_command(guild_id: int, name: str) -> str:
         """Deletes a custom command from the database"""
         async with session_factory() as session:
             try:
-                command_entry = await CustomCommands._get_command_entry(name, session)
+                command_entry = await CustomCommands._get_command_entry(guild_id, name, session)
                 if command_entry:
                     await session.delete(command_entry)
                     await session.commit()
@@ -337,7 +460,9 @@ class Registration:
                     artist_lockout=False
                 )
                 session.add(user_entry)
+                await RegistrationStats.adjust(session, RegistrationStats.deltas(None, user_entry))
                 await session.commit()
+                await invalidate_eligibility([user_id])
                 return "The user was registered successfully."
 
             except SQLAlchemyError as e:
@@ -357,9 +482,12 @@ class Registration:
                 try:
                     valid_fields = {c.name for c in DbReg.__table__.columns}
                     updates = {k: v for k, v in kwargs.items() if k in valid_fields and v is not None}
+                    before = RegistrationStats.snapshot(user_entry)
                     for key, value in updates.items():
                         setattr(user_entry, key, value)
+                    await RegistrationStats.adjust(session, RegistrationStats.deltas(before, user_entry))
                     await session.commit()
+                    await invalidate_eligibility([user_id])
                     return "The registration entry was updated successfully."
 
                 except SQLAlchemyError as e:
@@ -372,11 +500,10 @@ class Registration:
             return "No user found"
 
     @staticmethod
-    async def check_user_entry(user_id: int) -> Optional[DbReg]:
-        """Checks a registration entry"""
-        async with session_factory() as session:
-            result = await Registration._get_reg_entry(user_id, session)
-        return result if result else None
+    async def check_user_entry(user_id: int, *columns: str) -> Optional[Any]:
+        """Gets a registration entry as a read-only record of `columns`, every column if none are given"""
+        async with read_session_factory() as session:
+            return await fetch_one(session, DbReg, columns, DbReg.user_id == user_id)
 
     @staticmethod
     async def delete_user_entry(user_id: int) -> Optional[str]:
@@ -385,8 +512,11 @@ class Registration:
             try:
                 result = await Registration._get_reg_entry(user_id, session)
                 if result:
+                    await RegistrationStats.adjust(
+                        session, RegistrationStats.deltas(RegistrationStats.snapshot(result), None))
                     await session.delete(result)
                     await session.commit()
+                    await invalidate_eligibility([user_id])
                     return "The user was deleted successfully."
                 return None
             except SQLAlchemyError as e:
@@ -398,6 +528,93 @@ class Registration:
                 return "Something went wrong, please check error logs."
 
 
+class RegistrationStats:
+    """
+    Defines the registration counters. Every registration write adjusts them in the same transaction,
+    so reading the stats only touches one row per enum value instead of scanning registrations.
+    """
+    FIELDS = {
+        "gender": enums.Gender,
+        "sexuality": enums.Sexuality,
+        "position": enums.Position,
+        "dms": enums.Dms,
+        "relationship": enums.Relationship,
+    }
+
+    @staticmethod
+    def _value(value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        return str(value.value) if isinstance(value, Enum) else str(value)
+
+    @staticmethod
+    def snapshot(entry: DbReg) -> Dict[str, Optional[str]]:
+        """Gets the counted fields of an entry, taken before it is changed"""
+        return {field: RegistrationStats._value(getattr(entry, field)) for field in RegistrationStats.FIELDS}
+
+    @staticmethod
+    def deltas(before: Optional[Dict[str, Optional[str]]], after: Optional[DbReg]) -> Dict[Tuple[str, str], int]:
+        """Works out the counter changes between two states of an entry, None meaning no entry"""
+        after_values = RegistrationStats.snapshot(after) if after is not None else {}
+        changes: Dict[Tuple[str, str], int] = {}
+        for field in RegistrationStats.FIELDS:
+            old = before.get(field) if before else None
+            new = after_values.get(field)
+            if old == new:
+                continue
+            if old is not None:
+                changes[(field, old)] = changes.get((field, old), 0) - 1
+            if new is not None:
+                changes[(field, new)] = changes.get((field, new), 0) + 1
+        return changes
+
+    @staticmethod
+    async def adjust(session: AsyncSession, changes: Dict[Tuple[str, str], int]) -> None:
+        """Applies counter changes in one statement, inside the caller's transaction"""
+        if not changes:
+            return
+        statement = insert(DbRegStats).values(
+            [{"field": field, "value": value, "count": delta} for (field, value), delta in changes.items()])
+        await session.execute(statement.on_conflict_do_update(
+            index_elements=[DbRegStats.field, DbRegStats.value],
+            set_={"count": DbRegStats.count + statement.excluded.count}))
+
+    @staticmethod
+    async def get_stats(field: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Gets the counts per value for one field or all of them, every enum value is included even at 0"""
+        fields = [field] if field else list(RegistrationStats.FIELDS)
+        stats = {name: {member.value: 0 for member in RegistrationStats.FIELDS[name]} for name in fields}
+        async with read_session_factory() as session:
+            rows = await session.execute(select(DbRegStats.field, DbRegStats.value, DbRegStats.count)
+                                         .filter(DbRegStats.field.in_(fields)))
+            for name, value, count in rows:
+                stats[name][value] = int(count)
+        return stats
+
+    @staticmethod
+    async def rebuild() -> str:
+        """Recounts everything from the registrations table"""
+        async with session_factory() as session:
+            try:
+                # Writes wait for the recount so none of them are counted twice or missed
+                await session.execute(text("LOCK TABLE registrations IN SHARE MODE"))
+                await session.execute(delete(DbRegStats))
+                for field in RegistrationStats.FIELDS:
+                    column = getattr(DbReg, field)
+                    await session.execute(insert(DbRegStats).from_select(
+                        ["field", "value", "count"],
+                        select(literal(field), column, func.count()).filter(column.isnot(None)).group_by(column)))
+                await session.commit()
+                return "Registration stats rebuilt."
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while rebuilding registration stats: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("rebuild_registration_stats", f"{str(e)}\n{tb_str}")
+                return "Something went wrong, please check error logs."
+
+
 class Levels:
     """Defines the Levels structure"""
 
@@ -425,7 +642,7 @@ class Levels:
     @staticmethod
     async def get_user_in_guild(guild_id: int, user_id: int) -> Union[DbLvl, str]:
         """Gets a user from a guild"""
-        async with session_factory() as session:
+        async with read_session_factory() as session:
             user_entry = (await session.execute(select(DbLvl).filter(DbLvl.guild_id == guild_id, DbLvl.user_id == user_id))).scalars().first()
             if user_entry:
                 return cast(DbLvl, user_entry)
@@ -438,6 +655,32 @@ class Levels:
             users = (await session.execute(select(DbLvl).filter(DbLvl.guild_id == guild_id))).scalars().all()
             return cast(list[DbLvl], users)
 
+    @staticmethod
+    async def stream_guild_levels(guild_id: int, after_user_id: int = 0,
+                                  chunk_size: int = 1000) -> AsyncIterator[List[Tuple[int, int]]]:
+        """Streams (user_id, xp) for a guild in user ID order, starting after `after_user_id` so jobs can resume"""
+        while True:
+            async with read_session_factory() as session:
+                rows = (await session.execute(
+                    select(DbLvl.user_id, DbLvl.xp)
+                    .filter(DbLvl.guild_id == guild_id, DbLvl.user_id > after_user_id)
+                    .order_by(DbLvl.user_id)
+                    .limit(chunk_size))).all()
+            if not rows:
+                return
+            yield [(int(user_id), int(xp)) for user_id, xp in rows]
+            if len(rows) < chunk_size:
+                return
+            after_user_id = rows[-1][0]
+
+    @staticmethod
+    async def get_leaderboard(guild_id: int, limit: int = 10, offset: int = 0) -> List[Tuple[int, int]]:
+        """Gets (user_id, xp) for a guild's top members, walks the (guild_id, xp DESC) index"""
+        async with read_session_factory() as session:
+            rows = await session.execute(select(DbLvl.user_id, DbLvl.xp).filter(DbLvl.guild_id == guild_id)
+                                         .order_by(DbLvl.xp.desc()).limit(limit).offset(offset))
+            return [(int(user_id), int(xp)) for user_id, xp in rows]
+
     @staticmethod
     async def get_all_guilds() -> Optional[List[int]]:
         """Gets all unique guild IDs"""
@@ -474,6 +717,43 @@ class Levels:
                 await send_error("add_xp", f"{str(e)}\n{tb_str}")
                 return "Something went wrong, please check error logs."
 
+    @staticmethod
+    async def grant_xp(guild_id: int, user_id: int, xp: int) -> Optional[int]:
+        """Adds XP to a user, creating their entry if needed, in one statement. Returns the new total."""
+        statement = insert(DbLvl).values(guild_id=guild_id, user_id=user_id, xp=xp)
+        statement = statement.on_conflict_do_update(
+            index_elements=[DbLvl.guild_id, DbLvl.user_id],
+            set_={"xp": DbLvl.xp + statement.excluded.xp},
+        ).returning(DbLvl.xp)
+        async with session_factory() as session:
+            try:
+                try:
+                    total = (await session.execute(statement)).scalar_one()
+                except IntegrityError:
+                    # The guild has no logs row for levels to reference yet, add it and try once more
+                    await session.rollback()
+                    await Logs.ensure_guilds([guild_id])
+                    total = (await session.execute(statement)).scalar_one()
+                await session.commit()
+                return int(total)
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while granting XP: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("grant_xp", f"{str(e)}\n{tb_str}")
+                return None
+
+    @staticmethod
+    async def award_xp(guild_id: int, user_id: int, base_xp: int) -> Optional[XpGrant]:
+        """Grants XP scaled by the guild's multiplier and returns the level boundaries it crossed"""
+        curve, multiplier = await get_guild_levelling(guild_id)
+        gained = round(base_xp * multiplier)
+        total = await Levels.grant_xp(guild_id, user_id, gained)
+        if total is None:
+            return None
+        return XpGrant(total, gained, curve.crossed(total - gained, total))
+
     @staticmethod
     async def remove_xp(guild_id: int, user_id: int, xp: int) -> str:
         """Removes XP from a user."""
@@ -517,6 +797,123 @@ class Levels:
                 return "Something went wrong, please check error logs."
 
 
+class LevelRoles:
+    """Defines the level reward roles structure"""
+
+    @staticmethod
+    async def get_rewards(guild_id: int) -> Dict[int, int]:
+        """Gets a guild's reward roles as level -> role ID"""
+        async with read_session_factory() as session:
+            rows = (await session.execute(
+                select(DbLvlRoles.level, DbLvlRoles.role_id).filter(DbLvlRoles.guild_id == guild_id))).all()
+            return {int(level): int(role_id) for level, role_id in rows}
+
+    @staticmethod
+    async def set_reward(guild_id: int, level: int, role_id: int) -> str:
+        """Sets the reward role for a level"""
+        async with session_factory() as session:
+            try:
+                statement = insert(DbLvlRoles).values(guild_id=guild_id, level=level, role_id=role_id)
+                await session.execute(statement.on_conflict_do_update(
+                    index_elements=[DbLvlRoles.guild_id, DbLvlRoles.level], set_={"role_id": role_id}))
+                await session.commit()
+                return f"Level {level} now rewards <@&{role_id}>."
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while setting level reward: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("set_reward", f"{str(e)}\n{tb_str}")
+                return "Something went wrong, please check error logs."
+
+    @staticmethod
+    async def remove_reward(guild_id: int, level: int) -> str:
+        """Removes the reward role for a level"""
+        async with session_factory() as session:
+            try:
+                entry = (await session.execute(select(DbLvlRoles).filter(
+                    DbLvlRoles.guild_id == guild_id, DbLvlRoles.level == level))).scalars().first()
+                if not entry:
+                    return f"Level {level} has no reward role."
+                await session.delete(entry)
+                await session.commit()
+                return f"Removed the reward role for level {level}."
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while removing level reward: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("remove_reward", f"{str(e)}\n{tb_str}")
+                return "Something went wrong, please check error logs."
+
+
+class ReactionRoles:
+    """Defines the reaction roles structure"""
+
+    @staticmethod
+    async def get_all(shard_ids: List[int], shard_count: int) -> List[Tuple[int, str, int]]:
+        """Gets every reaction role in guilds on these shards as (message ID, emoji, role ID), used to build the index"""
+        async with read_session_factory() as session:
+            rows = await session.execute(select(DbReactRoles.message_id, DbReactRoles.emoji, DbReactRoles.role_id)
+                                         .filter(on_shards(DbReactRoles.guild_id, shard_ids, shard_count)))
+            return [(int(message_id), emoji, int(role_id)) for message_id, emoji, role_id in rows]
+
+    @staticmethod
+    async def get_message(message_id: int) -> Dict[str, int]:
+        """Gets one message's reaction roles as emoji -> role ID"""
+        async with session_factory() as session:  # Read right after a config write, so never from a replica
+            rows = await session.execute(select(DbReactRoles.emoji, DbReactRoles.role_id)
+                                         .filter(DbReactRoles.message_id == message_id))
+            return {emoji: int(role_id) for emoji, role_id in rows}
+
+    @staticmethod
+    async def get_guild(guild_id: int) -> List[Any]:
+        """Gets a guild's reaction roles as records"""
+        async with read_session_factory() as session:
+            return await fetch_all(session, DbReactRoles, ("message_id", "channel_id", "emoji", "role_id"),
+                                   DbReactRoles.guild_id == guild_id)
+
+    @staticmethod
+    async def set_role(guild_id: int, channel_id: int, message_id: int, emoji: str, role_id: int) -> str: # pylint: disable=R0913,R0917
+        """Sets the role an emoji on a message gives"""
+        async with session_factory() as session:
+            try:
+                statement = insert(DbReactRoles).values(guild_id=guild_id, channel_id=channel_id,
+                                                        message_id=message_id, emoji=emoji, role_id=role_id)
+                await session.execute(statement.on_conflict_do_update(
+                    index_elements=[DbReactRoles.message_id, DbReactRoles.emoji], set_={"role_id": role_id}))
+                await session.commit()
+                return f"Reacting on that message now gives <@&{role_id}>."
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while setting reaction role: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("set_reaction_role", f"{str(e)}\n{tb_str}")
+                return "Something went wrong, please check error logs."
+
+    @staticmethod
+    async def remove_role(guild_id: int, message_id: int, emoji: Optional[str] = None) -> str:
+        """Removes one emoji from a reaction role message, or every emoji if none is given"""
+        async with session_factory() as session:
+            try:
+                criteria = [DbReactRoles.guild_id == guild_id, DbReactRoles.message_id == message_id]
+                if emoji is not None:
+                    criteria.append(DbReactRoles.emoji == emoji)
+                result = await session.execute(delete(DbReactRoles).where(*criteria))
+                await session.commit()
+                if not result.rowcount:
+                    return "That message has no matching reaction roles."
+                return f"Removed {result.rowcount} reaction role(s)."
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while removing reaction role: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("remove_reaction_role", f"{str(e)}\n{tb_str}")
+                return "Something went wrong, please check error logs."
+
+
 class RegRoles:
     """Defines the RegRoles structure"""
 
@@ -561,11 +958,10 @@ class RegRoles:
             return "Something went wrong, please check error logs."
 
     @staticmethod
-    async def get_roles(guild_id: int) -> Optional[List[int]]:
-        """Gets and returns the roles from the db"""
-        async with session_factory() as session:
-            entry = (await session.execute(select(DbRr).filter(DbRr.guild_id == guild_id))).scalars().first()
-            return entry if entry else None
+    async def get_roles(guild_id: int, *columns: str) -> Optional[Any]:
+        """Gets the role IDs in `columns` as a read-only record, every column if none are given"""
+        async with read_session_factory() as session:
+            return await fetch_one(session, DbRr, columns, DbRr.guild_id == guild_id)
 
 class BlacklistedUsers:
     """Defines blacklisted users"""
@@ -575,21 +971,31 @@ class BlacklistedUsers:
         """Checks if the user is blacklisted"""
         return await is_user_blacklisted(user_id)
 
+    @staticmethod
+    async def filter_blacklisted(user_ids: List[int]) -> Set[int]:
+        """Returns which of the given users are blacklisted, in a single Redis round-trip"""
+        return await filter_blacklisted(user_ids)
 
     @staticmethod
     async def blacklist_user(user_id: int, reason: str) -> str:
         """Blacklists a user"""
         async with session_factory() as session:
             if not await BlacklistedUsers.is_blacklisted(user_id):
-                blacklist_entry = DbBl(
-                    user_id=user_id,
-                    date_blacklisted=dt.now(tz.utc).timestamp(),
-                    reason=reason,
-                    is_actively_blacklisted=True
-                )
+                blacklist_entry = (await session.execute(select(DbBl).filter(DbBl.user_id == user_id))).scalars().first()
+                if blacklist_entry is None:
+                    blacklist_entry = DbBl(user_id=user_id)
+                # Re-blacklisting reuses the old row, updated_at moves it past the sync high-water mark
+                now = int(dt.now(tz.utc).timestamp())
+                blacklist_entry.date_blacklisted = now
+                blacklist_entry.updated_at = now
+                blacklist_entry.reason = reason
+                blacklist_entry.is_actively_blacklisted = True
+                blacklist_entry.date_unblacklisted = None
+                blacklist_entry.why_unblacklisted = None
                 session.add(blacklist_entry)
                 await session.commit()
                 await blacklist_user_redis(user_id)
+                await invalidate_eligibility([user_id])
                 return f"Blacklisted user {user_id} for reason: {reason}."
             return "User already in blacklist."
 
@@ -605,25 +1011,267 @@ class BlacklistedUsers:
 
             result.is_actively_blacklisted = False
             result.why_unblacklisted = unblacklist_reason
-            result.date_unblacklisted = dt.now(tz.utc).timestamp()
+            result.date_unblacklisted = result.updated_at = int(dt.now(tz.utc).timestamp())
 
             session.add(result)
             await session.commit()
             await remove_user_redis(user_id)
+            await invalidate_eligibility([user_id])
             return f"User {user_id} has been unblacklisted."
 
     @staticmethod
-    async def load_all_blacklisted_users() -> Optional[List[Dict[str, Union[str, int]]]]:
+    async def _stream_active_user_ids(chunk_size: int) -> AsyncIterator[List[int]]:
+        """Streams the active blacklist in chunks, without loading it all or building ORM objects"""
         async with session_factory() as session:
-            all_users = (await session.execute(select(DbBl).filter(DbBl.is_actively_blacklisted == True))).scalars().all()
+            result = await session.stream_scalars(
+                select(DbBl.user_id)
+                .filter(DbBl.is_actively_blacklisted == True) # pylint: disable=C0121
+                .execution_options(yield_per=chunk_size))
+            async for chunk in result.partitions(chunk_size):
+                yield list(chunk)
 
-        if not all_users:
-            return None
-
-        return [user.to_dict() for user in all_users] if all_users else None
+    @staticmethod
+    async def sync_to_redis(full: bool = False, chunk_size: int = 5000) -> str:
+        """
+        Brings the Redis blacklist up to date.
+        Normally only the rows changed since the stored high-water mark are applied, a full rebuild
+        streams the active blacklist into Redis and only happens when forced or Redis has never been built.
+        """
+        async with session_factory() as session:
+            # Both read ix_blacklisted_users_updated_at, neither scans the table
+            latest = (await session.execute(select(func.max(DbBl.updated_at)))).scalar() or 0
+            hwm = None if full else await get_blacklist_hwm()
+            if hwm is not None:
+                # >= so changes made in the same second as the last sync are never missed, applying them is idempotent
+                changes = (await session.execute(
+                    select(DbBl.user_id, DbBl.is_actively_blacklisted).filter(DbBl.updated_at >= hwm))).all()
+
+        if hwm is not None:
+            added = [user_id for user_id, active in changes if active]
+            removed = [user_id for user_id, active in changes if not active]
+            await apply_blacklist_delta(added, removed, max(int(latest), hwm))
+            await invalidate_eligibility(added + removed)
+            return f"Applied {len(added)} new and {len(removed)} removed blacklist entries."
+
+        total = await rebuild_blacklist(BlacklistedUsers._stream_active_user_ids(chunk_size), int(latest))
+        if total < 0:
+            return "Another cluster is already rebuilding the blacklist."
+        await clear_eligibility()
+        return f"Rebuilt the blacklist with {total} users."
 
     @staticmethod
     async def get_blacklisted_user(user_id: int) -> Optional[DbBl]:
         async with session_factory() as session:
             user_entry = (await session.execute(select(DbBl).filter(DbBl.user_id == user_id))).scalars().first()
-            return user_entry if user_entry else None
\ No newline at end of file
+            return user_entry if user_entry else None
+
+
+class Starboard:
+    """Defines the starboard structure"""
+
+    @staticmethod
+    async def get_config(guild_id: int) -> Optional[DbSbConfig]:
+        """Gets the starboard settings for a guild"""
+        async with read_session_factory() as session:
+            entry = (await session.execute(
+                select(DbSbConfig).filter(DbSbConfig.guild_id == guild_id))).scalars().first()
+            return entry if entry else None
+
+    @staticmethod
+    async def set_config(guild_id: int, **kwargs: Any) -> str:
+        """Creates or updates the starboard settings for a guild"""
+        async with session_factory() as session:
+            try:
+                valid_fields = {c.name for c in DbSbConfig.__table__.columns} - {"guild_id"}
+                updates = {k: v for k, v in kwargs.items() if k in valid_fields and v is not None}
+                statement = insert(DbSbConfig).values(guild_id=guild_id, **updates)
+                if updates:
+                    statement = statement.on_conflict_do_update(index_elements=[DbSbConfig.guild_id], set_=updates)
+                else:
+                    statement = statement.on_conflict_do_nothing()
+                await session.execute(statement)
+                await session.commit()
+                return "The starboard was updated successfully."
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while updating starboard settings: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("set_starboard_config", f"{str(e)}\n{tb_str}")
+                return "Something went wrong, please check error logs."
+
+    @staticmethod
+    async def get_entry(message_id: int) -> Optional[DbSbEntry]:
+        """Gets the starboard entry for a source message"""
+        async with session_factory() as session:
+            entry = (await session.execute(
+                select(DbSbEntry).filter(DbSbEntry.message_id == message_id))).scalars().first()
+            return entry if entry else None
+
+    @staticmethod
+    async def upsert_entries(entries: List[Dict[str, Optional[int]]]) -> bool:
+        """Writes a batch of starboard entries in a single statement, callers keep batches under the bind parameter limit"""
+        if not entries:
+            return True
+        async with session_factory() as session:
+            try:
+                statement = insert(DbSbEntry).values(entries)
+                statement = statement.on_conflict_do_update(
+                    index_elements=[DbSbEntry.message_id],
+                    set_={"stars": statement.excluded.stars, "star_message_id": statement.excluded.star_message_id})
+                await session.execute(statement)
+                await session.commit()
+                return True
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while writing starboard entries: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("upsert_starboard_entries", f"{str(e)}\n{tb_str}")
+                return False
+
+
+class ProxyMembers:
+    """Defines the proxy members structure"""
+
+    @staticmethod
+    async def get_members(user_id: int) -> List[ProxyMember]:
+        """Gets every proxy member a user has"""
+        async with read_session_factory() as session:
+            rows = await session.execute(
+                select(DbProxy.name, DbProxy.display_name, DbProxy.avatar_url, DbProxy.proxy_tags,
+                       DbProxy.source, DbProxy.external_id).filter(DbProxy.user_id == user_id).order_by(DbProxy.name))
+            return [ProxyMember(name, display_name, avatar_url, tuple(tuple(tag) for tag in tags), source, external_id)
+                    for name, display_name, avatar_url, tags, source, external_id in rows]
+
+    @staticmethod
+    async def upsert_members(user_id: int, members: List[ProxyMember]) -> Optional[int]:
+        """Adds or replaces a batch of members by name in one statement, returns how many were written"""
+        if not members:
+            return 0
+        async with session_factory() as session:
+            try:
+                statement = insert(DbProxy).values([{
+                    "user_id": user_id, "name": member.name, "display_name": member.display_name,
+                    "avatar_url": member.avatar_url, "proxy_tags": [list(tag) for tag in member.tags],
+                    "source": member.source, "external_id": member.external_id,
+                } for member in members])
+                await session.execute(statement.on_conflict_do_update(
+                    constraint="uq_proxy_members_user_name",
+                    set_={column: statement.excluded[column] for column in
+                          ("display_name", "avatar_url", "proxy_tags", "source", "external_id")}))
+                await session.commit()
+                return len(members)
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while writing proxy members: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("upsert_proxy_members", f"{str(e)}\n{tb_str}")
+                return None
+
+    @staticmethod
+    async def remove_member(user_id: int, name: str) -> str:
+        """Removes one of a user's proxy members"""
+        async with session_factory() as session:
+            try:
+                result = await session.execute(delete(DbProxy).where(DbProxy.user_id == user_id, DbProxy.name == name))
+                await session.commit()
+                return f"Removed {name}." if result.rowcount else f"You have no proxy member called {name}."
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while removing proxy member: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("remove_proxy_member", f"{str(e)}\n{tb_str}")
+                return "Something went wrong, please check error logs."
+
+
+class GuildCleanup:
+    """Defines the guild cleanup structure, data for guilds the bot left is purged in small chunks after a grace period"""
+    # Children before parents, logs goes last since the others reference it
+    PURGE_ORDER = (DbLvl, DbLvlRoles, DbReactRoles, DbPunishments, DbCc, DbRr, DbSbEntry, DbSbConfig, DbLog)
+
+    @staticmethod
+    async def schedule(guild_id: int, grace_seconds: int) -> None:
+        """Schedules a guild's data to be purged once the grace period is over"""
+        now = int(dt.now(tz.utc).timestamp())
+        async with session_factory() as session:
+            try:
+                statement = insert(DbCleanup).values(guild_id=guild_id, left_at=now, purge_after=now + grace_seconds)
+                await session.execute(statement.on_conflict_do_update(
+                    index_elements=[DbCleanup.guild_id],
+                    set_={"left_at": statement.excluded.left_at, "purge_after": statement.excluded.purge_after}))
+                await session.commit()
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while scheduling guild cleanup: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("schedule_cleanup", f"{str(e)}\n{tb_str}")
+
+    @staticmethod
+    async def cancel(guild_id: int) -> bool:
+        """Cancels a pending purge, returns True if there was one"""
+        async with session_factory() as session:
+            try:
+                result = await session.execute(delete(DbCleanup).where(DbCleanup.guild_id == guild_id))
+                await session.commit()
+                return bool(result.rowcount)
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while cancelling guild cleanup: %s\nRolling back....", e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("cancel_cleanup", f"{str(e)}\n{tb_str}")
+                return False
+
+    @staticmethod
+    def due_query(now: int, shard_ids: List[int], shard_count: int, limit: int) -> Select:
+        """
+        Selects the due guilds that live on `shard_ids`.
+        Filtering in the query means a cluster that is down or behind can't hide other clusters' guilds.
+        """
+        return (select(DbCleanup.guild_id)
+                .filter(DbCleanup.purge_after <= now, on_shards(DbCleanup.guild_id, shard_ids, shard_count))
+                .order_by(DbCleanup.purge_after).limit(limit))
+
+    @staticmethod
+    async def get_due(shard_ids: List[int], shard_count: int, limit: int = 10) -> List[int]:
+        """Gets the guilds on these shards whose grace period is over, oldest first"""
+        now = int(dt.now(tz.utc).timestamp())
+        async with session_factory() as session:
+            rows = await session.execute(GuildCleanup.due_query(now, shard_ids, shard_count, limit))
+            return [int(guild_id) for guild_id in rows.scalars()]
+
+    @staticmethod
+    async def purge_chunk(model: Any, guild_id: int, chunk_size: int = 5000) -> Optional[int]:
+        """
+        Deletes up to chunk_size of a guild's rows from one table in its own short transaction.
+        Returns how many rows went, 0 once the table is clear, None on error.
+        """
+        primary_key = list(model.__table__.primary_key.columns)
+        key = tuple_(*primary_key) if len(primary_key) > 1 else primary_key[0]
+        victims = select(*primary_key).filter(model.guild_id == guild_id).limit(chunk_size)
+        async with session_factory() as session:
+            try:
+                # Give up quickly instead of queueing behind, and holding up, live traffic
+                await session.execute(text("SET LOCAL lock_timeout = '2s'"))
+                result = await session.execute(delete(model).where(key.in_(victims)))
+                await session.commit()
+                return int(result.rowcount)
+            except SQLAlchemyError as e:
+                if session.is_active:
+                    await session.rollback()
+                logger.error("Database error while purging %s for guild %s: %s\nRolling back....",
+                             model.__tablename__, guild_id, e, exc_info=True)
+                tb_str = traceback.format_exc()
+                await send_error("purge_chunk", f"{str(e)}\n{tb_str}")
+                return None
+
+    @staticmethod
+    async def finish(guild_id: int) -> None:
+        """Drops the cleanup row and any cached config once everything is gone"""
+        await GuildCleanup.cancel(guild_id)
+        invalidate_log_config(guild_id)
+        invalidate_guild_levelling(guild_id)
@@ -6,8 +6,11 @@
 """This file contains the database logic, including the tables and connection data"""
 import os
 import asyncio
+import itertools
+import time
+from contextvars import ContextVar
 from datetime import datetime as dt, timezone as tz
-from typing import Dict, Union
+from typing import Any, Dict, Iterator, List, Optional, Union
 from dotenv import load_dotenv
 from sqlalchemy import (Column,
                         BigInteger,
@@ -18,9 +21,13 @@ from sqlalchemy import (Column,
                         ForeignKeyConstraint,
                         URL,
                         CheckConstraint,
+                        UniqueConstraint,
                         Float)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine, async_sessionmaker
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import declarative_base, relationship, Session
+from sqlalchemy.sql import Select
 
 load_dotenv()
 Base = declarative_base()
@@ -38,7 +45,56 @@ engine: AsyncEngine = create_async_engine(
     max_overflow=20,
     pool_timeout=30,
     echo=False,)
-session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+# Optional read replicas, REPLICA_HOSTS=host[:port],host[:port] with the same credentials as the primary
+replica_engines: List[AsyncEngine] = [
+    create_async_engine(
+        connection_url.set(host=host, port=int(port) if port else connection_url.port),
+        pool_size=10,
+        max_overflow=10,
+        pool_timeout=30,
+        echo=False,)
+    for host, _, port in (entry.strip().partition(":")
+                          for entry in os.getenv("REPLICA_HOSTS", "").split(",") if entry.strip())
+]
+if os.getenv("QUERY_CAPTURE"):
+    from database.query_advisor import install_capture
+    for captured_engine in (engine, *replica_engines):
+        install_capture(captured_engine.sync_engine)
+_replica_cycle: Iterator[Engine] = itertools.cycle([replica.sync_engine for replica in replica_engines])
+
+# Once something in this task writes, its reads stay on the primary for this long, so replica lag can't hide the write
+READ_YOUR_WRITES_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+_last_write: ContextVar[float] = ContextVar("last_write", default=0.0)
+
+
+class RoutingSession(Session): # type: ignore
+    """
+    Session that sends SELECTs from read only sessions to a replica and everything else to the primary.
+    Each event handler runs in its own task, so the context variable makes read-your-writes hold per request.
+    """
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Engine:
+        if self.info.get("read_only") and replica_engines and not self._flushing and isinstance(clause, Select) \
+                and time.monotonic() - _last_write.get() > READ_YOUR_WRITES_SECONDS:
+            return next(_replica_cycle)
+        if self._flushing or (clause is not None and not isinstance(clause, Select)):
+            _last_write.set(time.monotonic())
+        return engine.sync_engine
+
+
+session_factory = async_sessionmaker(class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False)
+# Sessions from here may read from a replica, only use them for lookups that can tolerate a little lag
+read_session_factory = async_sessionmaker(class_=AsyncSession, sync_session_class=RoutingSession,
+                                          expire_on_commit=False, info={"read_only": True})
+
+
+def pool_stats() -> Dict[str, Dict[str, Optional[int]]]:
+    """Gets connection pool usage for the primary and each replica"""
+    stats = {}
+    for name, pool_engine in (("primary", engine), *((f"replica{i}", replica) for i, replica in enumerate(replica_engines))):
+        pool: Any = pool_engine.pool
+        stats[name] = {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+    return stats
 
 class Logs(Base): # type: ignore
     """Model for the logging table"""
@@ -53,6 +109,8 @@ class Logs(Base): # type: ignore
     muterole_channel = Column(BigInteger)
     reaction_logging = Column(BigInteger)
     xp_multiplier = Column(Float, default=1.0)
+    xp_curve = Column(String, default="default")
+    level_up_messages = Column(Boolean, default=False)  # Whether reaching a level is announced in the channel
 
     reg_role = relationship("RegRoles", back_populates="log", uselist=False, cascade="all, delete")
 
@@ -73,14 +131,20 @@ class Punishments(Base): # type: ignore
     reason = Column(String, default="No reason provided")
 
 class CustomCommands(Base): # type: ignore
-    """Model for the custom commands table"""
+    """Model for the custom commands table, names and triggers are unique per guild"""
     __tablename__ = 'custom_commands'
+    __table_args__ = (
+        UniqueConstraint('guild_id', 'trigger', name='uq_custom_commands_guild_trigger'),
+    )
 
+    guild_id = Column(BigInteger, primary_key=True)
     name = Column(String, primary_key=True)
+    trigger = Column(String, nullable=True)  # Normalised keyword that runs the command when it appears in a message
     owner_id = Column(BigInteger, nullable=False)
     created_at = Column(BigInteger, default=int(dt.now(tz.utc).timestamp())) # Will be stored as a unix epoch timestamp
     text = Column(String)
-    image = Column(String) # or LargeBinary, if string the image will be stored base64 encoded
+    image_hash = Column(String(64))  # SHA-256 of the image in the media store
+    image_type = Column(String)  # Content type of the image, None for images stored before it was kept
     nsfw = Column(Boolean)
 
 class Registration(Base): # type: ignore
@@ -102,13 +166,22 @@ class Registration(Base): # type: ignore
     nsfw = Column(Boolean, default=False)
 
 
+class RegistrationStats(Base): # type: ignore
+    """Model for the registration counters, one row per field and value, kept in step with registrations"""
+    __tablename__ = 'registration_stats'
+
+    field = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    count = Column(BigInteger, default=0, nullable=False)
+
+
 class Levels(Base): # type: ignore
     """Model for the levels table"""
     __tablename__ = 'levels'
     __table_args__ = (
-        Index('ix_user_guild', 'user_id', 'guild_id'),
-        Index('ix_guild', 'guild_id'),
+        # The (guild_id, user_id) primary key serves guild lookups, lookups by user alone need their own index
         ForeignKeyConstraint(["guild_id"], ["logs.guild_id"]),
+        Index('ix_levels_user_id', 'user_id'),
     )
 
     guild_id = Column(BigInteger, primary_key=True)
@@ -116,6 +189,33 @@ class Levels(Base): # type: ignore
     xp = Column(BigInteger, default=0, nullable=False)
 
 
+class LevelRoles(Base): # type: ignore
+    """Model for the level reward roles table"""
+    __tablename__ = 'level_roles'
+    __table_args__ = (
+        ForeignKeyConstraint(["guild_id"], ["logs.guild_id"]),
+    )
+
+    guild_id = Column(BigInteger, primary_key=True)
+    level = Column(Integer, primary_key=True)
+    role_id = Column(BigInteger, nullable=False)
+
+
+class ReactionRoles(Base): # type: ignore
+    """Model for the reaction roles table, one row per emoji on a reaction role message"""
+    __tablename__ = 'reaction_roles'
+    __table_args__ = (
+        ForeignKeyConstraint(["guild_id"], ["logs.guild_id"]),
+        Index('ix_reaction_roles_guild', 'guild_id'),
+    )
+
+    message_id = Column(BigInteger, primary_key=True)
+    emoji = Column(String, primary_key=True)  # The emoji ID for custom emojis, the character itself otherwise
+    guild_id = Column(BigInteger, nullable=False)
+    channel_id = Column(BigInteger, nullable=False)
+    role_id = Column(BigInteger, nullable=False)
+
+
 class RegRoles(Base): # type: ignore
     """Model for the registration roles table"""
     __tablename__ = 'reg_roles'
@@ -158,7 +258,7 @@ class RegRoles(Base): # type: ignore
 
     log = relationship("Logs", back_populates="reg_role")
 
-class BlacklistedUsers(Base):
+class BlacklistedUsers(Base): # type: ignore
     """Model for the blacklisted users table"""
     __tablename__ = 'blacklisted_users'
     __table_args__ = (
@@ -173,6 +273,7 @@ class BlacklistedUsers(Base):
     is_actively_blacklisted = Column(Boolean, default=True)
     date_unblacklisted = Column(BigInteger, nullable=True)
     why_unblacklisted = Column(String, nullable=True)
+    updated_at = Column(BigInteger, nullable=False)  # Set on every blacklist and unblacklist, drives the Redis sync
 
     def to_dict(self) -> Dict[str, Union[str, int, bool, None]]:
         return {
@@ -185,6 +286,71 @@ class BlacklistedUsers(Base):
         }
 
 
+# Serves the leaderboard
+Index('ix_levels_guild_id_xp', Levels.guild_id, Levels.xp.desc())
+Index('ix_blacklisted_users_active', BlacklistedUsers.user_id,
+      postgresql_where=BlacklistedUsers.is_actively_blacklisted)
+# Finds the rows changed since the last Redis sync
+Index('ix_blacklisted_users_updated_at', BlacklistedUsers.updated_at)
+
+
+class StarboardConfig(Base): # type: ignore
+    """Model for the starboard settings table"""
+    __tablename__ = 'starboard_config'
+    __table_args__ = (
+        ForeignKeyConstraint(["guild_id"], ["logs.guild_id"]),
+    )
+
+    guild_id = Column(BigInteger, primary_key=True)
+    channel_id = Column(BigInteger, nullable=False)
+    threshold = Column(Integer, default=3, nullable=False)
+    emoji = Column(String, default="⭐", nullable=False)
+
+
+class StarboardEntries(Base): # type: ignore
+    """Model for the starboard entries table, keyed by the starred message"""
+    __tablename__ = 'starboard_entries'
+    __table_args__ = (
+        Index('ix_starboard_guild', 'guild_id'),
+    )
+
+    message_id = Column(BigInteger, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False)
+    channel_id = Column(BigInteger, nullable=False)
+    author_id = Column(BigInteger, nullable=False)
+    star_message_id = Column(BigInteger, nullable=True)
+    stars = Column(Integer, default=0, nullable=False)
+
+
+class ProxyMembers(Base): # type: ignore
+    """Model for proxy members, the per-user alter identities messages are resent as"""
+    __tablename__ = 'proxy_members'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'name', name='uq_proxy_members_user_name'),
+    )
+
+    member_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)
+    name = Column(String, nullable=False)
+    display_name = Column(String, nullable=True)
+    avatar_url = Column(String, nullable=True)
+    proxy_tags = Column(JSONB, nullable=False, default=list)  # [[prefix, suffix], ...]
+    source = Column(String, nullable=True)  # pluralkit or tupperbox when imported
+    external_id = Column(String, nullable=True)
+
+
+class GuildCleanup(Base): # type: ignore
+    """Model for guilds the bot has left whose data is waiting to be purged"""
+    __tablename__ = 'guild_cleanup'
+    __table_args__ = (
+        Index('ix_guild_cleanup_purge_after', 'purge_after'),
+    )
+
+    guild_id = Column(BigInteger, primary_key=True)
+    left_at = Column(BigInteger, nullable=False)  # Will be stored as a unix epoch timestamp
+    purge_after = Column(BigInteger, nullable=False)  # Will be stored as a unix epoch timestamp
+
+
 async def create_tables() -> None:
     """Create the tables"""
     async with engine.begin() as conn:
@@ -0,0 +1,47 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+This file contains the read-only projections, lookups select just the columns they need and get plain
+namedtuple records back, no identity map, no instrumentation. The ORM models are still used for writes.
+"""
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+_record_types: Dict[Tuple[str, Tuple[str, ...]], Type[Any]] = {}
+
+
+def record_type(model: Any, names: Tuple[str, ...]) -> Type[Any]:
+    """Gets the namedtuple class for a set of a model's columns, made once per combination"""
+    key = (model.__tablename__, names)
+    record = _record_types.get(key)
+    if record is None:
+        record = _record_types[key] = namedtuple(f"{model.__name__}Record", names) # type: ignore
+    return record
+
+
+def project(model: Any, names: Sequence[str] = ()) -> Tuple[Select, Type[Any]]:
+    """Builds a SELECT of just `names`, every column if empty, and the record type its rows turn into"""
+    table_columns = model.__table__.columns
+    names = tuple(names) or tuple(column.name for column in table_columns)
+    unknown = set(names) - set(table_columns.keys())
+    if unknown:
+        raise ValueError(f"{model.__tablename__} has no column(s) {', '.join(sorted(unknown))}")
+    return select(*(table_columns[name] for name in names)), record_type(model, names)
+
+
+async def fetch_one(session: AsyncSession, model: Any, names: Sequence[str], *criteria: Any) -> Optional[Any]:
+    """Gets the first matching row as a record, None if there isn't one"""
+    statement, record = project(model, names)
+    row = (await session.execute(statement.filter(*criteria).limit(1))).first()
+    return record._make(row) if row is not None else None
+
+
+async def fetch_all(session: AsyncSession, model: Any, names: Sequence[str], *criteria: Any) -> List[Any]:
+    """Gets every matching row as a record"""
+    statement, record = project(model, names)
+    return [record._make(row) for row in await session.execute(statement.filter(*criteria))]
@@ -0,0 +1,249 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+Query plan advisor.
+1. Run the bot with QUERY_CAPTURE=path.json, every statement is fingerprinted and one sample of its parameters
+   is kept, the file is written when the bot closes.
+2. python -m database.query_advisor explain path.json
+   replays each fingerprint under EXPLAIN (ANALYZE, BUFFERS) against ADVISOR_DATABASE_URL, inside a transaction
+   that is rolled back, and reports sequential scans plus indexes Postgres has never used.
+3. python -m database.query_advisor migration "message" --create "levels:guild_id,xp DESC" --drop levels:ix_guild:guild_id
+   writes an Alembic migration that builds and drops the indexes CONCURRENTLY.
+Point ADVISOR_DATABASE_URL at a local copy, never production, ANALYZE really runs the statements.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import secrets
+import time
+from datetime import datetime as dt
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_PLACEHOLDER_LIST = re.compile(r"\$\d+(?:\s*,\s*\$\d+)*")
+_WHITESPACE = re.compile(r"\s+")
+_COLUMN = re.compile(r"(?<![:\w])(?:\w+\.)?(\w+)\s*(?:<>|<=|>=|=|<|>|~~|\bIS\b|\bIN\b)", re.IGNORECASE)
+
+_captured: Dict[str, Dict[str, Any]] = {}
+
+
+def fingerprint(statement: str) -> str:
+    """Collapses whitespace and expanded IN lists so the same query always has the same fingerprint"""
+    return _PLACEHOLDER_LIST.sub("$n", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _jsonable(params: Any) -> Optional[List[Any]]:
+    values = list(params) if isinstance(params, (list, tuple)) else None
+    if values is None or not all(isinstance(value, (int, float, str, bool, type(None))) for value in values):
+        return None
+    return values
+
+
+def install_capture(engine: Any) -> None:
+    """Records every statement the engine runs, call once at startup"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute") # type: ignore
+    def _before(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None: # pylint: disable=W0613,R0913,R0917
+        conn.info.setdefault("advisor_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute") # type: ignore
+    def _after(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None: # pylint: disable=W0613,R0913,R0917
+        elapsed = time.perf_counter() - conn.info["advisor_started"].pop()
+        key = fingerprint(statement)
+        entry = _captured.get(key)
+        if entry is None:
+            entry = _captured[key] = {"statement": statement, "params": _jsonable(parameters),
+                                      "calls": 0, "total_ms": 0.0}
+        entry["calls"] += 1
+        entry["total_ms"] += elapsed * 1000
+
+
+def dump_capture(path: str) -> int:
+    """Writes what was captured, returns how many fingerprints there were"""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(sorted(_captured.values(), key=lambda entry: -entry["total_ms"]), file, indent=2)
+    return len(_captured)
+
+
+def walk_plan(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yields every node of an EXPLAIN (FORMAT JSON) plan"""
+    yield node
+    for child in node.get("Plans", ()):
+        yield from walk_plan(child)
+
+
+def seq_scans(plan: Dict[str, Any]) -> List[Tuple[str, List[str], int]]:
+    """Gets (table, filtered columns, rows removed) for every sequential scan with a filter"""
+    scans = []
+    for node in walk_plan(plan):
+        if node.get("Node Type") == "Seq Scan" and node.get("Filter"):
+            columns = list(dict.fromkeys(_COLUMN.findall(node["Filter"])))
+            scans.append((node["Relation Name"], columns, int(node.get("Rows Removed by Filter", 0))))
+    return scans
+
+
+async def explain(capture_path: str, database_url: str) -> None:
+    """Replays the captured statements and prints the report"""
+    import asyncpg
+    with open(capture_path, "r", encoding="utf-8") as file:
+        captured = json.load(file)
+    conn = await asyncpg.connect(database_url)
+    suggestions: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+    try:
+        for entry in captured:
+            if entry["params"] is None:
+                print(f"skipped (parameters not replayable): {fingerprint(entry['statement'])[:100]}")
+                continue
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                raw = await conn.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {entry['statement']}",
+                                          *entry["params"])
+            except asyncpg.PostgresError as e:
+                print(f"failed ({e.__class__.__name__}): {fingerprint(entry['statement'])[:100]}")
+                continue
+            finally:
+                await transaction.rollback()
+            result = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+            plan = result["Plan"]
+            print(f"\n{entry['calls']} calls, {entry['total_ms']:.1f} ms captured, "
+                  f"{result.get('Execution Time', 0):.2f} ms now, "
+                  f"{plan.get('Shared Hit Blocks', 0)} hit / {plan.get('Shared Read Blocks', 0)} read blocks")
+            print(f"  {fingerprint(entry['statement'])[:200]}")
+            for table, columns, removed in seq_scans(plan):
+                print(f"  SEQ SCAN on {table} filtering {', '.join(columns) or '?'}, {removed} rows thrown away")
+                if columns:
+                    key = (table, tuple(columns))
+                    suggestions[key] = suggestions.get(key, 0) + entry["calls"]
+
+        unused = await conn.fetch(
+            "SELECT s.relname, s.indexrelname, pg_relation_size(s.indexrelid) AS size "
+            "FROM pg_stat_user_indexes s JOIN pg_index i ON i.indexrelid = s.indexrelid "
+            "WHERE s.idx_scan = 0 AND NOT i.indisprimary AND NOT i.indisunique ORDER BY size DESC")
+    finally:
+        await conn.close()
+
+    print("\nIndexes never scanned (drop candidates):")
+    for row in unused:
+        print(f"  {row['relname']}.{row['indexrelname']} ({row['size'] // 1024} KiB)")
+    print("\nIndex candidates for sequential scans, by calls:")
+    for (table, index_columns), calls in sorted(suggestions.items(), key=lambda item: -item[1]):
+        print(f"  --create {table}:{','.join(index_columns)}  ({calls} calls)")
+
+
+def current_head(versions: str) -> str:
+    """Finds the revision no other migration revises"""
+    revisions, parents = set(), set()
+    for name in os.listdir(versions):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(versions, name), "r", encoding="utf-8") as file:
+            source = file.read()
+        revision = re.search(r"^revision: str = '(\w+)'", source, re.MULTILINE)
+        parent = re.search(r"^down_revision: Union\[str, None\] = '(\w+)'", source, re.MULTILINE)
+        if revision:
+            revisions.add(revision.group(1))
+        if parent:
+            parents.add(parent.group(1))
+    heads = revisions - parents
+    if len(heads) != 1:
+        raise RuntimeError(f"Expected one Alembic head, found {sorted(heads)}")
+    return heads.pop()
+
+
+def _index_name(table: str, columns: List[str]) -> str:
+    return f"ix_{table}_{'_'.join(column.split()[0] for column in columns)}"
+
+
+def _create_index(name: str, table: str, columns: List[str]) -> str:
+    # Expressions like "xp DESC" have to go through sa.text, plain names are passed as is
+    elements = ", ".join(f"sa.text('{column}')" if " " in column else f"'{column}'" for column in columns)
+    return f"        op.create_index('{name}', '{table}', [{elements}], unique=False, postgresql_concurrently=True)"
+
+
+def _drop_index(name: str, table: str) -> str:
+    return f"        op.drop_index('{name}', table_name='{table}', postgresql_concurrently=True)"
+
+
+def render_migration(message: str, revision: str, down_revision: str, # pylint: disable=R0913,R0917
+                     create: List[Tuple[str, List[str]]], drop: List[Tuple[str, str, List[str]]]) -> str:
+    """Renders a migration that changes indexes without holding a write lock on the table"""
+    upgrade = [_create_index(_index_name(table, columns), table, columns) for table, columns in create]
+    upgrade += [_drop_index(name, table) for table, name, _ in drop]
+    downgrade = [_create_index(name, table, columns) for table, name, columns in drop]
+    downgrade += [_drop_index(_index_name(table, columns), table) for table, columns in create]
+    newline = "\n"
+    return f'''"""{message}
+
+Revision ID: {revision}
+Revises: {down_revision}
+Create Date: {dt.now()}
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '{revision}'
+down_revision: Union[str, None] = '{down_revision}'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+{newline.join(upgrade) or "        pass"}
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+{newline.join(downgrade) or "        pass"}
+'''
+
+
+def write_migration(message: str, create: List[str], drop: List[str], versions: str = "alembic/versions") -> str:
+    """
+    Writes the migration next to the others and returns its path.
+    `create` specs are table:col1,col2 and `drop` specs are table:index:col1,col2 so the downgrade can rebuild it.
+    """
+    revision = secrets.token_hex(6)
+    parsed_create = [(table, columns.split(",")) for table, columns in (spec.split(":", 1) for spec in create)]
+    parsed_drop = [(table, name, columns.split(",")) for table, name, columns in (spec.split(":", 2) for spec in drop)]
+    slug = re.sub(r"\W+", "_", message.lower()).strip("_")
+    path = os.path.join(versions, f"{revision}_{slug}.py")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(render_migration(message, revision, current_head(versions), parsed_create, parsed_drop))
+    return path
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    explain_parser = commands.add_parser("explain", help="Replay a capture under EXPLAIN ANALYZE")
+    explain_parser.add_argument("capture")
+    explain_parser.add_argument("--database-url", default=os.getenv("ADVISOR_DATABASE_URL"))
+    migration_parser = commands.add_parser("migration", help="Write a CONCURRENTLY index migration")
+    migration_parser.add_argument("message")
+    migration_parser.add_argument("--create", action="append", default=[], help="table:col1,col2 DESC")
+    migration_parser.add_argument("--drop", action="append", default=[], help="table:index_name:col1,col2")
+    args = parser.parse_args()
+
+    if args.command == "explain":
+        if not args.database_url:
+            parser.error("Set ADVISOR_DATABASE_URL or pass --database-url, e.g. postgresql://localhost/cynix")
+        asyncio.run(explain(args.capture, args.database_url))
+    else:
+        print(write_migration(args.message, args.create, args.drop))
+
+
+if __name__ == "__main__":
+    main()
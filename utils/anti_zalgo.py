@@ -6,6 +6,14 @@
 import unicodedata
 import asyncio
 
+def strip_zalgo(text: str) -> str:
+    """Synchronous zalgo cleanup, for hot paths that can't afford a thread hop"""
+    return "".join(char for char in unicodedata.normalize("NFKC", text) if not unicodedata.combining(char))
+
+def normalise_text(text: str) -> str:
+    """Cleans up zalgo, casefolds and collapses whitespace so near-identical text compares equal"""
+    return " ".join(strip_zalgo(text).casefold().split())
+
 async def contains_zalgo(text: str) -> bool:
     """This function checks if the text contains zalgo"""
     return await asyncio.to_thread(
@@ -14,6 +22,4 @@ async def contains_zalgo(text: str) -> bool:
 
 async def cleanup_zalgo(text: str) -> str:
     """This function cleans up zalgo"""
-    return await asyncio.to_thread(
-        lambda: "".join(char for char in unicodedata.normalize("NFKC", text) if not unicodedata.combining(char))
-    )
+    return await asyncio.to_thread(strip_zalgo, text)
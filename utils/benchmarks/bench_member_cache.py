@@ -0,0 +1,112 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+Compares the MEMBER_CACHE policies on synthetic large guilds.
+Every policy's cache is built from GUILD_CREATE and member chunk payloads through discord.py's own Guild and
+Member classes, the same way the gateway would fill it, so it needs discord.py but no connection:
+python -m utils.benchmarks.bench_member_cache
+"""
+import gc
+import time
+import tracemalloc
+from typing import Any, Dict, List, Tuple
+import discord
+from discord.state import ConnectionState
+from utils.member_cache import POLICIES, member_cache_options
+
+GUILDS = 50
+MEMBERS = 5000  # Per guild
+CHUNKED_EVERY = 20  # One guild in this many has a feature ask for its whole member list during the session
+JOINS = 50  # Members joining each guild while the bot is online
+GATEWAY_COMMANDS_PER_SECOND = 2  # 120 per minute per shard, every chunk request is one
+SELF_ID = 1
+
+
+def member_payload(user_id: int) -> Dict[str, Any]:
+    """A member object as the gateway sends it"""
+    return {"user": {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "global_name": None,
+                     "avatar": None},
+            "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+
+
+def guild_payload(guild_id: int) -> Dict[str, Any]:
+    """A large guild's GUILD_CREATE, which only carries ourselves, the rest has to be chunked"""
+    return {"id": str(guild_id), "name": f"guild{guild_id}", "owner_id": str(SELF_ID), "member_count": MEMBERS + 1,
+            "large": True, "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0,
+                                      "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+            "members": [member_payload(SELF_ID)], "channels": [], "threads": [], "emojis": [], "stickers": [],
+            "features": [], "voice_states": [], "presences": []}
+
+
+def make_state(policy: str) -> ConnectionState:
+    """A connection state configured exactly like the bot would be under a policy"""
+    intents = discord.Intents.default()
+    intents.members = True
+    options = member_cache_options(policy)
+    state = ConnectionState(dispatch=lambda *_: None, handlers={}, hooks={}, http=None, intents=intents, # type: ignore
+                            **options)
+    state.user = discord.ClientUser(state=state, data={"id": str(SELF_ID), "username": "Cynix", "discriminator": "0",
+                                                       "avatar": None, "bot": True})
+    return state
+
+
+def chunk(state: ConnectionState, guild: discord.Guild, members: List[Dict[str, Any]]) -> None:
+    """Adds members the way a chunk request with cache=True does"""
+    for data in members:
+        guild._add_member(discord.Member(data=data, guild=guild, state=state)) # pylint: disable=W0212
+
+
+def run(policy: str, guild_data: List[Dict[str, Any]], members: List[List[Dict[str, Any]]],
+        joins: List[List[Dict[str, Any]]]) -> Tuple[float, int, List[discord.Guild]]:
+    """Builds one policy's cache, returns the time until on_ready, chunk requests sent before it and the guilds"""
+    state = make_state(policy)
+    start = time.perf_counter()
+    guilds = [discord.Guild(data=data, state=state) for data in guild_data]
+    startup_requests = 0
+    if member_cache_options(policy)["chunk_guilds_at_startup"]:
+        for guild, guild_members in zip(guilds, members):
+            chunk(state, guild, guild_members)
+            startup_requests += 1
+    startup = time.perf_counter() - start
+
+    # The rest of the session: some members join, a few guilds get chunked for features that need everyone
+    for guild, guild_joins in zip(guilds, joins):
+        guild._member_count += len(guild_joins) # pylint: disable=W0212
+        if state.member_cache_flags.joined:
+            chunk(state, guild, guild_joins)
+    for guild, guild_members, guild_joins in list(zip(guilds, members, joins))[::CHUNKED_EVERY]:
+        if not guild.chunked:
+            chunk(state, guild, guild_members + guild_joins)
+    return startup, startup_requests, guilds
+
+
+def main() -> None:
+    """Runs the comparison"""
+    guild_data = [guild_payload(1_000_000 + i) for i in range(GUILDS)]
+    members = [[member_payload(10_000_000 + g * MEMBERS + i) for i in range(MEMBERS)] for g in range(GUILDS)]
+    joins = [[member_payload(90_000_000 + g * JOINS + i) for i in range(JOINS)] for g in range(GUILDS)]
+
+    print(f"{GUILDS} guilds of {MEMBERS} members, one in {CHUNKED_EVERY} chunked on demand, {JOINS} joins each\n")
+    print(f"{'policy':<10} {'startup CPU':>12} {'chunk reqs':>11} {'gateway wait':>13} {'cached':>9} {'retained':>11}")
+    for policy in POLICIES:
+        gc.collect()
+        startup, requests, guilds = run(policy, guild_data, members, joins)
+        cached = sum(len(guild.members) for guild in guilds)
+        del guilds
+        gc.collect()
+        tracemalloc.start()
+        _, _, guilds = run(policy, guild_data, members, joins)
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del guilds
+        # Only the requests count against the gateway rate limit, not the chunk events that answer them
+        wait = requests / GATEWAY_COMMANDS_PER_SECOND
+        print(f"{policy:<10} {startup * 1000:9.0f} ms {requests:>11} {wait:11.0f} s {cached:>9} "
+              f"{retained / 1024 / 1024:7.1f} MiB")
+    print("\nGateway wait is the least time the startup chunk requests alone hold on_ready back, per shard")
+
+
+if __name__ == "__main__":
+    main()
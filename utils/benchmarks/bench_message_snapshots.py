@@ -0,0 +1,77 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+Compares the memory of 100k messages kept as discord.Message objects, which is what discord.py's message cache
+holds, against 100k MessageSnapshot entries in the SnapshotCache. It needs discord.py but no connection:
+python -m utils.benchmarks.bench_message_snapshots
+"""
+import gc
+import random
+import tracemalloc
+from collections import deque
+from typing import Any, Dict
+import discord
+from utils.benchmarks.bench_member_cache import guild_payload, make_state
+from utils.message_snapshots import MessageSnapshot, SnapshotCache
+
+MESSAGES = 100_000
+CHANNELS = 200
+AUTHORS = 5000
+BASE_ID = 1_300_000_000_000_000_000
+
+
+def message_payload(i: int, rng: random.Random) -> Dict[str, Any]:
+    """A MESSAGE_CREATE payload with a few hundred characters at most"""
+    author = BASE_ID + 1_000_000 + i % AUTHORS
+    return {"id": str(BASE_ID + 10_000_000 + i), "channel_id": str(BASE_ID + i % CHANNELS),
+            "author": {"id": str(author), "username": f"user{author}", "discriminator": "0", "avatar": None},
+            "content": "x" * rng.randint(5, 300), "timestamp": "2024-01-01T00:00:00+00:00",
+            "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+            "attachments": [], "embeds": [], "pinned": False, "type": 0}
+
+
+def measure(label: str, build: Any) -> int:
+    """Runs a builder under tracemalloc, returns the bytes still allocated once it is done"""
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {retained / 1024 / 1024:8.1f} MiB per {MESSAGES // 1000}k messages")
+    del kept
+    return retained
+
+
+def main() -> None:
+    """Runs the comparison"""
+    rng = random.Random(0)
+    payloads = [message_payload(i, rng) for i in range(MESSAGES)]
+    state = make_state("lazy")
+    guild = discord.Guild(data=guild_payload(1), state=state)
+    channels = {BASE_ID + i: discord.TextChannel(state=state, guild=guild, data={
+        "id": str(BASE_ID + i), "type": 0, "name": f"channel{i}", "position": i, "permission_overwrites": [],
+        "nsfw": False, "parent_id": None}) for i in range(CHANNELS)}
+
+    def build_messages() -> "deque[discord.Message]":
+        cache: "deque[discord.Message]" = deque(maxlen=MESSAGES)
+        for data in payloads:
+            cache.append(discord.Message(state=state, channel=channels[int(data["channel_id"])], data=data))
+        return cache
+
+    def build_snapshots() -> SnapshotCache:
+        cache = SnapshotCache(budget_bytes=1 << 40, per_channel=MESSAGES)
+        for data in payloads:
+            # Parsed the way the cog gets them, from ints discord.py already made
+            cache.add(MessageSnapshot(int(data["id"]), 1, int(data["channel_id"]), int(data["author"]["id"]),
+                                      data["content"], ()))
+        return cache
+
+    full = measure("discord.Message", build_messages)
+    compact = measure("MessageSnapshot", build_snapshots)
+    print(f"\nSnapshots take {compact / full:.0%} of the memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+Compares loading 10k rows as ORM entities against loading them as projection records.
+It runs against an in-memory SQLite copy of the real tables, so it needs no database server:
+python -m utils.benchmarks.bench_projections
+"""
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, List, Tuple
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from database.makedb import Base, Registration, RegRoles
+from database.projections import project
+
+ROWS = 10_000
+ROUNDS = 5
+
+
+def seed(session: Session) -> None:
+    """Fills both tables with ROWS rows"""
+    session.add_all(Registration(user_id=i, gender="male", sexuality="gay", position="switch", dms="ask",
+                                 relationship="single", mention=False, dob="01/01/1999", registered_at=0)
+                    for i in range(ROWS))
+    session.add_all(RegRoles(guild_id=i, **{column.name: i for column in RegRoles.__table__.columns
+                                            if column.name != "guild_id"})
+                    for i in range(ROWS))
+    session.commit()
+
+
+def measure(label: str, load: Callable[[], List[Any]]) -> Tuple[float, int]:
+    """Runs a loader a few times, returns the best time and the peak memory of one run"""
+    best = float("inf")
+    for _ in range(ROUNDS):
+        gc.collect()
+        start = time.perf_counter()
+        rows = load()
+        best = min(best, time.perf_counter() - start)
+        del rows
+    gc.collect()
+    tracemalloc.start()
+    rows = load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    print(f"{label:<40} {best * 1000:8.1f} ms {peak / 1024:10.0f} KiB")
+    return best, peak
+
+
+def main() -> None:
+    """Runs the comparison"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Registration.__table__, RegRoles.__table__])
+    with Session(engine) as session:
+        seed(session)
+
+    cases = [
+        ("registrations, all 14 columns", Registration, ()),
+        ("reg_roles, 3 role IDs", RegRoles, ("registered", "mention_mention", "mention_no_mention")),
+    ]
+    print(f"{ROWS} rows, best of {ROUNDS}\n")
+    for label, model, columns in cases:
+        statement, record = project(model, columns)
+
+        def load_orm(model: Any = model) -> List[Any]:
+            with Session(engine) as session:
+                return list(session.execute(select(model)).scalars())
+
+        def load_records(statement: Any = statement, record: Any = record) -> List[Any]:
+            with Session(engine) as session:
+                return [record._make(row) for row in session.execute(statement)]
+
+        orm_time, orm_peak = measure(f"{label} (ORM)", load_orm)
+        record_time, record_peak = measure(f"{label} (records)", load_records)
+        print(f"{'saved per 10k rows':<40} {(orm_time - record_time) * 1000:8.1f} ms "
+              f"{(orm_peak - record_peak) / 1024:10.0f} KiB\n")
+
+
+if __name__ == "__main__":
+    main()
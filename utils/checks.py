@@ -3,14 +3,18 @@
 # This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
 # To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
 import json
+from typing import Callable, Optional, TypeVar
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from utils.errors import NSFWEndpointCalled
+from utils.eligibility import NSFW_REQUIRES_REGISTRATION, UserFlags, get_flags, may_view_nsfw
+from utils.errors import ContentNotAllowed, NSFWEndpointCalled
 from utils.redis import is_user_blacklisted
 
 
+T = TypeVar("T")
+
 with open("utils/endpoints.json", "r", encoding="utf-8") as f:
     endpoints = json.load(f)
 
@@ -30,4 +34,36 @@ def app_not_blacklisted():
 def prefix_not_blacklisted():
     async def predicate(ctx):
         return not await is_user_blacklisted(ctx.author.id)
-    return commands.check(predicate)
\ No newline at end of file
+    return commands.check(predicate)
+
+def app_eligible(nsfw: bool = False) -> Callable[[T], T]:
+    """
+    Checks the blacklist and, for NSFW commands, the channel and the user's registration in one go.
+    Everything comes from the packed flags cache, so a command costs at most one lookup.
+    """
+    async def predicate(interaction: discord.Interaction) -> bool:
+        flags = await get_flags(interaction.user.id)
+        if flags & UserFlags.BLACKLISTED:
+            return False
+        if not nsfw:
+            return True
+        if not getattr(interaction.channel, "nsfw", False):
+            raise ContentNotAllowed("This command can only be used in age-restricted channels.")
+        if NSFW_REQUIRES_REGISTRATION and not may_view_nsfw(flags):
+            raise ContentNotAllowed("You need to be registered, age verified and opted in to NSFW content "
+                                    "to use this command.")
+        return True
+    return app_commands.check(predicate) # type: ignore
+
+def role_grant_refusal(member: discord.Member, role: discord.Role) -> Optional[str]:
+    """
+    Says why a member can't have the bot hand out a role for them, or None if they can.
+    Members can only set up roles below their own, and roles that carry moderation powers are never handed out.
+    """
+    if not role.is_assignable():
+        return "I can't assign that role, it needs to be below my highest role."
+    if member.id != member.guild.owner_id and role >= member.top_role:
+        return "You can only hand out roles below your highest role."
+    if any(value and (name == "administrator" or name.startswith("manage_")) for name, value in role.permissions):
+        return "I won't hand out a role with administrator or manage permissions."
+    return None
@@ -0,0 +1,77 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the per-user XP cooldown gate"""
+import os
+import time
+from typing import Dict, Optional
+
+REDIS_XP_COOLDOWN = "cynix:xpcd:{}:{}"
+
+
+class ExpiringKeys:
+    """
+    Compact expiring set of integer keys with a single fixed TTL.
+    Because every key lives for the same time, insertion order is expiry order, so expired keys are always
+    at the front of the dict and get dropped in amortised O(1). Past `max_entries` the oldest keys are dropped
+    early, which at worst lets someone through a little before their cooldown ends.
+    """
+    __slots__ = ("ttl", "max_entries", "_expiry")
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._expiry: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def _evict(self, now: float) -> None:
+        expiry = self._expiry
+        while expiry:
+            key = next(iter(expiry))
+            if expiry[key] > now and len(expiry) < self.max_entries:
+                return
+            del expiry[key]
+
+    def add_if_absent(self, key: int, now: float) -> bool:
+        """Adds the key unless it is still live, returns True if it was added"""
+        self._evict(now)
+        expires = self._expiry.get(key)
+        if expires is not None and expires > now:
+            return False
+        self._expiry.pop(key, None)  # Re-insert so it moves to the back
+        self._expiry[key] = now + self.ttl
+        return True
+
+
+class XpCooldown:
+    """
+    Gate that lets one message per (guild_id, user_id) earn XP every `seconds`.
+    The in-process map always answers first, so a message inside the cooldown is rejected without any I/O.
+    With the Redis backend, messages that pass locally also need an atomic SET NX EX, so several clusters
+    never grant XP for the same user twice in one window.
+    """
+    def __init__(self, seconds: float = 60.0, max_entries: int = 200_000, backend: Optional[str] = None) -> None:
+        self.seconds = seconds
+        self.backend = backend or os.getenv("XP_COOLDOWN_BACKEND", "memory")
+        self._local = ExpiringKeys(seconds, max_entries)
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+    def try_acquire_local(self, guild_id: int, user_id: int, now: Optional[float] = None) -> bool:
+        """Checks and starts the cooldown in this process only"""
+        return self._local.add_if_absent(guild_id << 64 | user_id, time.monotonic() if now is None else now)
+
+    async def try_acquire(self, guild_id: int, user_id: int) -> bool:
+        """Returns True if the message may earn XP, starting the cooldown if so"""
+        if not self.try_acquire_local(guild_id, user_id):
+            return False
+        if self.backend != "redis":
+            return True
+        from utils.redis import get_redis
+        redis_client = await get_redis()
+        return bool(await redis_client.set(REDIS_XP_COOLDOWN.format(guild_id, user_id), 1,
+                                           nx=True, ex=max(1, int(self.seconds))))
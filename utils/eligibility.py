@@ -0,0 +1,167 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the packed per-user flags that decide who may see gated content"""
+import os
+import time
+import uuid
+from enum import IntFlag
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+from redis.exceptions import RedisError
+from utils.logger import logger
+from utils.redis import get_redis
+
+if TYPE_CHECKING:
+    from utils.ipc import ClusterIPC
+
+REDIS_ELIGIBILITY = "cynix:eligibility"  # One key per user under this prefix, so each can expire on its own
+REDIS_TTL = 3600  # Bounds how long anything that slipped past invalidation can stay in Redis
+LOCAL_TTL = 60.0  # Other clusters' changes reach this process within this long if the IPC broadcast is lost
+LOCAL_MAX_ENTRIES = 100_000
+# Nothing registers users yet, so NSFW custom commands only check the channel unless this is set
+NSFW_REQUIRES_REGISTRATION = bool(os.getenv("NSFW_REQUIRES_REGISTRATION"))
+# Writes computed flags only if the key still holds what was read before the database was asked.
+# Invalidating leaves a unique marker instead of deleting, so a computation that started before it can't land after it
+STORE_FLAGS_SCRIPT = """
+if (redis.call("get", KEYS[1]) or "") == ARGV[1] then
+    return redis.call("set", KEYS[1], ARGV[2], "EX", ARGV[3])
+end
+return false
+"""
+
+
+class UserFlags(IntFlag):
+    """Everything gated content checks about a user, packed into one integer"""
+    KNOWN = 1  # Set on every computed value, so a user with no other flags isn't mistaken for a miss
+    REGISTERED = 2
+    AGE_VERIFIED = 4
+    NSFW = 8
+    NSFW_LOCKOUT = 16
+    ARTIST_VERIFIED = 32
+    ARTIST_LOCKOUT = 64
+    BLACKLISTED = 128
+
+
+REGISTRATION_COLUMNS = ("age_verified", "nsfw", "nsfw_lockout", "artist_verified", "artist_lockout")
+
+
+def pack(registration: Optional[Any], blacklisted: bool) -> UserFlags:
+    """Packs a registration record, or None if unregistered, and the blacklist state into flags"""
+    flags = UserFlags.KNOWN
+    if blacklisted:
+        flags |= UserFlags.BLACKLISTED
+    if registration is not None:
+        flags |= UserFlags.REGISTERED
+        for column in REGISTRATION_COLUMNS:
+            if getattr(registration, column):
+                flags |= UserFlags[column.upper()]
+    return flags
+
+
+def may_view_nsfw(flags: UserFlags) -> bool:
+    """A user sees NSFW content once registered, age verified and opted in, unless locked out or blacklisted"""
+    required = UserFlags.REGISTERED | UserFlags.AGE_VERIFIED | UserFlags.NSFW
+    return flags & required == required and not flags & (UserFlags.NSFW_LOCKOUT | UserFlags.BLACKLISTED)
+
+
+def may_post_art(flags: UserFlags) -> bool:
+    """Artist-only features need a verified artist that isn't locked out or blacklisted"""
+    return bool(flags & UserFlags.ARTIST_VERIFIED) and \
+        not flags & (UserFlags.ARTIST_LOCKOUT | UserFlags.BLACKLISTED)
+
+
+_local: Dict[int, Tuple[float, UserFlags]] = {}
+_ipc: Optional["ClusterIPC"] = None
+
+
+def attach_ipc(ipc: "ClusterIPC") -> None:
+    """Makes invalidations reach every cluster's local cache, instead of waiting for LOCAL_TTL there"""
+    global _ipc # pylint: disable=W0603
+    _ipc = ipc
+    ipc.register("eligibility_invalidate", _ipc_invalidate)
+    ipc.register("eligibility_clear", _ipc_clear)
+
+
+async def _ipc_invalidate(args: Dict[str, Any]) -> None:
+    for user_id in args["user_ids"]:
+        _local.pop(int(user_id), None)
+
+
+async def _ipc_clear(_: Dict[str, Any]) -> None:
+    _local.clear()
+
+
+async def _announce(op: str, **args: Any) -> None:
+    if _ipc is None:
+        return
+    try:
+        await _ipc.broadcast(op, **args)
+    except RedisError as e:
+        logger.warning("Couldn't tell other clusters about an eligibility change, it shows there within %ss: %s",
+                       LOCAL_TTL, e)
+
+
+def _remember(user_id: int, flags: UserFlags) -> None:
+    _local.pop(user_id, None)  # Re-insert so insertion order stays expiry order
+    _local[user_id] = (time.monotonic() + LOCAL_TTL, flags)
+    while len(_local) > LOCAL_MAX_ENTRIES:
+        del _local[next(iter(_local))]
+
+
+async def _compute(user_id: int) -> UserFlags:
+    from database.db_io import Registration
+    from utils.redis import is_user_blacklisted
+    registration = await Registration.check_user_entry(user_id, *REGISTRATION_COLUMNS)
+    return pack(registration, await is_user_blacklisted(user_id))
+
+
+def _key(user_id: int) -> str:
+    return f"{REDIS_ELIGIBILITY}:{user_id}"
+
+
+async def get_flags(user_id: int) -> UserFlags:
+    """Gets a user's flags, from this process, then Redis, and only from the database on a miss in both"""
+    cached = _local.get(user_id)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    redis_client = await get_redis()
+    key = _key(user_id)
+    stored = await redis_client.get(key)
+    if stored is not None and stored.isdigit():
+        flags = UserFlags(int(stored))
+    else:
+        flags = await _compute(user_id)
+        await redis_client.eval(STORE_FLAGS_SCRIPT, 1, key, stored or "", int(flags), REDIS_TTL)
+    _remember(user_id, flags)
+    return flags
+
+
+async def invalidate_eligibility(user_ids: Iterable[int]) -> None:
+    """Forgets users' flags after their registration or blacklist state changed, they are recomputed on next use"""
+    ids: List[int] = list(user_ids)
+    if not ids:
+        return
+    for user_id in ids:
+        _local.pop(user_id, None)
+    redis_client = await get_redis()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for user_id in ids:
+            pipe.set(_key(user_id), f"stale:{uuid.uuid4().hex}", ex=REDIS_TTL)
+        await pipe.execute()
+    await _announce("eligibility_invalidate", user_ids=ids)
+
+
+async def clear_eligibility() -> None:
+    """Forgets every user's flags, used when the blacklist is rebuilt from scratch"""
+    _local.clear()
+    redis_client = await get_redis()
+    batch: List[str] = []
+    async for key in redis_client.scan_iter(match=f"{REDIS_ELIGIBILITY}:*", count=1000):
+        batch.append(key)
+        if len(batch) >= 1000:
+            await redis_client.unlink(*batch)
+            batch.clear()
+    if batch:
+        await redis_client.unlink(*batch)
+    await _announce("eligibility_clear")
@@ -11,6 +11,7 @@ from discord import Webhook, Embed
 from discord.ui import View, Button
 from dotenv import load_dotenv
 from .logger import logger
+from .outbound import Priority
 load_dotenv()
 
 url = os.getenv("MB_URL")
@@ -35,28 +36,33 @@ async def send_error(name: str, error: str) -> Dict[str, str]:
             if response.status != 200:
                 logger.error("An error occurred while sending error report")
 
-                await webhook.send(content="An error occurred while sending error report",
-                                   username="Error Errored",
-                                   avatar_url="https://media.tachyonind.org/h5MU")
+                await bot.outbound.send(webhook, Priority.LOG,
+                                        content="An error occurred while sending error report",
+                                        username="Error Errored",
+                                        avatar_url="https://media.tachyonind.org/h5MU")
                 return {"Response": "An error occurred while sending error report"}
 
             data = await response.json()
 
+            # Link buttons are handled by the client, so the view is never registered and nothing is kept per report
             view = ErrorView(error_url=f"{url}/{data['id']}",
-                             delete_url = f"{url}/api/security/delete/{data['safety']}")
-            bot.add_view(view)
+                             delete_url=f"{url}/api/security/delete/{data['safety']}")
 
             embed = Embed(title="New Error Report")
             embed.set_footer(text=dt.now(tz.utc).strftime("%m/%d/%Y %H:%M"))
-            await webhook.send(embed=embed,
-                               view=view,
-                               username="New Error Report",
-                               avatar_url="https://media.tachyonind.org/h5MU")
+            await bot.outbound.send(webhook, Priority.LOG,
+                                    embed=embed,
+                                    view=view,
+                                    username="New Error Report",
+                                    avatar_url="https://media.tachyonind.org/h5MU")
 
             return {"error_url": data["id"], "delete_url": data["safety"]}
 
 class ErrorView(View):  # type: ignore
-    """Custom error-handling view with unique delete button IDs"""
+    """
+    Link buttons to view and delete an error report.
+    Nothing in it is dispatched to the bot, so it doesn't need to be persistent or added to the view store.
+    """
     def __init__(self, error_url: Optional[str] = None, delete_url: Optional[str] = None) -> None:
         super().__init__(timeout=None)
 
@@ -4,6 +4,7 @@
 # To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
 """This file contains all the errors that can be raised"""
 from aiohttp.web_exceptions import HTTPUnauthorized
+from discord import app_commands
 
 class InvalidEndpointError(ValueError):
     """Error that is raised when an invalid endpoint is requested from the API"""
@@ -19,4 +20,9 @@ class NSFWEndpointCalled(Exception):
 class UnauthorizedError(HTTPUnauthorized):
     """Error that is raised when an unauthorized request is made to the API"""
     def __init__(self):
-        super().__init__(reason="Unauthorized, please make sure your API key is correct.")
\ No newline at end of file
+        super().__init__(reason="Unauthorized, please make sure your API key is correct.")
+
+class ContentNotAllowed(app_commands.CheckFailure): # type: ignore
+    """Error that is raised when a user or channel isn't eligible for gated content"""
+    def __init__(self, reason: str):
+        super().__init__(reason)
@@ -0,0 +1,139 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the Redis backed channel the clusters use to talk to each other"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from utils.logger import logger
+from utils.redis import get_redis
+
+IPC_CHANNEL = "cynix:ipc"
+CLUSTER_HEALTH_KEY = "cynix:cluster:{}"
+HEALTH_TTL = 45
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ClusterIPC:
+    """Publishes and receives owner commands across every running cluster"""
+    def __init__(self, cluster_id: int) -> None:
+        self.cluster_id = cluster_id
+        self._handlers: Dict[str, Handler] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+        self._subscribed = False
+        self._subscribed_once = False
+
+    def register(self, op: str, handler: Handler) -> None:
+        """Registers a coroutine to run when another cluster broadcasts `op`"""
+        self._handlers[op] = handler
+
+    def unregister(self, op: str) -> None:
+        """Stops handling `op`, for cogs that registered a handler and are being unloaded"""
+        self._handlers.pop(op, None)
+
+    async def broadcast(self, op: str, **args: Any) -> int:
+        """Sends an op to every other cluster, returns the number of other clusters that received it"""
+        redis_client = await get_redis()
+        message = json.dumps({"op": op, "origin": self.cluster_id, "args": args})
+        receivers = int(await redis_client.publish(IPC_CHANNEL, message))
+        # Our own listener is subscribed too and counts as a receiver, it just ignores the message
+        return max(0, receivers - 1) if self._subscribed else receivers
+
+    def start(self) -> None:
+        """Starts listening in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen(), name=f"cluster-{self.cluster_id}-ipc")
+
+    async def stop(self) -> None:
+        """Stops listening"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self) -> None:
+        """Keeps a subscription open, resubscribing with backoff whenever the connection to Redis drops"""
+        backoff = ExponentialBackoff(cap=30, base=0.5)
+        failures = 0
+        while True:
+            try:
+                await self._receive()
+            except (RedisConnectionError, RedisTimeoutError) as e:
+                # A subscription that got going before it dropped starts the backoff over
+                failures = 1 if self._subscribed_once else failures + 1
+                delay = backoff.compute(failures)
+                logger.warning("IPC lost its Redis connection (%s), resubscribing in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+            else:
+                # The subscription ended without an error, waiting keeps a server that keeps closing it from
+                # turning this into a busy loop
+                failures = 0
+                delay = backoff.compute(1)
+                logger.warning("IPC subscription ended, resubscribing in %.1fs", delay)
+                await asyncio.sleep(delay)
+
+    async def _receive(self) -> None:
+        self._subscribed_once = False
+        redis_client = await get_redis()
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(IPC_CHANNEL)
+            self._subscribed = self._subscribed_once = True
+            async for message in pubsub.listen():
+                try:
+                    data = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if data.get("origin") == self.cluster_id:
+                    continue
+                handler = self._handlers.get(data.get("op"))
+                if handler is None:
+                    continue
+                try:
+                    await handler(data.get("args") or {})
+                except Exception as e: # pylint: disable=W0718
+                    logger.error("IPC handler for %s failed: %s", data.get("op"), e, exc_info=True)
+        finally:
+            self._subscribed = False
+            try:
+                await pubsub.aclose()
+            except (RedisConnectionError, RedisTimeoutError):
+                pass
+
+async def report_health(cluster_id: int, **stats: Any) -> None:
+    """Stores this cluster's health, the key expires on its own if the cluster dies"""
+    redis_client = await get_redis()
+    key = CLUSTER_HEALTH_KEY.format(cluster_id)
+    payload = {k: json.dumps(v) for k, v in stats.items()}
+    payload["reported_at"] = json.dumps(time.time())
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=payload)
+        pipe.expire(key, HEALTH_TTL)
+        await pipe.execute()
+
+
+async def get_cluster_health() -> List[Dict[str, Any]]:
+    """Gets the last health report of every live cluster"""
+    redis_client = await get_redis()
+    keys = [key async for key in redis_client.scan_iter(match=CLUSTER_HEALTH_KEY.format("*"))]
+    if not keys:
+        return []
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hgetall(key)
+        reports = await pipe.execute()
+    clusters = []
+    for key, report in zip(keys, reports):
+        if report:
+            data = {k: json.loads(v) for k, v in report.items()}
+            data["cluster_id"] = int(key.rsplit(":", 1)[1])
+            clusters.append(data)
+    return sorted(clusters, key=lambda c: c["cluster_id"])
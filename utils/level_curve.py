@@ -0,0 +1,107 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the XP to level curves, levels are not stored so they are derived from XP here"""
+import time
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Tuple
+
+MAX_LEVEL = 1000
+CONFIG_TTL = 300.0
+
+
+class LevelProgress(NamedTuple):
+    """Where a user is on the curve"""
+    level: int
+    xp_into_level: int
+    xp_for_next: int
+
+
+class LevelCurve:
+    """
+    Precomputed cumulative XP table, the XP needed to go from level l to l + 1 is a*l^2 + b*l + c.
+    Every lookup is a single bisect, so nothing ever loops over levels.
+    """
+    __slots__ = ("name", "_cumulative")
+
+    def __init__(self, name: str, a: int, b: int, c: int, max_level: int = MAX_LEVEL) -> None:
+        self.name = name
+        cumulative: List[int] = [0]
+        for level in range(max_level):
+            cumulative.append(cumulative[-1] + a * level * level + b * level + c)
+        self._cumulative = cumulative
+
+    @property
+    def max_level(self) -> int:
+        """The highest level on this curve"""
+        return len(self._cumulative) - 1
+
+    def level_for(self, xp: int) -> int:
+        """Gets the level for a total XP"""
+        return max(0, bisect_right(self._cumulative, xp) - 1)
+
+    def xp_for_level(self, level: int) -> int:
+        """Gets the total XP needed to reach a level"""
+        return self._cumulative[min(max(level, 0), self.max_level)]
+
+    def progress(self, xp: int) -> LevelProgress:
+        """Gets the level, XP into that level and XP needed for the next one"""
+        level = self.level_for(xp)
+        if level >= self.max_level:
+            return LevelProgress(level, xp - self._cumulative[-1], 0)
+        start = self._cumulative[level]
+        return LevelProgress(level, xp - start, self._cumulative[level + 1] - start)
+
+    def crossed(self, old_xp: int, new_xp: int) -> range:
+        """Gets the levels reached going from old_xp to new_xp, empty if none"""
+        return range(self.level_for(old_xp) + 1, self.level_for(new_xp) + 1)
+
+
+class XpGrant(NamedTuple):
+    """The result of granting XP, `levels` holds every level boundary the grant crossed"""
+    xp: int
+    gained: int
+    levels: range
+
+    @property
+    def level(self) -> int:
+        """The level after the grant"""
+        return self.levels[-1] if self.levels else self.levels.start - 1
+
+
+CURVES: Dict[str, LevelCurve] = {
+    "default": LevelCurve("default", 5, 50, 100),
+    "gentle": LevelCurve("gentle", 2, 30, 80),
+    "steep": LevelCurve("steep", 10, 75, 150),
+    "linear": LevelCurve("linear", 0, 100, 100),
+}
+
+_guild_config: Dict[int, Tuple[float, LevelCurve, float, bool]] = {}
+
+
+def invalidate_guild_levelling(guild_id: int) -> None:
+    """Forgets a guild's cached levelling settings, call this whenever the Logs row changes"""
+    _guild_config.pop(guild_id, None)
+
+
+async def _get_config(guild_id: int) -> Tuple[float, LevelCurve, float, bool]:
+    from database.db_io import Logs
+    now = time.monotonic()
+    cached = _guild_config.get(guild_id)
+    if cached is None or cached[0] < now:
+        curve_name, multiplier, level_up_messages = await Logs.get_levelling_config(guild_id)
+        cached = _guild_config[guild_id] = (now + CONFIG_TTL, CURVES.get(curve_name or "default", CURVES["default"]),
+                                            multiplier if multiplier is not None else 1.0, level_up_messages)
+    return cached
+
+
+async def get_guild_levelling(guild_id: int) -> Tuple[LevelCurve, float]:
+    """Gets a guild's curve and XP multiplier, cached so message XP doesn't look them up every time"""
+    _, curve, multiplier, _ = await _get_config(guild_id)
+    return curve, multiplier
+
+
+async def level_up_messages_enabled(guild_id: int) -> bool:
+    """Checks if a guild wants level ups announced, off unless turned on with /levels announcements"""
+    return (await _get_config(guild_id))[3]
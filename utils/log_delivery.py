@@ -0,0 +1,234 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the batched delivery pipeline for the guild log channels"""
+import asyncio
+import time
+from collections import Counter, deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple
+import discord
+from utils.logger import logger
+from utils.outbound import Priority
+
+if TYPE_CHECKING:
+    from bot import Cynix
+
+MAX_EMBEDS = 10  # Discord's limit per message
+MAX_EMBED_CHARS = 6000  # Discord's limit for all embeds in one message combined
+LOG_KINDS = ("message_logs", "member_logs", "voice_logs", "mod_logs", "reaction_logging")
+CONFIG_TTL = 300.0
+MAX_ATTEMPTS = 3  # Tries per batch before it is dropped, so a channel that keeps failing can't retry forever
+
+_log_config: Dict[int, Tuple[float, Dict[str, Optional[int]]]] = {}
+
+
+def invalidate_log_config(guild_id: int) -> None:
+    """Forgets the cached log channels for a guild, call this whenever the Logs row changes"""
+    _log_config.pop(guild_id, None)
+
+
+async def get_log_channel(guild_id: int, kind: str) -> Optional[int]:
+    """Gets the configured channel for a log kind, cached so busy guilds don't hit the database per event"""
+    from database.db_io import Logs
+    cached = _log_config.get(guild_id)
+    now = time.monotonic()
+    if cached is None or cached[0] < now:
+        channels = await Logs.get_log_channels(guild_id) or {}
+        cached = _log_config[guild_id] = (now + CONFIG_TTL, channels)
+    return cached[1].get(kind)
+
+
+class WebhookCache:
+    """Keeps one bot-owned webhook per channel so we never fetch or create one per message"""
+    def __init__(self, bot: "Cynix", name: str = "Cynix") -> None:
+        self.bot = bot
+        self.name = name
+        self._webhooks: Dict[int, discord.Webhook] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    async def get(self, channel: discord.TextChannel) -> discord.Webhook:
+        """Gets the channel's webhook, fetching or creating it the first time only"""
+        webhook = self._webhooks.get(channel.id)
+        if webhook is not None:
+            return webhook
+        lock = self._locks.setdefault(channel.id, asyncio.Lock())
+        async with lock:
+            webhook = self._webhooks.get(channel.id)
+            if webhook is None:
+                webhook = next((hook for hook in await channel.webhooks()
+                                if hook.user == self.bot.user and hook.token), None)
+                if webhook is None:
+                    webhook = await channel.create_webhook(name=self.name)
+                self._webhooks[channel.id] = webhook
+        self._locks.pop(channel.id, None)
+        return webhook
+
+    def invalidate(self, channel_id: int) -> None:
+        """Forgets a webhook that was deleted or stopped working"""
+        self._webhooks.pop(channel_id, None)
+
+
+class _ChannelQueue:
+    """Pending embeds for a single log channel"""
+    __slots__ = ("channel_id", "pending", "overflow", "ready", "next_send", "failures", "task")
+
+    def __init__(self, channel_id: int, max_pending: int) -> None:
+        self.channel_id = channel_id
+        self.pending: Deque[discord.Embed] = deque(maxlen=max_pending)
+        self.overflow: Counter[str] = Counter()
+        self.ready = asyncio.Event()
+        self.next_send = 0.0
+        self.failures = 0
+        self.task: Optional[asyncio.Task[None]] = None
+
+    def take_batch(self) -> List[discord.Embed]:
+        """Pops as many embeds as fit in a single message"""
+        batch: List[discord.Embed] = []
+        chars = 0
+        while self.pending and len(batch) < MAX_EMBEDS:
+            size = len(self.pending[0])
+            if batch and chars + size > MAX_EMBED_CHARS:
+                break
+            batch.append(self.pending.popleft())
+            chars += size
+        if self.overflow and len(batch) < MAX_EMBEDS and not self.pending:
+            batch.append(self.overflow_summary())
+        return batch
+
+    def requeue(self, batch: List[discord.Embed]) -> None:
+        """Puts a batch that failed back at the front, whatever that pushes off the end is counted as overflow"""
+        for embed in reversed(batch):
+            if len(self.pending) == self.pending.maxlen:
+                dropped = self.pending.pop()
+                self.overflow[dropped.title or "Log event"] += 1
+            self.pending.appendleft(embed)
+
+    def overflow_summary(self) -> discord.Embed:
+        """Summarises the events that were dropped while the queue was full"""
+        total = sum(self.overflow.values())
+        lines = [f"{count}x {title}" for title, count in self.overflow.most_common(10)]
+        self.overflow.clear()
+        embed = discord.Embed(title=f"{total} more log events were not shown",
+                              description="\n".join(lines),
+                              colour=discord.Colour.orange())
+        return embed
+
+
+class LogDelivery:
+    """
+    Queues log embeds per channel and sends them in batches of up to 10 through a cached webhook.
+    A batch goes out when it is full or after `flush_interval`, whichever comes first, and each channel
+    waits at least `send_interval` between sends to stay under the webhook rate limit.
+    When a channel's queue is full the newest events are counted instead of queued and sent as a summary.
+    A batch that fails is put back at the front and tried up to MAX_ATTEMPTS times before it is dropped.
+    """
+    def __init__(self,
+                 bot: "Cynix",
+                 flush_interval: float = 2.0,
+                 send_interval: float = 2.0,
+                 max_pending: int = 200) -> None:
+        self.bot = bot
+        self.flush_interval = flush_interval
+        self.send_interval = send_interval
+        self.max_pending = max_pending
+        self.webhooks = WebhookCache(bot, name="Cynix Logs")
+        self._queues: Dict[int, _ChannelQueue] = {}
+
+    def enqueue(self, channel_id: int, embed: discord.Embed) -> None:
+        """Queues an embed for a log channel, never blocks"""
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = _ChannelQueue(channel_id, self.max_pending)
+        if len(queue.pending) == self.max_pending:
+            queue.overflow[embed.title or "Log event"] += 1
+        else:
+            queue.pending.append(embed)
+        if len(queue.pending) >= MAX_EMBEDS:
+            queue.ready.set()
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.create_task(self._drain(queue), name=f"log-delivery-{channel_id}")
+
+    async def send_log(self, guild_id: int, kind: str, embed: discord.Embed) -> bool:
+        """Queues an embed for the guild's configured log channel, returns False if that log is disabled"""
+        channel_id = await get_log_channel(guild_id, kind)
+        if channel_id is None:
+            return False
+        self.enqueue(channel_id, embed)
+        return True
+
+    def queue_depth(self, channel_id: Optional[int] = None) -> int:
+        """Gets the number of pending embeds for one channel or for every channel"""
+        if channel_id is not None:
+            queue = self._queues.get(channel_id)
+            return len(queue.pending) if queue else 0
+        return sum(len(queue.pending) for queue in self._queues.values())
+
+    async def close(self) -> None:
+        """Sends whatever is still queued, used on shutdown"""
+        for queue in list(self._queues.values()):
+            if queue.task is not None:
+                queue.task.cancel()
+            while queue.pending or queue.overflow:
+                before = len(queue.pending)
+                await self._send(queue, queue.take_batch())
+                if len(queue.pending) >= before:
+                    break  # Still rate limited, give up rather than hold up shutdown
+        self._queues.clear()
+
+    async def _drain(self, queue: _ChannelQueue) -> None:
+        while queue.pending or queue.overflow:
+            if len(queue.pending) < MAX_EMBEDS:
+                queue.ready.clear()
+                try:
+                    await asyncio.wait_for(queue.ready.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            delay = queue.next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            batch = queue.take_batch()
+            if batch:
+                await self._send(queue, batch)
+        self._queues.pop(queue.channel_id, None)
+
+    async def _send(self, queue: _ChannelQueue, batch: List[discord.Embed]) -> None:
+        if not batch:
+            return
+        channel = self.bot.get_channel(queue.channel_id)
+        if not isinstance(channel, discord.TextChannel):
+            logger.warning("Dropping %s log embeds for unknown channel %s", len(batch), queue.channel_id)
+            return
+        try:
+            try:
+                webhook = await self.webhooks.get(channel)
+                await self.bot.outbound.send(webhook, Priority.LOG, embeds=batch, username=self.bot.user.name,
+                                             avatar_url=self.bot.user.display_avatar.url)
+            except discord.Forbidden:
+                # No manage webhooks permission, fall back to a normal message
+                await self.bot.outbound.send(channel, Priority.LOG, embeds=batch)
+        except discord.NotFound:
+            self.webhooks.invalidate(channel.id)
+            self._retry(queue, batch, "the webhook was deleted")
+        except discord.HTTPException as e:
+            if e.status == 429 and self._retry(queue, batch, "rate limited"):
+                queue.next_send = time.monotonic() + float(getattr(e, "retry_after", self.send_interval))
+                return
+            if e.status != 429:
+                queue.failures = 0
+                logger.error("Failed to deliver %s log embeds to %s: %s", len(batch), channel.id, e)
+        else:
+            queue.failures = 0
+        queue.next_send = time.monotonic() + self.send_interval
+
+    @staticmethod
+    def _retry(queue: _ChannelQueue, batch: List[discord.Embed], reason: str) -> bool:
+        """Requeues a failed batch unless it has used up its attempts, returns whether it was requeued"""
+        queue.failures += 1
+        if queue.failures >= MAX_ATTEMPTS:
+            queue.failures = 0
+            logger.error("Dropping %s log embeds for %s after %s attempts, %s",
+                         len(batch), queue.channel_id, MAX_ATTEMPTS, reason)
+            return False
+        queue.requeue(batch)
+        return True
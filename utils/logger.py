@@ -3,32 +3,188 @@
 #
 # This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
 # To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
-import os
+#
+# Records are only put on a queue on the event loop, a background thread formats and writes them.
+# stdout gets everything below ERROR and stderr gets ERROR and up, so each record is printed once, and the file
+# gets JSON lines, rotated by size or age (whichever comes first) and gzipped on rotation.
+# LOG_LEVEL, LOG_FORMAT (text or json, for the console), LOG_MAX_MB, LOG_ROTATE_HOURS, LOG_BACKUPS and
+# LOG_DEBUG_SAMPLE (let 1 in N of each debug call site through) tune it.
+import atexit
+import copy
+import datetime
+import gzip
+import json
 import logging
+import os
+import queue
+import shutil
 import sys
-import datetime
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+load_dotenv()
 
-log_directory = os.path.join(os.getcwd(), 'logs')
-if not os.path.exists(log_directory):
-    os.makedirs(log_directory)
+CONTEXT_FIELDS = ("guild", "command", "latency_ms")
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 
-logger = logging.getLogger(__name__)
+_log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+
+def bind_log_context(**fields: Any) -> None:
+    """Adds fields, such as the guild and command being handled, to everything the current task logs from now on"""
+    _log_context.set({**_log_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Copies the task's bound fields onto the record, it has to run on the loop since context is per task"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Lets the first and then every `rate`th debug record of each call site through, so hot paths can't flood"""
+    def __init__(self, rate: int) -> None:
+        super().__init__()
+        self.rate = rate
+        self._counts: Dict[Tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % self.rate:
+            return False
+        record.sampled = self.rate  # Each record that gets through stands for this many
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the cluster, guild, command and latency fields when there are any"""
+    def __init__(self, cluster_id: str) -> None:
+        super().__init__()
+        self.cluster_id = cluster_id
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(
+                timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "cluster": self.cluster_id,
+            "msg": record.getMessage(),
+        }
+        for key in (*CONTEXT_FIELDS, "sampled"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(QueueHandler):
+    """Renders the message and traceback on the way in, but keeps them apart so the file can store them as fields"""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
 
-log_file = os.path.join(log_directory,
-                        f"log_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M_%S')}.log")
-logging.basicConfig(level=logging.INFO,
-                    format="%(asctime)s - %(levelname)s - %(message)s",
-                    filename=log_file,
-                    filemode="a")
-
-stdout_handler = logging.StreamHandler(sys.stdout)
-stdout_handler.setLevel(logging.DEBUG)
-stdout_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logging.getLogger().addHandler(stdout_handler)
-
-stderr_handler = logging.StreamHandler(sys.stderr)
-stderr_handler.setLevel(logging.ERROR)
-stderr_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logging.getLogger().addHandler(stderr_handler)
+
+class _BelowError(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno < logging.ERROR
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """Rotates when the file reaches max_bytes or gets older than `interval` seconds, and gzips the old files"""
+    def __init__(self, filename: str, max_bytes: int, interval: float, backups: int) -> None:
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+        self.namer = lambda name: name + ".gz"
+        self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        with open(source, "rb") as raw, gzip.open(dest, "wb") as compressed:
+            shutil.copyfileobj(raw, compressed)
+        os.remove(source)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if time.time() >= self.rollover_at and os.path.exists(self.baseFilename) and \
+                os.path.getsize(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Routes the root logger through the queue, safe to call more than once"""
+    global _listener # pylint: disable=W0603
+    if _listener is not None:
+        return
+    cluster_id = os.getenv("CLUSTER_ID", "0")
+    level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+    log_directory = os.path.join(os.getcwd(), 'logs')
+    os.makedirs(log_directory, exist_ok=True)
+
+    console_formatter = JsonFormatter(cluster_id) if os.getenv("LOG_FORMAT") == "json" \
+        else logging.Formatter(TEXT_FORMAT)
+    stdout_handler = logging.StreamHandler(sys.stdout)
+    stdout_handler.addFilter(_BelowError())
+    stdout_handler.setFormatter(console_formatter)
+    stderr_handler = logging.StreamHandler(sys.stderr)
+    stderr_handler.setLevel(logging.ERROR)
+    stderr_handler.setFormatter(console_formatter)
+    # One file per cluster, processes rotating the same file would step on each other
+    file_handler = CompressingRotatingFileHandler(
+        os.path.join(log_directory, f"cynix-{cluster_id}.log"),
+        max_bytes=int(os.getenv("LOG_MAX_MB", "20")) * 1024 * 1024,
+        interval=float(os.getenv("LOG_ROTATE_HOURS", "24")) * 3600,
+        backups=int(os.getenv("LOG_BACKUPS", "14")))
+    file_handler.setFormatter(JsonFormatter(cluster_id))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(DebugSampler(int(os.getenv("LOG_DEBUG_SAMPLE", "100"))))
+    queue_handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    _listener = QueueListener(log_queue, stdout_handler, stderr_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Writes out whatever is still queued and stops the writer thread"""
+    global _listener # pylint: disable=W0603
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 logger.info("Logging initialized successfully")
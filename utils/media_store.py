@@ -0,0 +1,126 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the on-disk, content-addressed store for custom command images"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterator, Optional, Set
+
+if TYPE_CHECKING:
+    import discord
+
+MEDIA_STORE_PATH = os.getenv("MEDIA_STORE_PATH", "media")
+MAX_IMAGE_BYTES = 8 * 1024 * 1024
+# Unreferenced files younger than this survive a sweep, a command using them may still be on its way to the database
+SWEEP_GRACE_SECONDS = float(os.getenv("MEDIA_SWEEP_GRACE", "86400"))
+# The image types custom commands accept, and the extension Discord needs to show each one inline
+EXTENSIONS: Dict[str, str] = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+_SIGNATURES = ((b"\x89PNG\r\n\x1a\n", "png"), (b"\xff\xd8\xff", "jpg"), (b"GIF8", "gif"))
+
+
+class MediaStore:
+    """
+    Files are named by the SHA-256 of their bytes and fanned out over two directory levels, so the same image
+    uploaded twice is stored once and the database only keeps the 64 character hash.
+    Writes go to a temp file first and are renamed into place, so a reader never sees half a file.
+    """
+    def __init__(self, root: str = MEDIA_STORE_PATH) -> None:
+        self.root = root
+
+    @staticmethod
+    def is_digest(digest: str) -> bool:
+        """Checks a string looks like one of our hashes, so nothing else can be turned into a path"""
+        return len(digest) == 64 and all(char in "0123456789abcdef" for char in digest)
+
+    def path(self, digest: str) -> str:
+        """Gets where a hash lives on disk"""
+        if not self.is_digest(digest):
+            raise ValueError(f"Not a media hash: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    @staticmethod
+    def extension(content_type: Optional[str]) -> Optional[str]:
+        """Gets the extension for a content type we store, None for anything else"""
+        return EXTENSIONS.get((content_type or "").split(";")[0].strip().lower())
+
+    def exists(self, digest: str) -> bool:
+        """Checks if a hash is stored"""
+        return os.path.isfile(self.path(digest))
+
+    def put(self, data: bytes) -> str:
+        """Stores bytes and returns their hash, storing the same bytes again is a no-op"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.isfile(path):
+            # An old unreferenced copy may be about to be used again, restart its sweep grace period
+            os.utime(path)
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp, path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+        return digest
+
+    async def put_async(self, data: bytes) -> str:
+        """Hashes and writes in a thread so big uploads don't block the event loop"""
+        return await asyncio.to_thread(self.put, data)
+
+    @staticmethod
+    def _sniff(file: BinaryIO) -> str:
+        """Guesses the extension of a file stored without a content type from its first bytes"""
+        header = file.read(12)
+        file.seek(0)
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return "webp"
+        return next((extension for signature, extension in _SIGNATURES if header.startswith(signature)), "png")
+
+    def as_file(self, digest: str, content_type: Optional[str] = None) -> Optional["discord.File"]:
+        """
+        Opens a stored file for sending, discord.py streams it from disk, None if it is missing.
+        The filename's extension comes from the content type stored with the hash, or the file itself if there is none.
+        """
+        import discord
+        try:
+            file = open(self.path(digest), "rb") # pylint: disable=R1732
+        except FileNotFoundError:
+            return None
+        extension = self.extension(content_type) or self._sniff(file)
+        return discord.File(file, filename=f"image.{extension}")
+
+    def digests(self) -> Iterator[str]:
+        """Walks every stored hash"""
+        for _, _, files in os.walk(self.root):
+            for name in files:
+                if self.is_digest(name):
+                    yield name
+
+    def sweep(self, live: Set[str], min_age: float = SWEEP_GRACE_SECONDS) -> int:
+        """
+        Deletes every stored file not in `live`, returns how many went.
+        Files newer than `min_age` seconds are kept, their row may not have been committed yet.
+        """
+        removed = 0
+        cutoff = time.time() - min_age
+        for digest in list(self.digests()):
+            path = self.path(digest)
+            if digest not in live and os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+                removed += 1
+        return removed
+
+
+media_store = MediaStore()
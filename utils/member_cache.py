@@ -0,0 +1,53 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the member cache policy and on-demand guild chunking"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+import discord
+from utils.logger import logger
+
+POLICIES = ("full", "lazy", "minimal")
+
+_chunking: Dict[int, "asyncio.Task[None]"] = {}
+
+
+def member_cache_options(policy: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Gets the client options for a member cache policy, MEMBER_CACHE if none is given.
+    full: every member of every guild, chunked before on_ready, the old behaviour.
+    lazy: members who join or sit in voice while we're online, plus guilds chunked by ensure_chunked.
+    minimal: only members in voice and guilds chunked by ensure_chunked, joins aren't cached.
+    """
+    policy = (policy or os.getenv("MEMBER_CACHE") or "lazy").lower()
+    if policy == "full":
+        return {"member_cache_flags": discord.MemberCacheFlags.all(), "chunk_guilds_at_startup": True}
+    if policy == "lazy":
+        return {"member_cache_flags": discord.MemberCacheFlags.all(), "chunk_guilds_at_startup": False}
+    if policy == "minimal":
+        return {"member_cache_flags": discord.MemberCacheFlags(voice=True, joined=False),
+                "chunk_guilds_at_startup": False}
+    raise ValueError(f"MEMBER_CACHE must be one of {', '.join(POLICIES)}, not {policy!r}")
+
+
+async def _chunk(guild: discord.Guild) -> None:
+    start = time.perf_counter()
+    await guild.chunk(cache=True)
+    logger.info("Chunked guild %s, %s members in %.1fs", guild.id, guild.member_count, time.perf_counter() - start)
+
+
+async def ensure_chunked(guild: discord.Guild) -> None:
+    """
+    Makes sure a guild's whole member list is cached, for features that have to walk every member.
+    Concurrent callers for the same guild share one request, and a caller giving up doesn't cancel it for the rest.
+    """
+    if guild.chunked:
+        return
+    task = _chunking.get(guild.id)
+    if task is None:
+        task = _chunking[guild.id] = asyncio.create_task(_chunk(guild), name=f"chunk-{guild.id}")
+        task.add_done_callback(lambda _: _chunking.pop(guild.id, None))
+    await asyncio.shield(task)
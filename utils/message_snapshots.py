@@ -0,0 +1,148 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the compact message cache the edit and delete logs read the original messages from"""
+import sys
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+DISCORD_EPOCH_MS = 1420070400000
+# The slots object, its message ID and its dict slot, measured on CPython 3.11, author and channel IDs are shared
+ENTRY_OVERHEAD = 160
+
+
+class MessageSnapshot:
+    """The parts of a message the logs need, see utils/benchmarks/bench_message_snapshots.py for how it compares"""
+    __slots__ = ("message_id", "guild_id", "channel_id", "author_id", "content", "attachments")
+
+    def __init__(self, message_id: int, guild_id: int, channel_id: int, author_id: int, # pylint: disable=R0913,R0917
+                 content: str, attachments: Tuple[str, ...] = ()) -> None:
+        self.message_id = message_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.content = content
+        self.attachments = attachments
+
+    @property
+    def created_at(self) -> float:
+        """When the message was sent as a Unix timestamp, read from its snowflake so it costs nothing to keep"""
+        return ((self.message_id >> 22) + DISCORD_EPOCH_MS) / 1000
+
+    def size(self) -> int:
+        """Estimated bytes this snapshot keeps alive, IDs are small ints and cost nothing extra"""
+        total = ENTRY_OVERHEAD + sys.getsizeof(self.content)
+        if self.attachments:
+            total += sys.getsizeof(self.attachments) + sum(sys.getsizeof(url) for url in self.attachments)
+        return total
+
+
+class _ChannelRing:
+    """One channel's newest snapshots, a dict kept in arrival order so the oldest is always first"""
+    __slots__ = ("guild_id", "messages")
+
+    def __init__(self, guild_id: int) -> None:
+        self.guild_id = guild_id
+        self.messages: Dict[int, MessageSnapshot] = {}
+
+
+class SnapshotCache:
+    """
+    Bounded store of message snapshots for the message logs, used instead of discord.py's message cache.
+    Each channel keeps at most `per_channel` messages, dropping its oldest first, and all channels together stay
+    under `budget_bytes` by dropping the oldest message of whichever channel was written to least recently.
+    A busy channel can't push a quiet one out, and a quiet one can't hold memory the busy ones need for long.
+    """
+    def __init__(self, budget_bytes: int = 64 * 1024 * 1024, per_channel: int = 500) -> None:
+        self.budget_bytes = budget_bytes
+        self.per_channel = per_channel
+        self._channels: "OrderedDict[int, _ChannelRing]" = OrderedDict()
+        self._count = 0
+        self.bytes = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _drop(self, ring: _ChannelRing, message_id: int) -> Optional[MessageSnapshot]:
+        # Snapshots never change once made, so their size is worked out again rather than stored
+        snapshot = ring.messages.pop(message_id, None)
+        if snapshot is not None:
+            self._count -= 1
+            self.bytes -= snapshot.size()
+        return snapshot
+
+    def add(self, snapshot: MessageSnapshot) -> None:
+        """Stores a new message"""
+        ring = self._channels.get(snapshot.channel_id)
+        if ring is None:
+            ring = self._channels[snapshot.channel_id] = _ChannelRing(snapshot.guild_id)
+        else:
+            self._channels.move_to_end(snapshot.channel_id)
+        self._drop(ring, snapshot.message_id)
+        if len(ring.messages) >= self.per_channel:
+            self._drop(ring, next(iter(ring.messages)))
+            self.evicted += 1
+        ring.messages[snapshot.message_id] = snapshot
+        self._count += 1
+        self.bytes += snapshot.size()
+        while self.bytes > self.budget_bytes and self._channels:
+            channel_id, oldest = next(iter(self._channels.items()))
+            self._drop(oldest, next(iter(oldest.messages)))
+            self.evicted += 1
+            if not oldest.messages:
+                del self._channels[channel_id]
+
+    def get(self, channel_id: int, message_id: int) -> Optional[MessageSnapshot]:
+        """Gets a snapshot without removing it"""
+        ring = self._channels.get(channel_id)
+        return ring.messages.get(message_id) if ring is not None else None
+
+    def pop(self, channel_id: int, message_id: int) -> Optional[MessageSnapshot]:
+        """Removes and returns a snapshot, used for deleted messages"""
+        ring = self._channels.get(channel_id)
+        if ring is None:
+            return None
+        snapshot = self._drop(ring, message_id)
+        if not ring.messages:
+            del self._channels[channel_id]
+        return snapshot
+
+    def edit(self, channel_id: int, message_id: int, content: str,
+             attachments: Optional[Tuple[str, ...]] = None) -> Optional[MessageSnapshot]:
+        """Swaps in an edited message's new content and returns the snapshot from before the edit"""
+        ring = self._channels.get(channel_id)
+        before = ring.messages.get(message_id) if ring is not None else None
+        if ring is None or before is None:
+            return None
+        after = MessageSnapshot(message_id, before.guild_id, channel_id, before.author_id, content,
+                                before.attachments if attachments is None else attachments)
+        ring.messages[message_id] = after  # Replacing a key keeps its place, an edit doesn't make a message newer
+        self.bytes += after.size() - before.size()
+        return before
+
+    def forget_channel(self, channel_id: int) -> None:
+        """Drops a deleted channel's messages"""
+        ring = self._channels.pop(channel_id, None)
+        if ring is not None:
+            self._count -= len(ring.messages)
+            self.bytes -= sum(snapshot.size() for snapshot in ring.messages.values())
+
+    def forget_guild(self, guild_id: int) -> None:
+        """Drops every channel of a guild the bot left"""
+        for channel_id in [channel_id for channel_id, ring in self._channels.items() if ring.guild_id == guild_id]:
+            self.forget_channel(channel_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Current size, for the health report"""
+        messages = self._count
+        return {
+            "messages": messages,
+            "channels": len(self._channels),
+            "bytes": self.bytes,
+            "budget": self.budget_bytes,
+            "bytes_per_100k": self.bytes * 100_000 // messages if messages else 0,
+            "evicted": self.evicted,
+        }
+
@@ -0,0 +1,243 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the scheduler every outbound message goes through, so bursts queue up instead of hitting 429s"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import discord
+from utils.logger import logger
+
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000  # Discord's limit for all embeds in one message combined
+
+
+class Priority(IntEnum):
+    """Lower goes first"""
+    INTERACTIVE = 0  # Replies to commands and interactions
+    NORMAL = 1
+    LOG = 2  # Log channels and error reports
+
+
+# Discord's documented per-route limits, (requests, per seconds)
+CHANNEL_LIMIT = (5, 5.0)
+WEBHOOK_LIMIT = (5, 2.0)
+GLOBAL_RATE = 50.0  # Requests per second across the whole bot
+
+
+class _Job:
+    """A single queued send"""
+    __slots__ = ("priority", "seq", "target", "kwargs", "future", "enqueued")
+
+    def __init__(self, priority: Priority, seq: int, target: Any, kwargs: Dict[str, Any]) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.target = target
+        self.kwargs = kwargs
+        self.future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self.enqueued = time.monotonic()
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @property
+    def coalescable(self) -> bool:
+        """Only embed-only, non-interactive sends can be merged into one message"""
+        return (self.priority != Priority.INTERACTIVE
+                and "embeds" in self.kwargs
+                and not set(self.kwargs) - {"embeds", "username", "avatar_url"})
+
+    @property
+    def embed_chars(self) -> int:
+        """Characters this job's embeds count towards Discord's combined limit"""
+        return sum(len(embed) for embed in self.kwargs["embeds"])
+
+    def can_carry(self, other: "_Job", kwargs: Dict[str, Any], chars: int) -> bool:
+        """
+        Checks if `other` can ride along in this job's message.
+        `kwargs` is what is already packed and `chars` the combined length of its embeds.
+        """
+        return (other.coalescable and other.priority == self.priority
+                and other.kwargs.get("username") == kwargs.get("username")
+                and other.kwargs.get("avatar_url") == kwargs.get("avatar_url")
+                and len(kwargs["embeds"]) + len(other.kwargs["embeds"]) <= MAX_EMBEDS
+                and chars + other.embed_chars <= MAX_EMBED_CHARS)
+
+
+class _Bucket:
+    """Rate limit state and pending jobs for one channel or webhook"""
+    __slots__ = ("limit", "per", "sent", "blocked_until", "jobs", "task")
+
+    def __init__(self, limit: int, per: float) -> None:
+        self.limit = limit
+        self.per = per
+        self.sent: Deque[float] = deque(maxlen=limit)
+        self.blocked_until = 0.0
+        self.jobs: List[_Job] = []
+        self.task: Optional[asyncio.Task[None]] = None
+
+    def delay(self, now: float) -> float:
+        """How long until this bucket can send again"""
+        wait = self.blocked_until - now
+        if len(self.sent) == self.limit:
+            wait = max(wait, self.sent[0] + self.per - now)
+        return max(0.0, wait)
+
+
+class _GlobalLimiter:
+    """Token bucket for the global rate limit, waiting jobs are let through in priority order"""
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority: Priority) -> None:
+        """Waits for a global token"""
+        self._refill()
+        if self.tokens >= 1 and not self._waiters:
+            self.tokens -= 1
+            return
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._schedule()
+        await future
+
+    def _schedule(self) -> None:
+        if self._timer is None and self._waiters:
+            self._timer = asyncio.get_running_loop().call_later(
+                max(0.0, (1 - self.tokens) / self.rate), self._wake)
+
+    def _wake(self) -> None:
+        self._timer = None
+        self._refill()
+        while self._waiters and self.tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.tokens -= 1
+                future.set_result(None)
+        self._schedule()
+
+
+class OutboundScheduler:
+    """
+    Central queue for outbound messages.
+    Each channel and webhook gets its own bucket that mirrors Discord's per-route limit, jobs in a bucket
+    go out in priority order, and embed-only log sends queued behind each other are packed into one message,
+    up to Discord's 10 embeds and 6000 characters.
+    """
+    def __init__(self, global_rate: float = GLOBAL_RATE) -> None:
+        self._buckets: Dict[Tuple[str, int], _Bucket] = {}
+        self._global = _GlobalLimiter(global_rate)
+        self._seq = itertools.count()
+        self._delay: Dict[Priority, float] = {priority: 0.0 for priority in Priority}  # EWMA, seconds
+        self._max_delay: Dict[Priority, float] = {priority: 0.0 for priority in Priority}
+        self._sent = 0
+        self._coalesced = 0
+        self._rate_limited = 0
+
+    @staticmethod
+    def _bucket_key(target: Any) -> Tuple[Tuple[str, int], Tuple[int, float]]:
+        if isinstance(target, discord.Webhook):
+            # Interaction followups share the application's webhook ID but each token is its own route
+            return ("webhook", hash((target.id, target.token))), WEBHOOK_LIMIT
+        channel = getattr(target, "channel", target)  # Contexts and messages send to their channel
+        return ("channel", getattr(channel, "id", id(channel))), CHANNEL_LIMIT
+
+    async def send(self, target: Any, priority: Priority = Priority.NORMAL, **kwargs: Any) -> Any:
+        """Queues `target.send(**kwargs)` and waits for it to go out, returns whatever send returned"""
+        key, (limit, per) = self._bucket_key(target)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(limit, per)
+        if "embed" in kwargs and kwargs["embed"] is not None and "embeds" not in kwargs:
+            kwargs["embeds"] = [kwargs.pop("embed")]
+        job = _Job(priority, next(self._seq), target, kwargs)
+        heapq.heappush(bucket.jobs, job)
+        if bucket.task is None or bucket.task.done():
+            bucket.task = asyncio.create_task(self._drain(key, bucket), name=f"outbound-{key[0]}-{key[1]}")
+        return await job.future
+
+    async def _drain(self, key: Tuple[str, int], bucket: _Bucket) -> None:
+        while bucket.jobs:
+            delay = bucket.delay(time.monotonic())
+            if delay:
+                await asyncio.sleep(delay)
+                continue  # Something more urgent may have arrived while we waited
+            job = heapq.heappop(bucket.jobs)
+            riders: List[_Job] = []
+            if job.coalescable:
+                kwargs = dict(job.kwargs, embeds=list(job.kwargs["embeds"]))
+                chars = job.embed_chars
+                while bucket.jobs and job.can_carry(bucket.jobs[0], kwargs, chars):
+                    rider = heapq.heappop(bucket.jobs)
+                    kwargs["embeds"].extend(rider.kwargs["embeds"])
+                    chars += rider.embed_chars
+                    riders.append(rider)
+                self._coalesced += len(riders)
+            else:
+                kwargs = job.kwargs
+
+            await self._global.acquire(job.priority)
+            bucket.sent.append(time.monotonic())
+            try:
+                result = await job.target.send(**kwargs)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self._rate_limited += 1
+                    bucket.blocked_until = time.monotonic() + float(getattr(e, "retry_after", bucket.per))
+                    for retry in (job, *riders):
+                        heapq.heappush(bucket.jobs, retry)
+                    continue
+                for failed in (job, *riders):
+                    if not failed.future.done():
+                        failed.future.set_exception(e)
+                continue
+            except Exception as e: # pylint: disable=W0718
+                logger.error("Outbound send to %s failed: %s", key, e, exc_info=True)
+                for failed in (job, *riders):
+                    if not failed.future.done():
+                        failed.future.set_exception(e)
+                continue
+
+            now = time.monotonic()
+            for done in (job, *riders):
+                waited = now - done.enqueued
+                self._delay[done.priority] = self._delay[done.priority] * 0.9 + waited * 0.1
+                self._max_delay[done.priority] = max(self._max_delay[done.priority], waited)
+                if not done.future.done():
+                    done.future.set_result(result)
+            self._sent += 1
+        self._buckets.pop(key, None)
+
+    def queue_depth(self) -> Dict[str, int]:
+        """Gets the number of queued jobs per priority"""
+        depth = {priority.name.lower(): 0 for priority in Priority}
+        for bucket in self._buckets.values():
+            for job in bucket.jobs:
+                depth[job.priority.name.lower()] += 1
+        return depth
+
+    def metrics(self) -> Dict[str, Any]:
+        """Gets queue depth and delay metrics"""
+        return {
+            "queued": self.queue_depth(),
+            "buckets": len(self._buckets),
+            "sent": self._sent,
+            "coalesced": self._coalesced,
+            "rate_limited": self._rate_limited,
+            "avg_delay_ms": {p.name.lower(): round(d * 1000) for p, d in self._delay.items()},
+            "max_delay_ms": {p.name.lower(): round(d * 1000) for p, d in self._max_delay.items()},
+        }
@@ -0,0 +1,215 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the proxy tag matcher and the streaming PluralKit/Tupperbox importer"""
+import codecs
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+MAX_VALUE_CHARS = 1 << 20  # One member bigger than this means the file is broken, not that it needs more buffer
+
+
+class ProxyMember(NamedTuple):
+    """A proxy member as the matcher and importer see it"""
+    name: str
+    display_name: Optional[str]
+    avatar_url: Optional[str]
+    tags: Tuple[Tuple[str, str], ...]  # (prefix, suffix) pairs, either side may be empty
+    source: Optional[str] = None  # "pluralkit" or "tupperbox" for imported members
+    external_id: Optional[str] = None
+
+
+class ProxyMatch(NamedTuple):
+    """Which member a message was proxied as and the text left once the tags are stripped"""
+    member: ProxyMember
+    content: str
+
+
+class TagMatcher:
+    """
+    One user's compiled proxy tags.
+    Tags are bucketed by the first character of their prefix, so a message only tries the tags that could
+    start it, plus the suffix-only ones. Within a bucket the longest tags go first, like PluralKit, so
+    "[[" wins over "[" when both are registered.
+    """
+    __slots__ = ("_by_first", "_suffix_only")
+
+    def __init__(self, members: Iterable[ProxyMember]) -> None:
+        self._by_first: Dict[str, List[Tuple[str, str, ProxyMember]]] = {}
+        self._suffix_only: List[Tuple[str, str, ProxyMember]] = []
+        for member in members:
+            for prefix, suffix in member.tags:
+                if not prefix and not suffix:
+                    continue
+                bucket = self._by_first.setdefault(prefix[0], []) if prefix else self._suffix_only
+                bucket.append((prefix, suffix, member))
+        for bucket in (*self._by_first.values(), self._suffix_only):
+            bucket.sort(key=lambda tag: -(len(tag[0]) + len(tag[1])))
+
+    def __bool__(self) -> bool:
+        return bool(self._by_first or self._suffix_only)
+
+    def match(self, content: str) -> Optional[ProxyMatch]:
+        """Gets the member a message should be proxied as, None if no tag fits"""
+        if not content:
+            return None
+        for prefix, suffix, member in (*self._by_first.get(content[0], ()), *self._suffix_only):
+            if content.startswith(prefix) and content.endswith(suffix) and len(content) > len(prefix) + len(suffix):
+                inner = content[len(prefix):len(content) - len(suffix)].strip()
+                if inner:
+                    return ProxyMatch(member, inner)
+        return None
+
+
+def _from_pluralkit(member: Dict[str, Any]) -> ProxyMember:
+    tags = tuple((tag.get("prefix") or "", tag.get("suffix") or "") for tag in member.get("proxy_tags") or ())
+    return ProxyMember(member["name"], member.get("display_name"), member.get("avatar_url"), tags,
+                       "pluralkit", member.get("id"))
+
+
+def _from_tupperbox(tupper: Dict[str, Any]) -> ProxyMember:
+    brackets = tupper.get("brackets") or []
+    tags = tuple((brackets[i] or "", brackets[i + 1] or "") for i in range(0, len(brackets) - 1, 2))
+    return ProxyMember(tupper["name"], tupper.get("nick"), tupper.get("avatar_url"), tags,
+                       "tupperbox", str(tupper["id"]) if tupper.get("id") is not None else None)
+
+
+_CONVERTERS = {"members": _from_pluralkit, "tuppers": _from_tupperbox}
+
+
+class _StreamReader:
+    """Pull-style JSON reader over an async stream of byte chunks, it only ever buffers one value"""
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._chunks = chunks
+        self._decoder = json.JSONDecoder()
+        self._incremental = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    async def _fill(self) -> bool:
+        if self._eof:
+            return False
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self._eof = True
+            self._buffer = self._buffer[self._pos:] + self._incremental.decode(b"", final=True)
+            self._pos = 0
+            return False
+        self._buffer = self._buffer[self._pos:] + self._incremental.decode(chunk)
+        self._pos = 0
+        return True
+
+    async def peek(self) -> str:
+        """Gets the next non-whitespace character without consuming it, empty at the end"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not await self._fill():
+                return ""
+
+    async def expect(self, char: str) -> None:
+        """Consumes one structural character"""
+        found = await self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in export, found {found!r}")
+        self._pos += 1
+
+    async def value(self) -> Any:
+        """Decodes one complete value, reading more only while it is cut off"""
+        await self.peek()
+        while True:
+            try:
+                result, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if len(self._buffer) - self._pos > MAX_VALUE_CHARS or not await self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and not self._eof and not isinstance(result, (dict, list, str)):
+                if await self._fill():
+                    continue
+            self._pos = end
+            return result
+
+    async def skip(self) -> None:
+        """Skips one value without decoding it, used for the big sections we don't import"""
+        depth, in_string, escaped = 0, False, False
+        if await self.peek() not in "[{":
+            await self.value()
+            return
+        while True:
+            if self._pos >= len(self._buffer) and not await self._fill():
+                raise ValueError("Export ended in the middle of a value")
+            char = self._buffer[self._pos]
+            self._pos += 1
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "[{":
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+                if depth == 0:
+                    return
+
+
+async def stream_import(chunks: AsyncIterator[bytes]) -> AsyncIterator[ProxyMember]:
+    """
+    Yields the members of a PluralKit or Tupperbox export one at a time.
+    Only a single member is ever decoded at once and other sections such as PluralKit's switch history are
+    skipped byte by byte, so memory stays flat however large the file is.
+    """
+    reader = _StreamReader(chunks)
+    await reader.expect("{")
+    if await reader.peek() == "}":
+        return
+    while True:
+        key = await reader.value()
+        await reader.expect(":")
+        convert = _CONVERTERS.get(key)
+        if convert is None:
+            await reader.skip()
+        else:
+            await reader.expect("[")
+            if await reader.peek() == "]":
+                await reader.expect("]")
+            else:
+                while True:
+                    item = await reader.value()
+                    if isinstance(item, dict) and item.get("name"):
+                        yield convert(item)
+                    if await reader.peek() == ",":
+                        await reader.expect(",")
+                        continue
+                    await reader.expect("]")
+                    break
+        if await reader.peek() == ",":
+            await reader.expect(",")
+            continue
+        await reader.expect("}")
+        return
+
+
+def export_pluralkit(members: Iterable[ProxyMember]) -> Dict[str, Any]:
+    """Builds a PluralKit-style export that PluralKit and this bot can both import"""
+    return {
+        "version": 2,
+        "members": [{
+            "id": member.external_id if member.source == "pluralkit" else None,
+            "name": member.name,
+            "display_name": member.display_name,
+            "avatar_url": member.avatar_url,
+            "proxy_tags": [{"prefix": prefix or None, "suffix": suffix or None} for prefix, suffix in member.tags],
+        } for member in members],
+    }
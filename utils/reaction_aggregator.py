@@ -0,0 +1,89 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the aggregator that collapses reaction bursts into net changes for the reaction log"""
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+
+class ReactionSummary(NamedTuple):
+    """The net reaction changes on one message over one window"""
+    guild_id: int
+    channel_id: int
+    message_id: int
+    log_channel_id: int
+    added: Dict[str, List[int]]  # emoji -> user IDs
+    removed: Dict[str, List[int]]
+
+
+class _Burst:
+    """Net change per (emoji, user) on a single message"""
+    __slots__ = ("guild_id", "channel_id", "log_channel_id", "started", "changes")
+
+    def __init__(self, guild_id: int, channel_id: int, log_channel_id: int, started: float) -> None:
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.log_channel_id = log_channel_id
+        self.started = started
+        self.changes: Dict[str, Dict[int, int]] = {}
+
+
+class ReactionAggregator:
+    """
+    Collapses reaction add/remove events on the same message into a single net change per window.
+    Someone adding and removing a reaction within the window cancels out, so it never reaches the log.
+    """
+    def __init__(self, window_seconds: float = 15.0, max_messages: int = 5000) -> None:
+        self.window_seconds = window_seconds
+        self.max_messages = max_messages
+        self._bursts: Dict[int, _Burst] = {}  # Insertion order is start order, so the oldest is always first
+
+    def __len__(self) -> int:
+        return len(self._bursts)
+
+    def add(self, guild_id: int, channel_id: int, message_id: int, log_channel_id: int, # pylint: disable=R0913,R0917
+            user_id: int, emoji: str, delta: int, now: Optional[float] = None) -> None:
+        """Records a reaction add (delta=1) or remove (delta=-1)"""
+        burst = self._bursts.get(message_id)
+        if burst is None:
+            burst = self._bursts[message_id] = _Burst(guild_id, channel_id, log_channel_id,
+                                                      time.monotonic() if now is None else now)
+        users = burst.changes.get(emoji)
+        if users is None:
+            users = burst.changes[emoji] = {}
+        net = users.get(user_id, 0) + delta
+        if net:
+            users[user_id] = net
+        else:
+            users.pop(user_id, None)
+
+    def pop_expired(self, now: Optional[float] = None) -> List[ReactionSummary]:
+        """Removes and returns the bursts whose window closed, plus the oldest ones if we are over the limit"""
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.window_seconds
+        summaries = []
+        while self._bursts:
+            message_id, burst = next(iter(self._bursts.items()))
+            if burst.started > cutoff and len(self._bursts) <= self.max_messages:
+                break
+            del self._bursts[message_id]
+            summary = self._summarise(message_id, burst)
+            if summary is not None:
+                summaries.append(summary)
+        return summaries
+
+    def pop_all(self) -> List[ReactionSummary]:
+        """Removes and returns every pending burst, used on unload"""
+        return self.pop_expired(now=float("inf"))
+
+    @staticmethod
+    def _summarise(message_id: int, burst: _Burst) -> Optional[ReactionSummary]:
+        added: Dict[str, List[int]] = {}
+        removed: Dict[str, List[int]] = {}
+        for emoji, users in burst.changes.items():
+            for user_id, net in users.items():
+                (added if net > 0 else removed).setdefault(emoji, []).append(user_id)
+        if not added and not removed:
+            return None
+        return ReactionSummary(burst.guild_id, burst.channel_id, message_id, burst.log_channel_id, added, removed)
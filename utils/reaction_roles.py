@@ -0,0 +1,108 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the reaction role index and the per-member batching of role edits"""
+import asyncio
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+from utils.logger import logger
+
+Flush = Callable[[int, int, FrozenSet[int], FrozenSet[int]], Awaitable[None]]
+
+
+class ReactionRoleIndex:
+    """
+    Every reaction role message this process knows about, as message ID -> {emoji key -> role ID}.
+    Only configured messages are in here, so a reaction anywhere else costs exactly one dict miss.
+    """
+    __slots__ = ("_messages",)
+
+    def __init__(self, rows: Iterable[Tuple[int, str, int]] = ()) -> None:
+        self._messages: Dict[int, Dict[str, int]] = {}
+        for message_id, emoji, role_id in rows:
+            self._messages.setdefault(message_id, {})[emoji] = role_id
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def lookup(self, message_id: int, emoji: str) -> Optional[int]:
+        """Gets the role a reaction maps to, None if the message or emoji isn't configured"""
+        emojis = self._messages.get(message_id)
+        return emojis.get(emoji) if emojis is not None else None
+
+    def emojis(self, message_id: int) -> Dict[str, int]:
+        """Gets a copy of one message's emoji -> role ID mapping"""
+        return dict(self._messages.get(message_id, {}))
+
+    def replace(self, message_id: int, emojis: Dict[str, int]) -> None:
+        """Swaps in a message's mapping after its config changed, an empty mapping drops the message"""
+        if emojis:
+            self._messages[message_id] = dict(emojis)
+        else:
+            self._messages.pop(message_id, None)
+
+
+class _Pending:
+    __slots__ = ("add", "remove", "task")
+
+    def __init__(self) -> None:
+        self.add: Set[int] = set()
+        self.remove: Set[int] = set()
+        self.task: Optional["asyncio.Task[None]"] = None
+
+
+class RoleBatcher:
+    """
+    Collects role changes per member for `delay` seconds after the first one, then hands them to `flush`
+    as one set of roles to add and one to remove. A member clicking through five reactions costs a single
+    edit, and a reaction added then taken back inside the window cancels out to nothing.
+    """
+    def __init__(self, flush: Flush, delay: float = 1.0) -> None:
+        self._flush = flush
+        self.delay = delay
+        self._pending: Dict[Tuple[int, int], _Pending] = {}
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def queue(self, guild_id: int, user_id: int, role_id: int, add: bool) -> None:
+        """Queues a role change, the newest change to a role wins"""
+        key = (guild_id, user_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _Pending()
+            pending.task = asyncio.create_task(self._run(key), name=f"reaction-roles-{guild_id}-{user_id}")
+            self._tasks.add(pending.task)
+            pending.task.add_done_callback(self._tasks.discard)
+        if add:
+            pending.add.add(role_id)
+            pending.remove.discard(role_id)
+        else:
+            pending.remove.add(role_id)
+            pending.add.discard(role_id)
+
+    async def _run(self, key: Tuple[int, int]) -> None:
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            return  # close() took the changes over
+        await self._send(key, self._pending.pop(key))
+
+    async def _send(self, key: Tuple[int, int], pending: _Pending) -> None:
+        if not pending.add and not pending.remove:
+            return
+        try:
+            await self._flush(key[0], key[1], frozenset(pending.add), frozenset(pending.remove))
+        except Exception as e: # pylint: disable=W0718
+            logger.error("Reaction role edit for %s in %s failed: %s", key[1], key[0], e, exc_info=True)
+
+    async def close(self) -> None:
+        """Flushes everything still waiting right away, edits already being sent are left to finish"""
+        waiting = list(self._pending.items())
+        self._pending.clear()
+        for _, pending in waiting:
+            if pending.task is not None:
+                pending.task.cancel()
+        await asyncio.gather(*(self._send(key, pending) for key, pending in waiting), *self._tasks,
+                             return_exceptions=True)
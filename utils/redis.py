@@ -2,53 +2,170 @@
 #
 # This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
 # To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the pooled Redis client and the blacklist helpers"""
+import asyncio
 import os
+import uuid
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
 import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 from dotenv import load_dotenv
 load_dotenv()
 
-REDIS_BLACKLIST_SET = "blacklist_users"
-_redis_client = None
+# Namespaced so they survive restarts and never collide with anything else in the database
+REDIS_BLACKLIST_SET = "cynix:blacklist:users"
+REDIS_BLACKLIST_HWM = "cynix:blacklist:hwm"  # Newest blacklist change already applied to the set
+REDIS_BLACKLIST_REBUILD = "cynix:blacklist:rebuild"
+REDIS_BLACKLIST_LOCK = "cynix:blacklist:lock"
+BATCH_SIZE = 1000  # IDs per SMISMEMBER, all batches still go out in a single pipelined round-trip
+CONNECT_ATTEMPTS = 5
+# Only deletes the lock if it still holds our token, so a cluster whose lock expired can't free someone else's
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_redis_pool: Optional[redis.BlockingConnectionPool] = None
+_redis_client: Optional[redis.Redis] = None
+_connect_lock = asyncio.Lock()
+
+
+def _build_pool() -> redis.BlockingConnectionPool:
+    """Builds the connection pool from the environment"""
+    return redis.BlockingConnectionPool(
+        host=os.getenv("REDIS_HOST", os.getenv("DATABASE_HOST")),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        db=int(os.getenv("REDIS_DB", "0")),
+        password=os.getenv("REDIS_PASSWORD"),
+        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "20")),
+        timeout=float(os.getenv("REDIS_POOL_TIMEOUT", "5")),
+        health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")),
+        socket_connect_timeout=5,
+        socket_keepalive=True,
+        retry_on_error=[RedisConnectionError, RedisTimeoutError],
+        retry=Retry(ExponentialBackoff(cap=10, base=0.1), retries=5),
+        decode_responses=True,
+    )
+
 
 async def get_redis() -> redis.Redis:
-    global _redis_client
-    if _redis_client is None:
-        _redis_client = redis.Redis(
-            host=os.getenv("DATABASE_HOST"),
-            port=6379,
-            password=os.getenv("REDIS_PASSWORD"),
-            decode_responses=True
-        )
-        try:
-            await _redis_client.ping()
-        except Exception as e:
-            print(f"Redis connection failed: {e}")
-            raise
+    global _redis_client, _redis_pool
+    if _redis_client is not None:
+        return _redis_client
+    async with _connect_lock:
+        if _redis_client is None:
+            pool = _build_pool()
+            client = redis.Redis(connection_pool=pool)
+            backoff = ExponentialBackoff(cap=10, base=0.5)
+            for attempt in range(1, CONNECT_ATTEMPTS + 1):
+                try:
+                    await client.ping()
+                    break
+                except (RedisConnectionError, RedisTimeoutError) as e:
+                    if attempt == CONNECT_ATTEMPTS:
+                        print(f"Redis connection failed: {e}")
+                        await pool.disconnect()
+                        raise
+                    delay = backoff.compute(attempt)
+                    print(f"Redis connection failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+            _redis_pool, _redis_client = pool, client
     return _redis_client
 
 async def close_redis() -> None:
-    global _redis_client
+    global _redis_client, _redis_pool
     if _redis_client:
-        await _redis_client.flushdb()
         await _redis_client.aclose()
         _redis_client = None
+    if _redis_pool:
+        await _redis_pool.disconnect()
+        _redis_pool = None
+
+
+def pool_stats() -> Dict[str, int]:
+    """Gets the connection pool usage, for health reports"""
+    if _redis_pool is None:
+        return {"max": 0, "in_use": 0, "idle": 0}
+    return {
+        "max": _redis_pool.max_connections,
+        "in_use": len(_redis_pool._in_use_connections), # pylint: disable=W0212
+        "idle": len(_redis_pool._available_connections), # pylint: disable=W0212
+    }
+
 
+async def get_blacklist_hwm() -> Optional[int]:
+    """Gets the high-water mark of the blacklist set, None if it was never built"""
+    redis_client = await get_redis()
+    value = await redis_client.get(REDIS_BLACKLIST_HWM)
+    return int(value) if value is not None else None
+
+async def apply_blacklist_delta(added: List[int], removed: List[int], hwm: int) -> None:
+    """Applies the blacklist changes since the last sync and moves the high-water mark forward"""
+    redis_client = await get_redis()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        if added:
+            pipe.sadd(REDIS_BLACKLIST_SET, *added)
+        if removed:
+            pipe.srem(REDIS_BLACKLIST_SET, *removed)
+        pipe.set(REDIS_BLACKLIST_HWM, hwm)
+        await pipe.execute()
 
-async def load_blacklist_from_db(user_dicts: list[dict]):
-    """Takes a list of user dicts (from DB) and loads user_ids into Redis."""
+async def rebuild_blacklist(chunks: AsyncIterator[List[int]], hwm: int) -> int:
+    """
+    Rebuilds the blacklist set from streamed chunks of user IDs.
+    The new set is built under a temporary key and swapped in atomically, so lookups never see a partial set.
+    """
     redis_client = await get_redis()
-    user_ids = [user["user_id"] for user in user_dicts if "user_id" in user]
-    if user_ids:
-        await redis_client.sadd(REDIS_BLACKLIST_SET, *user_ids)
-        
+    token = uuid.uuid4().hex
+    if not await redis_client.set(REDIS_BLACKLIST_LOCK, token, nx=True, ex=300):
+        return -1  # Another cluster is already rebuilding
+    try:
+        await redis_client.delete(REDIS_BLACKLIST_REBUILD)
+        total = 0
+        async for chunk in chunks:
+            if chunk:
+                await redis_client.sadd(REDIS_BLACKLIST_REBUILD, *chunk)
+                total += len(chunk)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            if total:
+                pipe.rename(REDIS_BLACKLIST_REBUILD, REDIS_BLACKLIST_SET)
+            else:
+                pipe.delete(REDIS_BLACKLIST_SET)
+            pipe.set(REDIS_BLACKLIST_HWM, hwm)
+            await pipe.execute()
+        return total
+    finally:
+        await redis_client.eval(RELEASE_LOCK_SCRIPT, 1, REDIS_BLACKLIST_LOCK, token)
+
 async def is_user_blacklisted(user_id: int) -> bool:
     redis_client = await get_redis()
-    return await redis_client.sismember(REDIS_BLACKLIST_SET, user_id)
+    return bool(await redis_client.sismember(REDIS_BLACKLIST_SET, user_id))
+
+async def are_users_blacklisted(user_ids: Iterable[int]) -> Dict[int, bool]:
+    """Checks many users in one round-trip, returns user ID -> blacklisted"""
+    ids: List[int] = list(dict.fromkeys(user_ids))
+    if not ids:
+        return {}
+    redis_client = await get_redis()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for start in range(0, len(ids), BATCH_SIZE):
+            pipe.smismember(REDIS_BLACKLIST_SET, ids[start:start + BATCH_SIZE])
+        batches = await pipe.execute()
+    flags = (bool(flag) for batch in batches for flag in batch)
+    return dict(zip(ids, flags))
+
+async def filter_blacklisted(user_ids: Iterable[int]) -> Set[int]:
+    """Returns only the blacklisted users out of the given IDs"""
+    return {user_id for user_id, blacklisted in (await are_users_blacklisted(user_ids)).items() if blacklisted}
 
-async def blacklist_user_redis(user_id: int):
+async def blacklist_user_redis(user_id: int) -> None:
     redis_client = await get_redis()
     await redis_client.sadd(REDIS_BLACKLIST_SET, user_id)
 
-async def remove_user_redis(user_id: int):
+async def remove_user_redis(user_id: int) -> None:
     redis_client = await get_redis()
-    await redis_client.srem(REDIS_BLACKLIST_SET, user_id)
\ No newline at end of file
+    await redis_client.srem(REDIS_BLACKLIST_SET, user_id)
@@ -0,0 +1,146 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the job that brings every member's level reward roles in line with their XP"""
+import asyncio
+import time
+from bisect import bisect_right
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import discord
+from utils.level_curve import LevelCurve
+from utils.logger import logger
+from utils.member_cache import ensure_chunked
+
+REDIS_RECONCILE_CHECKPOINT = "cynix:reconcile:{}"
+CHECKPOINT_TTL = 86400
+
+
+class ReconcileProgress:
+    """Running totals for a reconciliation job"""
+    __slots__ = ("scanned", "changed", "failed", "missing", "last_user_id", "done")
+
+    def __init__(self, last_user_id: int = 0) -> None:
+        self.scanned = 0
+        self.changed = 0
+        self.failed = 0
+        self.missing = 0
+        self.last_user_id = last_user_id
+        self.done = False
+
+    def __str__(self) -> str:
+        state = "Finished" if self.done else "Working"
+        return (f"{state}: scanned {self.scanned} members, changed {self.changed}, "
+                f"failed {self.failed}, {self.missing} no longer in the server.")
+
+
+class RewardTable:
+    """Reward roles sorted by level, so a member's target roles are one bisect away"""
+    __slots__ = ("levels", "role_ids", "all_role_ids")
+
+    def __init__(self, rewards: Dict[int, int]) -> None:
+        ordered = sorted(rewards.items())
+        self.levels = [level for level, _ in ordered]
+        self.role_ids = [role_id for _, role_id in ordered]
+        self.all_role_ids = frozenset(self.role_ids)
+
+    def target(self, level: int) -> Set[int]:
+        """Gets every reward role a member at `level` should have, rewards stack"""
+        return set(self.role_ids[:bisect_right(self.levels, level)])
+
+
+class _RateLimiter:
+    """Spaces calls out to at most `rate` per second"""
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        """Waits for the next free slot"""
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RoleReconciler: # pylint: disable=R0902
+    """
+    Streams a guild's levels rows, works out each cached member's reward roles and only edits members whose
+    roles differ. Edits run through a bounded, rate limited pool, and the last finished user ID is stored
+    in Redis after every chunk so an interrupted job picks up where it left off.
+    """
+    def __init__(self, # pylint: disable=R0913,R0917
+                 guild: discord.Guild,
+                 rewards: Dict[int, int],
+                 curve: LevelCurve,
+                 concurrency: int = 4,
+                 edits_per_second: float = 1.0,
+                 on_progress: Optional[Callable[[ReconcileProgress], Awaitable[None]]] = None) -> None:
+        self.guild = guild
+        self.curve = curve
+        self.on_progress = on_progress
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limiter = _RateLimiter(edits_per_second)
+        # Roles above the bot can't be given or taken, leave them out rather than fail on every member
+        assignable = {role.id for role in guild.roles if role.is_assignable()}
+        self.rewards = RewardTable({level: role_id for level, role_id in rewards.items() if role_id in assignable})
+
+    def diff(self, member: discord.Member, xp: int) -> Optional[tuple[Set[int], Set[int]]]:
+        """Gets (roles to add, roles to remove) for a member, None if they are already correct"""
+        current = {role.id for role in member.roles} & self.rewards.all_role_ids
+        target = self.rewards.target(self.curve.level_for(xp))
+        add, remove = target - current, current - target
+        return (add, remove) if add or remove else None
+
+    async def _apply(self, member: discord.Member, add: Set[int], remove: Set[int], progress: ReconcileProgress) -> None:
+        async with self._semaphore:
+            await self._limiter.wait()
+            roles: List[discord.abc.Snowflake] = [role for role in member.roles
+                                                  if not role.is_default() and role.id not in remove]
+            roles.extend(discord.Object(role_id) for role_id in add)
+            try:
+                await member.edit(roles=roles, reason="Level role reconciliation")
+                progress.changed += 1
+            except discord.HTTPException as e:
+                progress.failed += 1
+                logger.warning("Failed to reconcile roles for %s in %s: %s", member.id, self.guild.id, e)
+
+    async def run(self, resume: bool = True, chunk_size: int = 1000) -> ReconcileProgress:
+        """Runs the job to completion and returns the totals"""
+        from database.db_io import Levels
+        from utils.redis import get_redis
+        redis_client = await get_redis()
+        checkpoint_key = REDIS_RECONCILE_CHECKPOINT.format(self.guild.id)
+        start = int(await redis_client.get(checkpoint_key) or 0) if resume else 0
+        progress = ReconcileProgress(start)
+
+        if not self.rewards.levels:
+            progress.done = True
+            return progress
+        await ensure_chunked(self.guild)
+
+        async for chunk in Levels.stream_guild_levels(self.guild.id, start, chunk_size):
+            edits = []
+            for user_id, xp in chunk:
+                progress.scanned += 1
+                member = self.guild.get_member(user_id)
+                if member is None:
+                    progress.missing += 1
+                    continue
+                changes = self.diff(member, xp)
+                if changes is not None:
+                    edits.append(self._apply(member, *changes, progress))
+            await asyncio.gather(*edits)
+            progress.last_user_id = chunk[-1][0]
+            await redis_client.set(checkpoint_key, progress.last_user_id, ex=CHECKPOINT_TTL)
+            if self.on_progress is not None:
+                await self.on_progress(progress)
+
+        await redis_client.delete(checkpoint_key)
+        progress.done = True
+        if self.on_progress is not None:
+            await self.on_progress(progress)
+        return progress
@@ -0,0 +1,132 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the duplicate message detector used to spot raids and spam waves"""
+import time
+from collections import deque
+from typing import Deque, Dict, NamedTuple, Optional, Set, Tuple
+from utils.anti_zalgo import normalise_text
+
+
+class SpamHit(NamedTuple):
+    """Returned when a fingerprint crosses the distinct author threshold"""
+    guild_id: int
+    fingerprint: int
+    author_ids: frozenset[int]
+    first_trip: bool
+
+
+class _GuildWindow:
+    """Sliding window of (timestamp, fingerprint, author) for a single guild"""
+    __slots__ = ("entries", "authors", "tripped")
+
+    def __init__(self, max_entries: int) -> None:
+        self.entries: Deque[Tuple[float, int, int]] = deque(maxlen=max_entries)
+        self.authors: Dict[int, Dict[int, int]] = {}
+        self.tripped: Set[int] = set()
+
+    def evict_one(self) -> None:
+        """Drops the oldest entry and its contribution to the author counts"""
+        _, fingerprint, author_id = self.entries.popleft()
+        counts = self.authors[fingerprint]
+        remaining = counts[author_id] - 1
+        if remaining:
+            counts[author_id] = remaining
+            return
+        del counts[author_id]
+        if not counts:
+            del self.authors[fingerprint]
+            self.tripped.discard(fingerprint)
+
+
+class SpamDetector:
+    """
+    Counts distinct authors per normalised message fingerprint over a sliding window.
+    Every guild keeps at most `max_entries` messages, so memory is bounded no matter how hard the raid is,
+    and each message costs one normalisation, one hash and an amortised O(1) window update.
+    """
+    def __init__(self,
+                 window_seconds: float = 30.0,
+                 author_threshold: int = 5,
+                 max_entries: int = 500,
+                 min_length: int = 8,
+                 withhold_seconds: float = 300.0) -> None:
+        self.window_seconds = window_seconds
+        self.author_threshold = author_threshold
+        self.max_entries = max_entries
+        self.min_length = min_length
+        self.withhold_seconds = withhold_seconds
+        self._guilds: Dict[int, _GuildWindow] = {}
+        self._flagged: Dict[Tuple[int, int], float] = {}
+
+    @staticmethod
+    def fingerprint(content: str) -> Optional[int]:
+        """Returns the fingerprint of the message content, or None if there is nothing to compare"""
+        normalised = normalise_text(content)
+        return hash(normalised) if normalised else None
+
+    def observe(self, guild_id: int, author_id: int, content: str, now: Optional[float] = None) -> Optional[SpamHit]:
+        """Records a message and returns a SpamHit if its fingerprint is being spammed"""
+        if len(content) < self.min_length:
+            return None
+        fingerprint = self.fingerprint(content)
+        if fingerprint is None:
+            return None
+        now = time.monotonic() if now is None else now
+
+        window = self._guilds.get(guild_id)
+        if window is None:
+            window = self._guilds[guild_id] = _GuildWindow(self.max_entries)
+
+        cutoff = now - self.window_seconds
+        entries = window.entries
+        while entries and entries[0][0] < cutoff:
+            window.evict_one()
+        if len(entries) == self.max_entries:
+            window.evict_one()
+
+        entries.append((now, fingerprint, author_id))
+        counts = window.authors.get(fingerprint)
+        if counts is None:
+            counts = window.authors[fingerprint] = {}
+        counts[author_id] = counts.get(author_id, 0) + 1
+
+        if len(counts) < self.author_threshold:
+            return None
+
+        first_trip = fingerprint not in window.tripped
+        window.tripped.add(fingerprint)
+        until = now + self.withhold_seconds
+        if first_trip:
+            for spammer in counts:
+                self._flagged[(guild_id, spammer)] = until
+        else:
+            self._flagged[(guild_id, author_id)] = until
+        return SpamHit(guild_id, fingerprint, frozenset(counts) if first_trip else frozenset((author_id,)), first_trip)
+
+    def is_flagged(self, guild_id: int, user_id: int, now: Optional[float] = None) -> bool:
+        """Checks if the user took part in a spam wave recently, used to withhold XP"""
+        until = self._flagged.get((guild_id, user_id))
+        if until is None:
+            return False
+        if (time.monotonic() if now is None else now) < until:
+            return True
+        del self._flagged[(guild_id, user_id)]
+        return False
+
+    def prune(self, now: Optional[float] = None) -> None:
+        """Drops expired flags and idle guild windows, call this periodically"""
+        now = time.monotonic() if now is None else now
+        for key in [key for key, until in self._flagged.items() if until <= now]:
+            del self._flagged[key]
+        cutoff = now - self.window_seconds
+        for guild_id in [guild_id for guild_id, window in self._guilds.items()
+                         if not window.entries or window.entries[-1][0] < cutoff]:
+            del self._guilds[guild_id]
+
+    def forget_guild(self, guild_id: int) -> None:
+        """Drops all state for a guild"""
+        self._guilds.pop(guild_id, None)
+        for key in [key for key in self._flagged if key[0] == guild_id]:
+            del self._flagged[key]
@@ -0,0 +1,113 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the in-memory star counts that sit in front of the starboard tables"""
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+
+class StarboardSettings(NamedTuple):
+    """The starboard settings for a guild"""
+    channel_id: int
+    threshold: int
+    emoji: str
+
+
+class StarState:
+    """The live star count of a single source message"""
+    __slots__ = ("message_id", "guild_id", "channel_id", "author_id", "stars", "star_message_id",
+                 "db_dirty", "post_dirty", "last_edit")
+
+    def __init__(self, message_id: int, guild_id: int, channel_id: int, author_id: int, # pylint: disable=R0913,R0917
+                 stars: int = 0, star_message_id: Optional[int] = None) -> None:
+        self.message_id = message_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.stars = stars
+        self.star_message_id = star_message_id
+        self.db_dirty = False
+        self.post_dirty = False
+        self.last_edit = float("-inf")
+
+    def to_row(self) -> Dict[str, Optional[int]]:
+        """Converts the state to a starboard_entries row"""
+        return {
+            "message_id": self.message_id,
+            "guild_id": self.guild_id,
+            "channel_id": self.channel_id,
+            "author_id": self.author_id,
+            "star_message_id": self.star_message_id,
+            "stars": self.stars,
+        }
+
+
+class StarboardCache:
+    """
+    Index of hot star counts keyed by source message ID.
+    Reactions only touch memory, the database and the starboard post are brought up to date by whoever
+    calls take_db_dirty and take_due_posts, so a reaction storm costs one write per flush and one edit
+    per `edit_interval` no matter how many reactions arrive.
+    """
+    def __init__(self, max_messages: int = 10000, edit_interval: float = 10.0) -> None:
+        self.max_messages = max_messages
+        self.edit_interval = edit_interval
+        self._states: "OrderedDict[int, StarState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, message_id: int) -> Optional[StarState]:
+        """Gets the cached state of a message, marking it as recently used"""
+        state = self._states.get(message_id)
+        if state is not None:
+            self._states.move_to_end(message_id)
+        return state
+
+    def put(self, state: StarState) -> StarState:
+        """Adds a freshly loaded state, evicting the least recently used clean states if over the limit"""
+        self._states[state.message_id] = state
+        excess = len(self._states) - self.max_messages
+        if excess > 0:
+            evict = []
+            for message_id, old in self._states.items():
+                if not (old.db_dirty or old.post_dirty):
+                    evict.append(message_id)
+                    if len(evict) == excess:
+                        break
+            for message_id in evict:
+                del self._states[message_id]
+        return state
+
+    def apply(self, state: StarState, delta: int) -> None:
+        """Applies a reaction add or remove to a state"""
+        state.stars = max(0, state.stars + delta)
+        state.db_dirty = True
+        state.post_dirty = True
+
+    def take_db_dirty(self) -> List[StarState]:
+        """Returns the states that need writing and marks them clean"""
+        dirty = [state for state in self._states.values() if state.db_dirty]
+        for state in dirty:
+            state.db_dirty = False
+        return dirty
+
+    def take_due_posts(self, threshold_for: Dict[int, int], now: float) -> List[StarState]:
+        """
+        Returns the states whose starboard post should be created or edited now.
+        `threshold_for` maps guild ID to its threshold, messages under it that were never posted are skipped.
+        """
+        due = []
+        for state in self._states.values():
+            if not state.post_dirty or now - state.last_edit < self.edit_interval:
+                continue
+            threshold = threshold_for.get(state.guild_id)
+            if threshold is None:
+                continue
+            state.post_dirty = False
+            if state.star_message_id is None and state.stars < threshold:
+                continue
+            state.last_edit = now
+            due.append(state)
+        return due
@@ -0,0 +1,104 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+This file tests the bulk blacklist lookups and the incremental sync against the Redis server from .env.
+Everything is done under cynix:test: keys, so the live blacklist is never touched.
+"""
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, List
+from utils import redis as redis_utils
+from utils.redis import (are_users_blacklisted, apply_blacklist_delta, close_redis, filter_blacklisted,
+                         get_blacklist_hwm, get_redis, rebuild_blacklist)
+
+redis_utils.REDIS_BLACKLIST_SET = "cynix:test:blacklist:users"
+redis_utils.REDIS_BLACKLIST_HWM = "cynix:test:blacklist:hwm"
+redis_utils.REDIS_BLACKLIST_REBUILD = "cynix:test:blacklist:rebuild"
+redis_utils.REDIS_BLACKLIST_LOCK = "cynix:test:blacklist:lock"
+TEST_KEYS = (redis_utils.REDIS_BLACKLIST_SET, redis_utils.REDIS_BLACKLIST_HWM,
+             redis_utils.REDIS_BLACKLIST_REBUILD, redis_utils.REDIS_BLACKLIST_LOCK)
+
+
+def run(test: Callable[[], Awaitable[None]]) -> None:
+    """Runs a test with clean keys, the pooled client is closed after so the next event loop gets its own"""
+    async def wrapper() -> None:
+        redis_client = await get_redis()
+        await redis_client.delete(*TEST_KEYS)
+        try:
+            await test()
+        finally:
+            await redis_client.delete(*TEST_KEYS)
+            await close_redis()
+    asyncio.run(wrapper())
+
+
+async def chunked(*chunks: List[int]) -> AsyncIterator[List[int]]:
+    """Yields the chunks the way the database stream does"""
+    for chunk in chunks:
+        yield chunk
+
+
+def test_bulk_lookups() -> None:
+    """Tests that bulk checks match single checks, across several SMISMEMBER batches"""
+    async def test() -> None:
+        redis_utils.BATCH_SIZE = 3
+        redis_client = await get_redis()
+        await redis_client.sadd(redis_utils.REDIS_BLACKLIST_SET, 2, 5, 9)
+        flags = await are_users_blacklisted([1, 2, 3, 2, 4, 5, 6, 7, 8, 9])
+        assert list(flags) == [1, 2, 3, 4, 5, 6, 7, 8, 9], "Duplicates should be checked once, in order"
+        assert [user_id for user_id, flag in flags.items() if flag] == [2, 5, 9]
+        assert await filter_blacklisted(range(1, 10)) == {2, 5, 9}
+        assert await are_users_blacklisted([]) == {}, "No IDs should not hit Redis at all"
+        redis_utils.BATCH_SIZE = 1000
+
+    run(test)
+    print("All tests passed!")
+
+
+def test_delta_sync() -> None:
+    """Tests that deltas are applied and move the high-water mark"""
+    async def test() -> None:
+        assert await get_blacklist_hwm() is None, "A set that was never built should have no high-water mark"
+        await apply_blacklist_delta([1, 2, 3], [], 100)
+        await apply_blacklist_delta([4], [2], 150)
+        assert await filter_blacklisted(range(1, 6)) == {1, 3, 4}
+        assert await get_blacklist_hwm() == 150
+
+    run(test)
+    print("All tests passed!")
+
+
+def test_rebuild() -> None:
+    """Tests the streamed rebuild, the lock and that releasing it never frees another cluster's lock"""
+    async def test() -> None:
+        redis_client = await get_redis()
+        await redis_client.sadd(redis_utils.REDIS_BLACKLIST_SET, 99)
+        assert await rebuild_blacklist(chunked([1, 2], [3]), 200) == 3
+        assert await filter_blacklisted([1, 2, 3, 99]) == {1, 2, 3}, "The rebuilt set should replace the old one"
+        assert await get_blacklist_hwm() == 200
+        assert not await redis_client.exists(redis_utils.REDIS_BLACKLIST_LOCK), "The lock should be released"
+
+        assert await rebuild_blacklist(chunked(), 210) == 0
+        assert not await redis_client.exists(redis_utils.REDIS_BLACKLIST_SET), "An empty rebuild should clear it"
+
+        await redis_client.set(redis_utils.REDIS_BLACKLIST_LOCK, "other-cluster")
+        assert await rebuild_blacklist(chunked([1]), 220) == -1, "A held lock should stop a second rebuild"
+
+        async def lock_lost() -> AsyncIterator[List[int]]:
+            # Our lock runs out mid-rebuild and another cluster takes it
+            await redis_client.set(redis_utils.REDIS_BLACKLIST_LOCK, "other-cluster")
+            yield [1]
+        await redis_client.delete(redis_utils.REDIS_BLACKLIST_LOCK)
+        await rebuild_blacklist(lock_lost(), 230)
+        assert await redis_client.get(redis_utils.REDIS_BLACKLIST_LOCK) == "other-cluster", \
+            "Releasing should leave a lock we no longer own alone"
+
+    run(test)
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_bulk_lookups()
+    test_delta_sync()
+    test_rebuild()
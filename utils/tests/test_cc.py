@@ -8,13 +8,16 @@ from typing import Any, Dict
 from database.db_io import CustomCommands
 from database.makedb import CustomCommands as DbCc
 
+GUILD_ID = 514170870202368000
+
 # Define a test command
 test_command: Dict[str, Any]= {
     "name": "test_command",
     "owner_id": 123456789,
     "text": "This is a test command",
-    "image": None,
-    "nsfw": False
+    "image_hash": None,
+    "nsfw": False,
+    "trigger": "test trigger"
 }
 
 
@@ -22,33 +25,41 @@ async def test_custom_commands() -> None:
     """Tests adding, retrieving, editing, and deleting a custom command."""
 
     # Add custom command
-    add_result = await CustomCommands.add_custom_command(**test_command)
+    add_result = await CustomCommands.add_custom_command(GUILD_ID, **test_command)
     print("Add Result:", add_result)
 
-    retrieved_command = await CustomCommands.get_custom_command(test_command["name"])
+    retrieved_command = await CustomCommands.get_custom_command(GUILD_ID, test_command["name"])
     print("Retrieved Command:", retrieved_command)
 
     # Ensure retrieved_command is not None before accessing attributes
     assert retrieved_command is not None, "Failed to retrieve command"
     assert isinstance(retrieved_command, DbCc), "Unexpected type returned"
     assert retrieved_command.text == test_command["text"], "Text does not match"
+    assert retrieved_command.guild_id == GUILD_ID, "Guild does not match"
+
+    triggers = await CustomCommands.get_triggers(GUILD_ID)
+    assert triggers.get(test_command["trigger"]) == test_command["name"], "Trigger was not stored"
 
     # Edit custom command
-    edit_result = await CustomCommands.edit_custom_command(test_command["name"], text="Updated text")
+    edit_result = await CustomCommands.edit_custom_command(GUILD_ID, test_command["name"], text="Updated text")
     print("Edit Result:", edit_result)
 
-    updated_command = await CustomCommands.get_custom_command(test_command["name"])
+    updated_command = await CustomCommands.get_custom_command(GUILD_ID, test_command["name"])
 
     if updated_command is None:
         raise ValueError("Failed to retrieve updated command, it may have been deleted or not exist.")
 
     assert updated_command.text == "Updated text", "Edit failed"
+    assert updated_command.trigger == test_command["trigger"], "Editing the text shouldn't touch the trigger"
+
+    await CustomCommands.edit_custom_command(GUILD_ID, test_command["name"], clear=["trigger"])
+    assert test_command["trigger"] not in await CustomCommands.get_triggers(GUILD_ID), "Clearing should drop the trigger"
 
     # Delete custom command
-    delete_result = await CustomCommands.delete_custom_command(test_command["name"])
+    delete_result = await CustomCommands.delete_custom_command(GUILD_ID, test_command["name"])
     print("Delete Result:", delete_result)
 
-    deleted_command = await CustomCommands.get_custom_command(test_command["name"])
+    deleted_command = await CustomCommands.get_custom_command(GUILD_ID, test_command["name"])
     assert deleted_command is None, "Delete failed"
 
     print("All tests passed!")
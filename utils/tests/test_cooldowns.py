@@ -0,0 +1,31 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the tests for the XP cooldown gate"""
+from utils.cooldowns import XpCooldown
+
+GUILD_ID = 123456789
+USER_ID = 987654321
+
+
+def test_xp_cooldown() -> None:
+    """Tests the cooldown window and the memory bound"""
+    cooldown = XpCooldown(seconds=60, max_entries=1000, backend="memory")
+
+    assert cooldown.try_acquire_local(GUILD_ID, USER_ID, now=0), "The first message should earn XP"
+    assert not cooldown.try_acquire_local(GUILD_ID, USER_ID, now=30), "Messages in the cooldown should not"
+    assert cooldown.try_acquire_local(GUILD_ID + 1, USER_ID, now=30), "Cooldowns are per guild"
+    assert cooldown.try_acquire_local(GUILD_ID, USER_ID, now=61), "The cooldown should expire"
+
+    for user_id in range(10_000):
+        cooldown.try_acquire_local(GUILD_ID, user_id, now=100)
+    assert len(cooldown) <= 1000, "The map should never grow past max_entries"
+
+    assert cooldown.try_acquire_local(GUILD_ID, 1, now=500)
+    assert len(cooldown) == 1, "Expired entries should be dropped"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_xp_cooldown()
@@ -0,0 +1,34 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests packing and evaluating the eligibility flags"""
+from collections import namedtuple
+from utils.eligibility import UserFlags, pack, may_view_nsfw, may_post_art
+
+Record = namedtuple("Record", ("age_verified", "nsfw", "nsfw_lockout", "artist_verified", "artist_lockout"))
+
+
+def test_eligibility() -> None:
+    """Tests that every combination packs and evaluates as expected"""
+    assert pack(None, False) == UserFlags.KNOWN, "Unregistered users should still be marked as known"
+    assert not may_view_nsfw(pack(None, False)), "Unregistered users shouldn't see NSFW content"
+
+    adult = Record(True, True, False, False, False)
+    assert may_view_nsfw(pack(adult, False)), "Verified, opted in users should see NSFW content"
+    assert not may_view_nsfw(pack(adult, True)), "Blacklisted users shouldn't see NSFW content"
+    assert not may_view_nsfw(pack(adult._replace(nsfw_lockout=True), False)), "Locked out users shouldn't either"
+    assert not may_view_nsfw(pack(adult._replace(age_verified=False), False)), "Age verification is required"
+    assert not may_view_nsfw(pack(adult._replace(nsfw=False), False)), "Opting in is required"
+
+    artist = Record(False, False, False, True, False)
+    assert may_post_art(pack(artist, False)), "Verified artists should be allowed"
+    assert not may_post_art(pack(artist._replace(artist_lockout=True), False)), "Locked out artists shouldn't"
+
+    flags = pack(Record(True, True, True, True, True), True)
+    assert flags == UserFlags(255) and UserFlags(int(flags)) == flags, "Flags should round trip through an int"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_eligibility()
@@ -0,0 +1,124 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+This file tests the Redis side of the eligibility cache against the Redis server from .env.
+Everything is done under cynix:test: keys and the database lookup is replaced, so no real data is touched.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List
+from utils import eligibility
+from utils.eligibility import UserFlags, clear_eligibility, get_flags, invalidate_eligibility
+from utils.redis import close_redis, get_redis
+
+USER_ID = 1
+
+
+def run(test: Callable[[], Awaitable[None]]) -> None:
+    """
+    Runs a test under cynix:test: keys with no local cache, the pooled client is closed after.
+    Everything the tests swap out on the module is put back, so other tests see the real cache.
+    """
+    saved = eligibility.REDIS_ELIGIBILITY, eligibility._compute, eligibility._ipc # pylint: disable=W0212
+
+    async def wrapper() -> None:
+        eligibility._local.clear() # pylint: disable=W0212
+        await clear_eligibility()
+        try:
+            await test()
+        finally:
+            await clear_eligibility()
+            await close_redis()
+    eligibility.REDIS_ELIGIBILITY = "cynix:test:eligibility"
+    try:
+        asyncio.run(wrapper())
+    finally:
+        eligibility.REDIS_ELIGIBILITY, eligibility._compute, eligibility._ipc = saved # pylint: disable=W0212
+
+
+def test_per_user_keys() -> None:
+    """Tests that flags are stored under their own expiring key and invalidation makes them recompute"""
+    async def test() -> None:
+        computed: List[int] = []
+
+        async def compute(user_id: int) -> UserFlags:
+            computed.append(user_id)
+            return UserFlags.KNOWN | UserFlags.REGISTERED
+        eligibility._compute = compute # pylint: disable=W0212
+
+        redis_client = await get_redis()
+        assert await get_flags(USER_ID) == UserFlags.KNOWN | UserFlags.REGISTERED
+        key = f"{eligibility.REDIS_ELIGIBILITY}:{USER_ID}"
+        assert await redis_client.get(key) == "3" and 0 < await redis_client.ttl(key) <= eligibility.REDIS_TTL
+        eligibility._local.clear() # pylint: disable=W0212
+        await get_flags(USER_ID)
+        assert computed == [USER_ID], "A Redis hit shouldn't touch the database"
+
+        await invalidate_eligibility([USER_ID])
+        assert (await redis_client.get(key)).startswith("stale:"), "Invalidating should leave a marker"
+        await get_flags(USER_ID)
+        assert computed == [USER_ID, USER_ID], "An invalidated user should be recomputed"
+        assert await redis_client.get(key) == "3"
+
+        await clear_eligibility()
+        assert not await redis_client.exists(key), "Clearing should remove every user's key"
+
+    run(test)
+    print("All tests passed!")
+
+
+def test_stale_write() -> None:
+    """Tests that flags computed before an invalidation are never written over it"""
+    async def test() -> None:
+        async def compute(user_id: int) -> UserFlags:
+            # The user's registration changes while we are reading the old one
+            await invalidate_eligibility([user_id])
+            return UserFlags.KNOWN
+        eligibility._compute = compute # pylint: disable=W0212
+
+        redis_client = await get_redis()
+        assert await get_flags(USER_ID) == UserFlags.KNOWN
+        stored = await redis_client.get(f"{eligibility.REDIS_ELIGIBILITY}:{USER_ID}")
+        assert stored.startswith("stale:"), "The old flags shouldn't replace the invalidation"
+
+    run(test)
+    print("All tests passed!")
+
+
+def test_broadcast() -> None:
+    """Tests that invalidating tells the other clusters, and that hearing about it drops the local copy"""
+    class FakeIPC:
+        """Records broadcasts and keeps the handlers eligibility registers"""
+        def __init__(self) -> None:
+            self.sent: List[Any] = []
+            self.handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {}
+
+        def register(self, op: str, handler: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+            self.handlers[op] = handler
+
+        async def broadcast(self, op: str, **args: Any) -> int:
+            self.sent.append((op, args))
+            return 1
+
+    async def test() -> None:
+        ipc = FakeIPC()
+        eligibility.attach_ipc(ipc) # type: ignore
+        await invalidate_eligibility([USER_ID, 2])
+        assert ipc.sent == [("eligibility_invalidate", {"user_ids": [USER_ID, 2]})]
+
+        eligibility._remember(USER_ID, UserFlags.KNOWN) # pylint: disable=W0212
+        eligibility._remember(3, UserFlags.KNOWN) # pylint: disable=W0212
+        await ipc.handlers["eligibility_invalidate"]({"user_ids": [USER_ID]})
+        assert USER_ID not in eligibility._local and 3 in eligibility._local, "Only the named users should go" # pylint: disable=W0212
+        await ipc.handlers["eligibility_clear"]({})
+        assert not eligibility._local, "A rebuild elsewhere should empty this cluster's cache" # pylint: disable=W0212
+
+    run(test)
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_per_user_keys()
+    test_stale_write()
+    test_broadcast()
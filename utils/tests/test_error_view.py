@@ -0,0 +1,122 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+This file tests that error reports leave nothing behind in the bot's view store, or anywhere else in memory.
+send_error runs for real, down to discord.py's webhook code, only the HTTP session under it is fake.
+"""
+import asyncio
+import gc
+import os
+import sys
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Dict
+import discord
+from discord.state import ConnectionState
+from discord.ui.view import ViewStore
+from utils import error_reporting
+
+REPORTS = 100_000
+WARMUP = 1_000  # Reports sent before measuring, so one-off caches and interned strings aren't counted as growth
+MAX_GROWTH = 64 * 1024
+WEBHOOK_URL = f"https://discord.com/api/webhooks/{'1' * 18}/{'a' * 68}"
+
+
+class FakeResponse:
+    """Answers like the paste service, or like Discord answering a webhook execute without wait"""
+    def __init__(self, status: int, data: Dict[str, Any]) -> None:
+        self.status = status
+        self.data = data
+        self.headers: Dict[str, str] = {}
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        return None
+
+    async def json(self) -> Dict[str, Any]:
+        return self.data
+
+    async def text(self, encoding: str = "utf-8") -> str: # pylint: disable=W0613
+        return ""
+
+
+class FakeSession:
+    """Stands in for aiohttp.ClientSession, counting the webhook executes that went through it"""
+    executes = 0
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        return None
+
+    def post(self, *_: Any, **__: Any) -> FakeResponse:
+        return FakeResponse(200, {"id": "abc", "safety": "def"})
+
+    def request(self, *_: Any, **__: Any) -> FakeResponse:
+        FakeSession.executes += 1
+        return FakeResponse(204, {})
+
+
+class PassThrough:
+    """Sends straight away, the real scheduler's rate limits would make 100k sends take hours"""
+    async def send(self, target: Any, priority: Any, **kwargs: Any) -> Any: # pylint: disable=W0613
+        return await target.send(**kwargs)
+
+
+def stored(store: ViewStore) -> int:
+    """Everything the view store holds that could grow per report"""
+    return (sum(len(items) for items in store._views.values()) # pylint: disable=W0212
+            + len(store._synced_message_views) + len(store._dynamic_items)) # pylint: disable=W0212
+
+
+def test_flat_view_store() -> None:
+    """Sends 100k reports through send_error and checks neither the view store nor traced memory grows with them"""
+    state = ConnectionState(dispatch=lambda *_: None, handlers={}, hooks={}, http=None, # type: ignore
+                            intents=discord.Intents.none())
+    previous_bot, previous_url = sys.modules.get("bot"), os.environ.get("WEBHOOK_URL")
+    previous_aiohttp = error_reporting.aiohttp
+    sys.modules["bot"] = SimpleNamespace(bot=SimpleNamespace(_connection=state, outbound=PassThrough())) # type: ignore
+    error_reporting.aiohttp = SimpleNamespace(ClientSession=FakeSession) # type: ignore
+    os.environ["WEBHOOK_URL"] = WEBHOOK_URL
+
+    async def run() -> None:
+        store: ViewStore = state._view_store # pylint: disable=W0212
+        before = stored(store)
+        for i in range(WARMUP):
+            await error_reporting.send_error("test", f"error {i}")
+        gc.collect()
+        tracemalloc.start()
+        try:
+            start, _ = tracemalloc.get_traced_memory()
+            for i in range(REPORTS):
+                result = await error_reporting.send_error("test", f"error {i}")
+                assert result == {"error_url": "abc", "delete_url": "def"}
+            gc.collect()
+            end, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert FakeSession.executes == WARMUP + REPORTS, "Every report should have gone out through the webhook"
+        assert stored(store) == before, "Link-only views should never be kept in the view store"
+        assert end - start < MAX_GROWTH, f"Memory grew by {end - start} bytes over {REPORTS} reports"
+
+    try:
+        asyncio.run(run())
+    finally:
+        if previous_bot is None:
+            sys.modules.pop("bot", None)
+        else:
+            sys.modules["bot"] = previous_bot
+        if previous_url is None:
+            os.environ.pop("WEBHOOK_URL", None)
+        else:
+            os.environ["WEBHOOK_URL"] = previous_url
+        error_reporting.aiohttp = previous_aiohttp
+    print("All tests passed!")
+
+if __name__ == "__main__":
+    test_flat_view_store()
@@ -0,0 +1,53 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests that the cleanup queue only hands each cluster the due guilds on its own shards"""
+from typing import List
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from database.db_io import GuildCleanup
+from database.makedb import GuildCleanup as DbCleanup
+
+SHARD_COUNT = 4
+
+
+def guild_on(shard_id: int, n: int) -> int:
+    """The nth guild ID that lands on `shard_id`"""
+    return ((n * SHARD_COUNT + shard_id) << 22) | 12345
+
+
+def make_engine() -> Engine:
+    """An in-memory table with two due guilds on every shard and one that isn't due yet"""
+    engine = create_engine("sqlite://")
+    DbCleanup.__table__.create(engine)
+    rows = [{"guild_id": guild_on(shard_id, n), "left_at": 0, "purge_after": 10 * n + shard_id}
+            for shard_id in range(SHARD_COUNT) for n in range(2)]
+    rows.append({"guild_id": guild_on(1, 5), "left_at": 0, "purge_after": 1000})
+    with engine.begin() as conn:
+        conn.execute(DbCleanup.__table__.insert(), rows)
+    return engine
+
+
+def due(engine: Engine, shard_ids: List[int], limit: int = 10) -> List[int]:
+    """Runs the due query the way get_due does"""
+    with engine.connect() as conn:
+        return [int(guild_id) for guild_id in
+                conn.execute(GuildCleanup.due_query(100, shard_ids, SHARD_COUNT, limit)).scalars()]
+
+
+def test_due_query() -> None:
+    """Tests that the shard filter, the due check, the order and the limit all happen in the query"""
+    engine = make_engine()
+    assert due(engine, [1]) == [guild_on(1, 0), guild_on(1, 1)], "Guilds that aren't due should be left out"
+    assert due(engine, [0, 3]) == [guild_on(0, 0), guild_on(3, 0), guild_on(0, 1), guild_on(3, 1)], \
+        "Guilds should come oldest first across every owned shard"
+    assert due(engine, [2], limit=1) == [guild_on(2, 0)]
+    assert due(engine, [3], limit=1) == [guild_on(3, 0)], \
+        "A cluster should get its own guilds even when other shards have older ones"
+    assert due(engine, []) == [], "A cluster with no shards should get nothing"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_due_query()
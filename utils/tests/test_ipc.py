@@ -0,0 +1,36 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests how the cluster IPC listener resubscribes, the subscription itself is replaced"""
+import asyncio
+from utils.ipc import ClusterIPC
+
+
+def test_clean_end_backs_off() -> None:
+    """Tests that a subscription ending without an error waits before resubscribing instead of spinning"""
+    ipc = ClusterIPC(1)
+    subscriptions = 0
+
+    async def receive() -> None:
+        nonlocal subscriptions
+        subscriptions += 1
+        await asyncio.sleep(0)  # Yields like a real subscription, so a missing backoff fails instead of hanging
+    ipc._receive = receive # type: ignore # pylint: disable=W0212
+
+    async def run() -> None:
+        task = asyncio.create_task(ipc._listen()) # pylint: disable=W0212
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert subscriptions == 1, f"Resubscribed {subscriptions} times in 0.2s"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_clean_end_backs_off()
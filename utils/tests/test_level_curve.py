@@ -0,0 +1,33 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the tests for the XP curves"""
+from utils.level_curve import CURVES, LevelCurve, XpGrant
+
+
+def test_level_curve() -> None:
+    """Tests level lookups, progress and crossed boundaries"""
+    curve = CURVES["default"]
+    assert curve.level_for(0) == 0
+    assert curve.level_for(99) == 0
+    assert curve.level_for(100) == 1, "Level 1 needs 100 XP"
+    assert curve.level_for(255) == 2, "Level 2 needs 100 + 155 XP"
+    assert curve.xp_for_level(2) == 255
+    assert curve.progress(150) == (1, 50, 155)
+
+    assert list(curve.crossed(50, 60)) == [], "No boundary crossed"
+    assert list(curve.crossed(99, 100)) == [1]
+    assert list(curve.crossed(0, 1000)) == list(range(1, curve.level_for(1000) + 1)), "Big grants cross several levels"
+
+    small = LevelCurve("small", 0, 0, 10, max_level=3)
+    assert small.level_for(10 ** 9) == 3, "XP past the table stays at max level"
+    assert small.progress(45) == (3, 15, 0)
+
+    assert XpGrant(255, 200, curve.crossed(55, 255)).level == 2
+    assert XpGrant(60, 5, curve.crossed(55, 60)).level == 0
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_level_curve()
@@ -0,0 +1,175 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests the batching, overflow and retry handling of the log delivery pipeline"""
+import asyncio
+from types import SimpleNamespace
+from typing import Any, List, Optional
+import discord
+from utils import log_delivery
+from utils.log_delivery import LogDelivery, MAX_ATTEMPTS
+
+CHANNEL_ID = 1
+
+
+class FakeChannel(discord.TextChannel): # type: ignore
+    """Passes the TextChannel check without needing a connection state"""
+    def __init__(self) -> None: # pylint: disable=W0231
+        self.id = CHANNEL_ID
+
+
+class FakeWebhooks:
+    """Stands in for the webhook cache, the outbound fake doesn't care what it sends through"""
+    def __init__(self) -> None:
+        self.invalidated = 0
+
+    async def get(self, channel: discord.TextChannel) -> Any:
+        return channel
+
+    def invalidate(self, channel_id: int) -> None:
+        self.invalidated += 1
+
+
+class FakeOutbound:
+    """Records every batch, failing the first `fail` sends with `error`"""
+    def __init__(self, fail: int = 0, error: Optional[discord.HTTPException] = None) -> None:
+        self.fail = fail
+        self.error = error
+        self.sent: List[List[discord.Embed]] = []
+        self.attempts = 0
+
+    async def send(self, target: Any, priority: Any, **kwargs: Any) -> None:
+        self.attempts += 1
+        if self.attempts <= self.fail and self.error is not None:
+            raise self.error
+        self.sent.append(kwargs["embeds"])
+
+
+def http_error(status: int) -> discord.HTTPException:
+    """Builds the exception discord.py raises for a response with this status"""
+    response = SimpleNamespace(status=status, reason="")
+    if status == 404:
+        return discord.NotFound(response, "Unknown Webhook")
+    error = discord.HTTPException(response, "You are being rate limited.")
+    error.retry_after = 0.01 # type: ignore
+    return error
+
+
+def make_delivery(outbound: FakeOutbound, max_pending: int = 200) -> LogDelivery:
+    """A delivery pipeline with short intervals and fakes for everything that would talk to Discord"""
+    bot = SimpleNamespace(outbound=outbound, get_channel=lambda _: FakeChannel(),
+                          user=SimpleNamespace(name="Cynix", display_avatar=SimpleNamespace(url="")))
+    delivery = LogDelivery(bot, flush_interval=0.01, send_interval=0, max_pending=max_pending) # type: ignore
+    delivery.webhooks = FakeWebhooks() # type: ignore
+    return delivery
+
+
+def embeds(count: int, length: int = 10) -> List[discord.Embed]:
+    """Numbered embeds, so the order they arrive in can be checked"""
+    return [discord.Embed(title=str(i), description="x" * length) for i in range(count)]
+
+
+async def drain(delivery: LogDelivery) -> None:
+    """Waits until every queue has gone idle"""
+    for _ in range(200):
+        if not delivery.queue_depth() and not delivery._queues: # pylint: disable=W0212
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("The queue never drained")
+
+
+def test_batching() -> None:
+    """Tests that embeds go out ten at a time and never over the combined character limit"""
+    async def run() -> None:
+        outbound = FakeOutbound()
+        delivery = make_delivery(outbound)
+        for embed in embeds(25):
+            delivery.enqueue(CHANNEL_ID, embed)
+        await drain(delivery)
+        assert [len(batch) for batch in outbound.sent] == [10, 10, 5], "Batches should hold up to 10 embeds"
+
+        outbound.sent.clear()
+        for embed in embeds(7, length=2000):
+            delivery.enqueue(CHANNEL_ID, embed)
+        await drain(delivery)
+        assert [len(batch) for batch in outbound.sent] == [2, 2, 2, 1], "Batches should stay under 6000 characters"
+        assert all(sum(len(embed) for embed in batch) <= 6000 for batch in outbound.sent)
+
+    asyncio.run(run())
+    print("All tests passed!")
+
+
+def test_overflow() -> None:
+    """Tests that a full queue counts what it couldn't hold and sends a summary"""
+    async def run() -> None:
+        outbound = FakeOutbound()
+        delivery = make_delivery(outbound, max_pending=5)
+        for embed in embeds(8):
+            delivery.enqueue(CHANNEL_ID, embed)
+        await drain(delivery)
+        titles = [embed.title for batch in outbound.sent for embed in batch]
+        assert titles == ["0", "1", "2", "3", "4", "3 more log events were not shown"], titles
+
+    asyncio.run(run())
+    print("All tests passed!")
+
+
+def test_requeue_accounting() -> None:
+    """Tests that putting a failed batch back counts the embeds it pushes off the end"""
+    async def run() -> None:
+        queue = log_delivery._ChannelQueue(CHANNEL_ID, 3) # pylint: disable=W0212
+        queue.pending.extend(embeds(3))
+        queue.requeue([discord.Embed(title="a"), discord.Embed(title="b")])
+        assert [embed.title for embed in queue.pending] == ["a", "b", "0"], "The failed batch should go first"
+        assert queue.overflow == {"1": 1, "2": 1}, "Embeds pushed off the end should be counted"
+
+    asyncio.run(run())
+    print("All tests passed!")
+
+
+def test_rate_limited() -> None:
+    """Tests that a 429 puts the batch back in order and tries again"""
+    async def run() -> None:
+        outbound = FakeOutbound(fail=1, error=http_error(429))
+        delivery = make_delivery(outbound)
+        for embed in embeds(12):
+            delivery.enqueue(CHANNEL_ID, embed)
+        await drain(delivery)
+        titles = [embed.title for batch in outbound.sent for embed in batch]
+        assert titles == [str(i) for i in range(12)], "Every embed should arrive once and in order"
+        assert outbound.attempts == 3
+
+    asyncio.run(run())
+    print("All tests passed!")
+
+
+def test_not_found() -> None:
+    """Tests that a deleted webhook is recreated, and a batch that keeps failing is dropped"""
+    async def run() -> None:
+        outbound = FakeOutbound(fail=1, error=http_error(404))
+        delivery = make_delivery(outbound)
+        for embed in embeds(3):
+            delivery.enqueue(CHANNEL_ID, embed)
+        await drain(delivery)
+        assert delivery.webhooks.invalidated == 1, "The dead webhook should be forgotten" # type: ignore
+        assert [len(batch) for batch in outbound.sent] == [3], "The batch should go out on the new webhook"
+
+        outbound = FakeOutbound(fail=1000, error=http_error(404))
+        delivery = make_delivery(outbound)
+        for embed in embeds(3):
+            delivery.enqueue(CHANNEL_ID, embed)
+        await drain(delivery)
+        assert outbound.attempts == MAX_ATTEMPTS, "A batch should only be tried MAX_ATTEMPTS times"
+        assert not outbound.sent
+
+    asyncio.run(run())
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_batching()
+    test_overflow()
+    test_requeue_accounting()
+    test_rate_limited()
+    test_not_found()
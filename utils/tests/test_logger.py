@@ -0,0 +1,98 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests the structured log output, debug sampling and compressed rotation"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import tempfile
+from typing import List
+from utils.logger import (CompressingRotatingFileHandler, ContextFilter, DebugSampler, JsonFormatter,
+                          bind_log_context)
+
+
+class _Collect(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.lines: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(self.format(record))
+
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    log = logging.getLogger(name)
+    log.propagate = False
+    log.handlers = [handler]
+    log.setLevel(logging.DEBUG)
+    return log
+
+
+def test_json_context() -> None:
+    """Tests that fields bound in one task show up on its records and not on another task's"""
+    handler = _Collect()
+    handler.addFilter(ContextFilter())
+    handler.setFormatter(JsonFormatter("3"))
+    log = _logger("test.json", handler)
+
+    async def command() -> None:
+        bind_log_context(guild=123, command="rank")
+        log.info("ran %s", "rank", extra={"latency_ms": 42})
+
+    async def run() -> None:
+        await asyncio.gather(command(), asyncio.sleep(0))
+        log.info("outside")
+
+    asyncio.run(run())
+    inside, outside = (json.loads(line) for line in handler.lines)
+    assert inside["msg"] == "ran rank" and inside["cluster"] == "3", "The message and cluster should be there"
+    assert (inside["guild"], inside["command"], inside["latency_ms"]) == (123, "rank", 42), "Fields should be set"
+    assert "guild" not in outside, "Bound fields shouldn't leak out of the task"
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        log.exception("failed")
+    assert "ValueError: boom" in json.loads(handler.lines[-1])["exc"], "Tracebacks should be a field"
+    print("All tests passed!")
+
+
+def test_sampling() -> None:
+    """Tests that a hot debug line is sampled while info lines all get through"""
+    handler = _Collect()
+    handler.addFilter(DebugSampler(10))
+    handler.setFormatter(JsonFormatter("0"))
+    log = _logger("test.sampling", handler)
+    for _ in range(95):
+        log.debug("hot path")
+    log.info("important")
+    sampled = [json.loads(line) for line in handler.lines]
+    assert len(sampled) == 11, "1 in 10 of 95 debug records plus the info record should get through"
+    assert sampled[0]["sampled"] == 10 and "sampled" not in sampled[-1], "Sampled records should say so"
+    print("All tests passed!")
+
+
+def test_rotation() -> None:
+    """Tests size rotation with gzip and that the backup count holds"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cynix-0.log")
+        handler = CompressingRotatingFileHandler(path, max_bytes=2000, interval=3600, backups=2)
+        handler.setFormatter(JsonFormatter("0"))
+        log = _logger("test.rotation", handler)
+        for i in range(200):
+            log.info("line %s %s", i, "x" * 50)
+        handler.close()
+        files = sorted(os.listdir(directory))
+        assert files == ["cynix-0.log", "cynix-0.log.1.gz", "cynix-0.log.2.gz"], f"Unexpected files {files}"
+        with gzip.open(os.path.join(directory, "cynix-0.log.1.gz"), "rt", encoding="utf-8") as rotated:
+            assert all(json.loads(line)["logger"] == "test.rotation" for line in rotated), "Backups should be JSON"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_json_context()
+    test_sampling()
+    test_rotation()
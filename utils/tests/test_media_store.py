@@ -0,0 +1,61 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests the content-addressed media store"""
+import hashlib
+import os
+import tempfile
+from utils.media_store import MediaStore
+
+
+def test_media_store() -> None:
+    """Tests dedup, layout, path validation and sweeping"""
+    with tempfile.TemporaryDirectory() as root:
+        store = MediaStore(root)
+        digest = store.put(b"png bytes")
+        assert digest == hashlib.sha256(b"png bytes").hexdigest(), "Files should be named by their SHA-256"
+        assert store.path(digest) == os.path.join(root, digest[:2], digest[2:4], digest), "Wrong fanout layout"
+        assert store.put(b"png bytes") == digest and len(list(store.digests())) == 1, "Duplicates should be stored once"
+        with open(store.path(digest), "rb") as file:
+            assert file.read() == b"png bytes", "Stored bytes should be untouched"
+
+        try:
+            store.path("../../etc/passwd")
+            raise AssertionError("Non-hash names should be rejected")
+        except ValueError:
+            pass
+
+        other = store.put(b"gif bytes")
+        assert store.sweep({digest}) == 0, "New files should survive a sweep"
+        os.utime(store.path(other), (0, 0))
+        store.put(b"gif bytes")
+        assert store.sweep({digest}, min_age=60) == 0, "Storing a file again should restart its grace period"
+        assert store.sweep({digest}, min_age=-1) == 1, "Unreferenced files should be swept"
+        assert store.exists(digest) and not store.exists(other), "Only the unreferenced file should go"
+    print("All tests passed!")
+
+
+def test_file_types() -> None:
+    """Tests that only known image types are accepted and files go out with the right extension"""
+    assert MediaStore.extension("image/jpeg") == "jpg" and MediaStore.extension("IMAGE/PNG; charset=x") == "png"
+    assert MediaStore.extension("image/svg+xml") is None and MediaStore.extension("text/plain") is None
+    assert MediaStore.extension(None) is None
+    with tempfile.TemporaryDirectory() as root:
+        store = MediaStore(root)
+        gif = store.put(b"GIF89a rest of the gif")
+        for content_type, filename in (("image/webp", "image.webp"), (None, "image.gif")):
+            file = store.as_file(gif, content_type)
+            assert file is not None and file.filename == filename, f"Expected {filename}"
+            assert file.fp.read(6) == b"GIF89a", "Sniffing should leave the file at the start"
+            file.close()
+        unknown = store.as_file(store.put(b"no signature"))
+        assert unknown is not None and unknown.filename == "image.png", "Unknown files should fall back to PNG"
+        unknown.close()
+        assert store.as_file("0" * 64) is None, "A missing file should give None"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_media_store()
+    test_file_types()
@@ -0,0 +1,77 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests the message snapshot cache and reports its memory use per 100k messages"""
+import gc
+import random
+import tracemalloc
+from utils.message_snapshots import MessageSnapshot, SnapshotCache
+
+BASE_ID = 1_300_000_000_000_000_000
+
+
+def snapshot(i: int, channel_id: int = 10, content: str = "hello") -> MessageSnapshot:
+    """Makes a snapshot with a realistic snowflake"""
+    return MessageSnapshot(BASE_ID + i, 1, channel_id, 99, content)
+
+
+def test_rings() -> None:
+    """Tests the per-channel limit, the budget, edits and deletes"""
+    cache = SnapshotCache(per_channel=3)
+    for i in range(5):
+        cache.add(snapshot(i))
+    assert len(cache) == 3 and cache.get(10, BASE_ID) is None, "A full channel should drop its oldest message"
+    newest = cache.get(10, BASE_ID + 4)
+    assert newest is not None and newest.content == "hello", "The newest message should be kept"
+
+    before = cache.edit(10, BASE_ID + 3, "edited")
+    assert before is not None and before.content == "hello", "Edits should return the original"
+    edited = cache.get(10, BASE_ID + 3)
+    assert edited is not None and edited.content == "edited", "Edits should store the new content"
+    assert cache.edit(10, BASE_ID, "gone") is None, "Editing an evicted message should do nothing"
+    deleted = cache.pop(10, BASE_ID + 3)
+    assert deleted is not None and deleted.content == "edited" and len(cache) == 2, "Deletes should remove the message"
+
+    size = snapshot(0).size()
+    cache = SnapshotCache(budget_bytes=size * 4, per_channel=100)
+    for i in range(3):
+        cache.add(snapshot(i, channel_id=1))
+    for i in range(3, 6):
+        cache.add(snapshot(i, channel_id=2))
+    assert cache.bytes <= cache.budget_bytes, "The budget should hold"
+    assert cache.get(1, BASE_ID) is None and cache.get(1, BASE_ID + 1) is None, \
+        "The least recently written channel should give up its oldest messages first"
+    assert cache.get(2, BASE_ID + 3) is not None, "The busy channel should keep its messages"
+
+    cache.forget_guild(1)
+    assert len(cache) == 0 and cache.bytes == 0, "Forgetting a guild should free everything"
+    assert snapshot(0).created_at > 1.6e9, "The timestamp should come from the snowflake"
+    print("All tests passed!")
+
+
+def test_memory() -> None:
+    """Checks the size estimate against what is really allocated, so the budget means what it says"""
+    rng = random.Random(0)
+    lengths = [rng.randint(5, 300) for _ in range(100_000)]
+    authors = [BASE_ID + i for i in range(5000)]
+    gc.collect()
+    tracemalloc.start()
+    cache = SnapshotCache(budget_bytes=1 << 40, per_channel=1000)
+    for i, length in enumerate(lengths):
+        cache.add(MessageSnapshot(BASE_ID + 10_000 + i, 1, i % 200, authors[i % 5000], "x" * length))
+    real, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"100k messages: {real / 1024 / 1024:.1f} MiB allocated, "
+          f"{cache.stats()['bytes_per_100k'] / 1024 / 1024:.1f} MiB estimated")
+    assert 0.8 < real / cache.bytes < 1.25, "The estimate should be within 25% of the real allocation"
+
+    cache.budget_bytes = cache.bytes // 2
+    cache.add(snapshot(0))
+    assert cache.bytes <= cache.budget_bytes and len(cache) < 60_000, "Lowering the budget should evict down to it"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_rings()
+    test_memory()
@@ -0,0 +1,99 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests the priority order, coalescing and 429 handling of the outbound scheduler"""
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, List
+import discord
+from utils.outbound import MAX_EMBED_CHARS, OutboundScheduler, Priority
+
+
+class FakeChannel:
+    """Records what it was asked to send, failing the first `fail` sends with an HTTP `status` error"""
+    def __init__(self, channel_id: int, fail: int = 0, status: int = 429) -> None:
+        self.id = channel_id
+        self.fail = fail
+        self.status = status
+        self.sent: List[Dict[str, Any]] = []
+        self.attempts = 0
+
+    async def send(self, **kwargs: Any) -> int:
+        self.attempts += 1
+        if self.attempts <= self.fail:
+            error = discord.HTTPException(SimpleNamespace(status=self.status, reason=""), "failed")
+            error.retry_after = 0.01 # type: ignore
+            raise error
+        self.sent.append(kwargs)
+        return len(self.sent)
+
+
+def embed(length: int = 10) -> discord.Embed:
+    """An embed of about `length` characters"""
+    return discord.Embed(description="x" * length)
+
+
+def test_priority() -> None:
+    """Tests that queued sends go out most urgent first, in arrival order within a priority"""
+    async def run() -> None:
+        scheduler = OutboundScheduler()
+        channel = FakeChannel(1)
+        await asyncio.gather(scheduler.send(channel, Priority.LOG, content="log"),
+                             scheduler.send(channel, Priority.NORMAL, content="normal 1"),
+                             scheduler.send(channel, Priority.INTERACTIVE, content="reply"),
+                             scheduler.send(channel, Priority.NORMAL, content="normal 2"))
+        assert [sent["content"] for sent in channel.sent] == ["reply", "normal 1", "normal 2", "log"]
+
+    asyncio.run(run())
+    print("All tests passed!")
+
+
+def test_coalescing() -> None:
+    """Tests that embed-only sends are packed up to Discord's embed count and combined length"""
+    async def run() -> None:
+        scheduler = OutboundScheduler()
+        channel = FakeChannel(1)
+        results = await asyncio.gather(*(scheduler.send(channel, Priority.LOG, embed=embed()) for _ in range(12)))
+        assert [len(sent["embeds"]) for sent in channel.sent] == [10, 2], "At most 10 embeds fit in a message"
+        assert results == [1] * 10 + [2] * 2, "Every sender should get the message its embed went out in"
+
+        channel = FakeChannel(2)
+        await asyncio.gather(*(scheduler.send(channel, Priority.LOG, embeds=[embed(1900)]) for _ in range(4)))
+        assert [len(sent["embeds"]) for sent in channel.sent] == [3, 1], "Merging should stop at 6000 characters"
+        assert all(sum(len(e) for e in sent["embeds"]) <= MAX_EMBED_CHARS for sent in channel.sent)
+
+        channel = FakeChannel(3)
+        await asyncio.gather(scheduler.send(channel, Priority.INTERACTIVE, embed=embed()),
+                             scheduler.send(channel, Priority.INTERACTIVE, embed=embed()),
+                             scheduler.send(channel, Priority.LOG, embed=embed(), content="with text"))
+        assert len(channel.sent) == 3, "Interactive sends and sends with content should never be merged"
+        assert scheduler.metrics()["coalesced"] == 9 + 1 + 2
+
+    asyncio.run(run())
+    print("All tests passed!")
+
+
+def test_rate_limited() -> None:
+    """Tests that a 429 requeues the whole merged message and a different error fails every sender in it"""
+    async def run() -> None:
+        scheduler = OutboundScheduler()
+        channel = FakeChannel(1, fail=1)
+        await asyncio.gather(*(scheduler.send(channel, Priority.LOG, embed=embed()) for _ in range(3)))
+        assert channel.attempts == 2 and [len(sent["embeds"]) for sent in channel.sent] == [3]
+        assert scheduler.metrics()["rate_limited"] == 1
+
+        channel = FakeChannel(2, fail=1, status=400)
+        results = await asyncio.gather(*(scheduler.send(channel, Priority.LOG, embed=embed()) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(result, discord.HTTPException) for result in results), "Every rider should fail"
+        assert channel.attempts == 1, "Only a 429 should be retried"
+
+    asyncio.run(run())
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_priority()
+    test_coalescing()
+    test_rate_limited()
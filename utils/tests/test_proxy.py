@@ -0,0 +1,71 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests the proxy tag matcher and the streaming importer"""
+import asyncio
+import json
+from typing import AsyncIterator, List
+from utils.proxy import ProxyMember, TagMatcher, export_pluralkit, stream_import
+
+
+async def chunked(data: bytes, size: int) -> AsyncIterator[bytes]:
+    """Feeds the data in small pieces, so values and UTF-8 characters get cut in half"""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def import_all(data: bytes, size: int = 7) -> List[ProxyMember]:
+    """Runs the importer to completion"""
+    async def run() -> List[ProxyMember]:
+        return [member async for member in stream_import(chunked(data, size))]
+    return asyncio.run(run())
+
+
+def test_tag_matcher() -> None:
+    """Tests prefix, suffix and longest-tag-first matching"""
+    alice = ProxyMember("alice", None, None, (("a:", ""),))
+    bracket = ProxyMember("bracket", None, None, (("[", "]"),))
+    double = ProxyMember("double", None, None, (("[[", "]]"),))
+    suffix = ProxyMember("suffix", None, None, (("", "-s"),))
+    matcher = TagMatcher([alice, bracket, double, suffix])
+    assert matcher.match("a: hello") == (alice, "hello"), "Prefix tags should match and be stripped"
+    assert matcher.match("[[hi]]") == (double, "hi"), "The longest tag should win"
+    assert matcher.match("[hi]") == (bracket, "hi"), "Shorter tags should still match on their own"
+    assert matcher.match("hey -s") == (suffix, "hey"), "Suffix-only tags should match"
+    assert matcher.match("a:") is None and matcher.match("[]") is None, "Empty messages shouldn't be proxied"
+    assert matcher.match("just talking") is None, "Untagged messages shouldn't be proxied"
+    assert not TagMatcher([]), "A matcher without tags should be falsy"
+
+
+def test_stream_import() -> None:
+    """Tests both export formats, skipped sections and chunk boundaries"""
+    pluralkit = {
+        "version": 2, "name": "System",
+        "switches": [{"timestamp": "2020", "members": ["abcde"] * 50}],
+        "members": [
+            {"id": "abcde", "name": "Ünïcode", "display_name": "U", "avatar_url": None,
+             "proxy_tags": [{"prefix": "u:", "suffix": None}, {"prefix": None, "suffix": "-u"}]},
+            {"id": "fghij", "name": "Num", "proxy_tags": [], "birthday": None, "created": 1234567890123},
+        ],
+        "groups": [{"name": "g", "members": ["abcde"]}],
+    }
+    members = import_all(json.dumps(pluralkit, ensure_ascii=False).encode())
+    assert [member.name for member in members] == ["Ünïcode", "Num"], "Every member should be imported in order"
+    assert members[0].tags == (("u:", ""), ("", "-u")) and members[0].external_id == "abcde", "Tags should convert"
+
+    tupperbox = {"tuppers": [{"id": 7, "name": "Tup", "nick": "T", "avatar_url": "https://x/y.png",
+                              "brackets": ["t:", "", "{", "}"]}], "groups": []}
+    members = import_all(json.dumps(tupperbox, indent=2).encode(), size=3)
+    assert members == [ProxyMember("Tup", "T", "https://x/y.png", (("t:", ""), ("{", "}")), "tupperbox", "7")], \
+        "Tupperbox brackets should become tag pairs"
+
+    exported = json.dumps(export_pluralkit(members)).encode()
+    assert [member.tags for member in import_all(exported)] == [members[0].tags], "Exports should import back"
+    assert not import_all(b"{}"), "Empty exports should import nothing"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_tag_matcher()
+    test_stream_import()
@@ -0,0 +1,33 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests the query advisor's fingerprinting, plan reading and migration output"""
+import ast
+from database.query_advisor import fingerprint, seq_scans, render_migration
+
+
+def test_query_advisor() -> None:
+    """Tests the parts of the advisor that don't need a database"""
+    assert fingerprint("SELECT x\n  FROM t WHERE id IN ($1, $2, $3)") == \
+        fingerprint("SELECT x FROM t WHERE id IN ($1)"), "IN lists of any length should share a fingerprint"
+
+    plan = {"Node Type": "Limit", "Plans": [
+        {"Node Type": "Index Scan", "Relation Name": "logs", "Index Cond": "(guild_id = $1)"},
+        {"Node Type": "Seq Scan", "Relation Name": "levels", "Rows Removed by Filter": 99,
+         "Filter": "((levels.guild_id = '1'::bigint) AND (xp >= 5))"},
+    ]}
+    assert seq_scans(plan) == [("levels", ["guild_id", "xp"], 99)], "Only sequential scans should be reported"
+
+    source = render_migration("Test", "abc", "def", [("levels", ["guild_id", "xp DESC"])],
+                              [("levels", "ix_guild", ["guild_id"])])
+    ast.parse(source)
+    assert "postgresql_concurrently=True" in source and "autocommit_block" in source, \
+        "Indexes should be built concurrently outside a transaction"
+    assert "sa.text('xp DESC')" in source, "Sort order should be kept"
+    assert "op.create_index('ix_guild', 'levels', ['guild_id']" in source, "The downgrade should rebuild dropped indexes"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_query_advisor()
@@ -0,0 +1,64 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the tests for the reaction log aggregator and the embeds built from it"""
+import re
+from cogs.reaction_logs import MAX_EMBED_LENGTH, MAX_FIELD_LENGTH, _build_embed
+from utils.reaction_aggregator import ReactionAggregator, ReactionSummary
+
+GUILD_ID, CHANNEL_ID, LOG_CHANNEL_ID = 1, 2, 3
+
+
+def test_reaction_aggregator() -> None:
+    """Tests that bursts collapse into a single net change per message"""
+    aggregator = ReactionAggregator(window_seconds=10, max_messages=2)
+
+    for _ in range(50):  # Someone spamming a reaction on and off
+        aggregator.add(GUILD_ID, CHANNEL_ID, 100, LOG_CHANNEL_ID, 7, "⭐", 1, now=0)
+        aggregator.add(GUILD_ID, CHANNEL_ID, 100, LOG_CHANNEL_ID, 7, "⭐", -1, now=0)
+    aggregator.add(GUILD_ID, CHANNEL_ID, 100, LOG_CHANNEL_ID, 8, "⭐", 1, now=1)
+    aggregator.add(GUILD_ID, CHANNEL_ID, 100, LOG_CHANNEL_ID, 9, "🔥", -1, now=2)
+
+    assert not aggregator.pop_expired(now=5), "Nothing should flush before the window closes"
+    summaries = aggregator.pop_expired(now=11)
+    assert len(summaries) == 1, "The burst should be a single entry"
+    assert summaries[0].added == {"⭐": [8]}, "The add/remove spam should cancel out"
+    assert summaries[0].removed == {"🔥": [9]}
+
+    aggregator.add(GUILD_ID, CHANNEL_ID, 200, LOG_CHANNEL_ID, 7, "⭐", 1, now=20)
+    aggregator.add(GUILD_ID, CHANNEL_ID, 200, LOG_CHANNEL_ID, 7, "⭐", -1, now=20)
+    assert not aggregator.pop_expired(now=40), "A burst that cancels out should not be logged"
+    assert len(aggregator) == 0
+
+    for message_id in range(3):
+        aggregator.add(GUILD_ID, CHANNEL_ID, message_id, LOG_CHANNEL_ID, 7, "⭐", 1, now=50)
+    assert len(aggregator.pop_expired(now=50)) == 1, "The oldest burst should flush when over the limit"
+    assert len(aggregator.pop_all()) == 2
+    print("All tests passed!")
+
+
+def test_reaction_embed() -> None:
+    """Tests that a huge burst still builds an embed Discord accepts, cut between mentions"""
+    users = list(range(10**17, 10**17 + 500))
+    emojis = [f"<:emoji{i}:{10**18 + i}>" for i in range(40)]
+    summary = ReactionSummary(GUILD_ID, CHANNEL_ID, 100, LOG_CHANNEL_ID,
+                              added={emoji: users for emoji in emojis}, removed={emojis[0]: users})
+    embed = _build_embed(summary)
+    assert len(embed) <= MAX_EMBED_LENGTH, "The embed should fit Discord's total length limit"
+    assert all(len(field.value) <= MAX_FIELD_LENGTH for field in embed.fields)
+    for field in embed.fields:
+        for line in field.value.split("\n"):
+            assert re.fullmatch(r"\*\*(Added|Removed):\*\* (<@\d+> )*and \d+ more", line), line
+    assert embed.description.endswith(f"+{len(emojis) - len(embed.fields)} more emojis")
+
+    small = ReactionSummary(GUILD_ID, CHANNEL_ID, 100, LOG_CHANNEL_ID, added={"⭐": [7, 8]}, removed={})
+    embed = _build_embed(small)
+    assert [field.value for field in embed.fields] == ["**Added:** <@7> <@8>"], "Small bursts should be shown whole"
+    assert "more emojis" not in embed.description
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_reaction_aggregator()
+    test_reaction_embed()
@@ -0,0 +1,105 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests the reaction role index, which rows it is built from and the role edit batching"""
+import asyncio
+from types import SimpleNamespace
+from typing import Any, FrozenSet, List, Tuple
+import discord
+from sqlalchemy import create_engine, select
+from database.db_io import on_shards
+from database.makedb import ReactionRoles as DbReactRoles
+from utils.checks import role_grant_refusal
+from utils.reaction_roles import ReactionRoleIndex, RoleBatcher
+
+
+def test_index() -> None:
+    """Tests lookups, misses and config changes"""
+    index = ReactionRoleIndex([(1, "👍", 10), (1, "123", 11), (2, "👍", 20)])
+    assert index.lookup(1, "👍") == 10 and index.lookup(1, "123") == 11, "Configured emojis should map to roles"
+    assert index.lookup(3, "👍") is None, "Unconfigured messages should miss"
+    assert index.lookup(2, "123") is None, "Unconfigured emojis should miss"
+    index.replace(2, {"🎉": 21})
+    assert index.lookup(2, "👍") is None and index.lookup(2, "🎉") == 21, "Replacing should drop the old emojis"
+    index.replace(1, {})
+    assert index.lookup(1, "👍") is None and len(index) == 1, "An empty mapping should drop the message"
+    print("All tests passed!")
+
+
+def test_batcher() -> None:
+    """Tests that bursts from one member become one edit and that close flushes"""
+    edits: List[Tuple[int, int, FrozenSet[int], FrozenSet[int]]] = []
+
+    async def flush(guild_id: int, user_id: int, add: FrozenSet[int], remove: FrozenSet[int]) -> None:
+        edits.append((guild_id, user_id, add, remove))
+
+    async def run() -> None:
+        batcher = RoleBatcher(flush, delay=0.05)
+        for role_id in (10, 11, 12):
+            batcher.queue(1, 100, role_id, True)
+        batcher.queue(1, 100, 11, False)
+        batcher.queue(1, 200, 10, True)
+        assert len(batcher) == 2, "There should be one pending batch per member"
+        await asyncio.sleep(0.1)
+        assert sorted(edits) == [(1, 100, frozenset({10, 12}), frozenset({11})),
+                                 (1, 200, frozenset({10}), frozenset())], "Each member should get one edit"
+        assert len(batcher) == 0, "Flushed batches should be forgotten"
+
+        edits.clear()
+        batcher.delay = 60
+        batcher.queue(1, 100, 10, False)
+        await batcher.close()
+        assert edits == [(1, 100, frozenset(), frozenset({10}))], "Closing should flush right away"
+
+    asyncio.run(run())
+    print("All tests passed!")
+
+
+def test_owned_rows() -> None:
+    """Tests that a cluster only loads the reaction roles of guilds on its own shards"""
+    engine = create_engine("sqlite://")
+    DbReactRoles.__table__.create(engine)
+    # Guild n << 22 lands on shard n % 4
+    rows = [{"message_id": n, "emoji": "👍", "guild_id": n << 22, "channel_id": 1, "role_id": 100 + n}
+            for n in range(8)]
+    with engine.begin() as conn:
+        conn.execute(DbReactRoles.__table__.insert(), rows)
+        loaded = conn.execute(select(DbReactRoles.message_id)
+                              .filter(on_shards(DbReactRoles.guild_id, [1, 2], 4))
+                              .order_by(DbReactRoles.message_id)).scalars().all()
+    assert loaded == [1, 2, 5, 6], "Only guilds on shards 1 and 2 should be loaded"
+    print("All tests passed!")
+
+
+def role(guild: Any, role_id: int, position: int, permissions: int = 0) -> discord.Role:
+    """A real role on a fake guild, so comparisons go through discord.py's own hierarchy rules"""
+    return discord.Role(guild=guild, state=None, data={"id": role_id, "name": str(role_id), "position": position, # type: ignore
+                                                       "permissions": str(permissions)})
+
+
+def test_role_grant_refusal() -> None:
+    """Tests that members can only set up plain roles below their own, unless they own the server"""
+    guild = SimpleNamespace(id=1, owner_id=100)
+    guild.me = SimpleNamespace(id=99, top_role=role(guild, 2, 10))
+    mod = SimpleNamespace(id=101, guild=guild, top_role=role(guild, 3, 5))
+    owner = SimpleNamespace(id=100, guild=guild, top_role=role(guild, 4, 1))
+    below, above = role(guild, 5, 4), role(guild, 6, 7)
+    assert role_grant_refusal(mod, below) is None, "A role below the member's own should be allowed"
+    assert role_grant_refusal(mod, above) is not None, "A role above the member's own should be refused"
+    assert role_grant_refusal(mod, mod.top_role) is not None, "The member's own top role should be refused"
+    assert role_grant_refusal(owner, above) is None, "The owner can hand out any role the bot can assign"
+    assert role_grant_refusal(owner, role(guild, 7, 11)) is not None, "Roles above the bot should be refused"
+    for permissions in (discord.Permissions(administrator=True), discord.Permissions(manage_roles=True),
+                        discord.Permissions(manage_messages=True)):
+        assert role_grant_refusal(owner, role(guild, 8, 3, permissions.value)) is not None, \
+            "Roles with moderation powers should never be handed out"
+    assert role_grant_refusal(mod, role(guild, 9, 3, discord.Permissions(send_messages=True).value)) is None
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_index()
+    test_batcher()
+    test_owned_rows()
+    test_role_grant_refusal()
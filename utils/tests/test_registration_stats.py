@@ -0,0 +1,108 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests how registration writes move the registration counters, and how the counters are read back"""
+import asyncio
+from typing import Any, Dict, List, Tuple
+from database import db_io
+from database.db_io import RegistrationStats
+from database.makedb import Registration as DbReg
+from utils import enums
+
+
+def entry(**fields: Any) -> DbReg:
+    """A registration that is never added to a session"""
+    defaults: Dict[str, Any] = {"gender": enums.Gender.MALE, "sexuality": enums.Sexuality.GAY,
+                                "position": None, "dms": enums.Dms.ASK, "relationship": None}
+    defaults.update(fields)
+    return DbReg(user_id=1, **defaults)
+
+
+class FakeSession:
+    """Answers the stats query from an in-memory counter table, the way the registration_stats rows would"""
+    def __init__(self, counters: Dict[Tuple[str, str], int]) -> None:
+        self.counters = counters
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        return None
+
+    async def execute(self, statement: Any) -> List[Tuple[str, str, int]]:
+        # The only parameter of the stats query is the list of fields it asked for
+        fields = next(iter(statement.compile().params.values()))
+        return [(field, value, count) for (field, value), count in self.counters.items() if field in fields]
+
+
+def apply(counters: Dict[Tuple[str, str], int], changes: Dict[Tuple[str, str], int]) -> None:
+    """Adds the changes the way the upsert in adjust does"""
+    for key, delta in changes.items():
+        counters[key] = counters.get(key, 0) + delta
+
+
+def test_snapshot() -> None:
+    """Tests that a snapshot holds plain strings for every counted field, None where nothing was picked"""
+    snapshot = RegistrationStats.snapshot(entry(position="top"))
+    assert snapshot == {"gender": "male", "sexuality": "gay", "position": "top", "dms": "ask",
+                        "relationship": None}, snapshot
+    print("All tests passed!")
+
+
+def test_deltas() -> None:
+    """Tests the counter changes for registering, updating and deleting"""
+    user = entry()
+    registered = RegistrationStats.deltas(None, user)
+    assert registered == {("gender", "male"): 1, ("sexuality", "gay"): 1, ("dms", "ask"): 1}, \
+        "Registering should count every field that was picked"
+
+    before = RegistrationStats.snapshot(user)
+    user.sexuality = enums.Sexuality.BISEXUAL
+    user.relationship = enums.Relationship.SINGLE
+    updated = RegistrationStats.deltas(before, user)
+    assert updated == {("sexuality", "gay"): -1, ("sexuality", "bisexual"): 1, ("relationship", "single"): 1}, \
+        "An update should move only the fields that changed"
+
+    before = RegistrationStats.snapshot(user)
+    assert RegistrationStats.deltas(before, user) == {}, "An update that changes nothing should change no counters"
+    user.dms = None
+    assert RegistrationStats.deltas(before, user) == {("dms", "ask"): -1}, "Clearing a field should uncount it"
+
+    before = RegistrationStats.snapshot(user)
+    deleted = RegistrationStats.deltas(before, None)
+    assert deleted == {("gender", "male"): -1, ("sexuality", "bisexual"): -1, ("relationship", "single"): -1}, \
+        "Deleting should uncount everything the entry still had"
+    print("All tests passed!")
+
+
+def test_get_stats() -> None:
+    """Tests that a register, update and delete leave the counters where a recount would, with every value listed"""
+    counters: Dict[Tuple[str, str], int] = {}
+    first, second = entry(), entry(gender=enums.Gender.FEMALE)
+    apply(counters, RegistrationStats.deltas(None, first))
+    apply(counters, RegistrationStats.deltas(None, second))
+    before = RegistrationStats.snapshot(first)
+    first.gender = enums.Gender.FEMALE
+    apply(counters, RegistrationStats.deltas(before, first))
+    apply(counters, RegistrationStats.deltas(RegistrationStats.snapshot(second), None))
+
+    original = db_io.read_session_factory
+    db_io.read_session_factory = lambda: FakeSession(counters) # type: ignore
+    try:
+        stats = asyncio.run(RegistrationStats.get_stats())
+        gender = asyncio.run(RegistrationStats.get_stats("gender"))
+    finally:
+        db_io.read_session_factory = original
+    assert set(stats) == set(RegistrationStats.FIELDS)
+    assert stats["gender"]["female"] == 1 and stats["gender"]["male"] == 0, "The update should have moved the count"
+    assert stats["sexuality"]["gay"] == 1 and stats["dms"]["ask"] == 1, "The delete should have uncounted its fields"
+    assert set(stats["gender"]) == {member.value for member in enums.Gender}, "Unpicked values should show as 0"
+    assert list(gender) == ["gender"], "Asking for one field should only return that field"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_snapshot()
+    test_deltas()
+    test_get_stats()
@@ -0,0 +1,47 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""
+This file tests read replica routing, it needs two local Postgres instances, e.g.
+DATABASE_PORT=5432 REPLICA_HOSTS=localhost:5433
+Both instances only need to be reachable, the test asks each one which port it is serving on.
+"""
+import asyncio
+import logging
+import os
+from sqlalchemy import select, func, text
+from database.makedb import session_factory, read_session_factory, replica_engines, pool_stats
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def served_by(factory) -> int: # type: ignore
+    """Gets the port of the server that answered a plain SELECT"""
+    async with factory() as session:
+        return int((await session.execute(select(func.inet_server_port()))).scalar_one())
+
+
+async def test_replica_routing() -> None:
+    """Function to test that reads go to the replica and writes pin the task to the primary"""
+    assert replica_engines, "Set REPLICA_HOSTS to run this test"
+    primary_port = int(os.getenv("DATABASE_PORT", "5432"))
+    replica_ports = {engine.url.port for engine in replica_engines}
+
+    assert await served_by(session_factory) == primary_port, "Normal sessions should use the primary"
+    assert await served_by(read_session_factory) in replica_ports, "Read only sessions should use a replica"
+
+    async with read_session_factory() as session:
+        await session.execute(text("SELECT 1"))  # Anything that isn't a SELECT counts as a write
+    assert await served_by(read_session_factory) == primary_port, "Reads after a write should stay on the primary"
+
+    # A fresh task has its own context, so it is back on the replica
+    assert await asyncio.create_task(served_by(read_session_factory)) in replica_ports, \
+        "Other tasks shouldn't be pinned by this task's write"
+    logger.info("Pool stats: %s", pool_stats())
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_replica_routing())
@@ -0,0 +1,62 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the tests for the level reward table and the per-member role diff"""
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from utils.level_curve import LevelCurve
+from utils.role_reconcile import RewardTable, RoleReconciler
+
+# 100 XP per level, so level n starts at n * 100 XP
+CURVE = LevelCurve("flat", 0, 0, 100, max_level=50)
+UNASSIGNABLE = 99
+
+
+def role(role_id: int) -> Any:
+    """A role the bot can hand out unless it is the unassignable one"""
+    return SimpleNamespace(id=role_id, is_assignable=lambda: role_id != UNASSIGNABLE)
+
+
+def member(*role_ids: int) -> Any:
+    """A member holding these roles"""
+    return SimpleNamespace(roles=[role(role_id) for role_id in role_ids])
+
+
+def reconciler(rewards: Dict[int, int], guild_roles: List[int]) -> RoleReconciler:
+    """A reconciler for a guild with these roles, nothing in the diff touches Discord or the database"""
+    guild = SimpleNamespace(id=1, roles=[role(role_id) for role_id in guild_roles])
+    return RoleReconciler(guild, rewards, CURVE) # type: ignore
+
+
+def test_reward_table() -> None:
+    """Tests that rewards stack up to the member's level, whatever order they were set in"""
+    table = RewardTable({20: 12, 5: 10, 10: 11})
+    assert table.levels == [5, 10, 20], "Levels should be sorted for the bisect"
+    assert table.target(0) == set() and table.target(4) == set(), "Nothing below the first reward"
+    assert table.target(5) == {10}, "A reward is given at exactly its level"
+    assert table.target(15) == {10, 11}, "Rewards stack"
+    assert table.target(1000) == {10, 11, 12}
+    assert table.all_role_ids == {10, 11, 12}
+    assert RewardTable({}).target(50) == set()
+    print("All tests passed!")
+
+
+def test_diff() -> None:
+    """Tests that only reward roles are compared and members who already match are skipped"""
+    job = reconciler({5: 10, 10: 11, 20: UNASSIGNABLE}, guild_roles=[10, 11, 50, UNASSIGNABLE])
+    assert job.rewards.all_role_ids == {10, 11}, "Rewards the bot can't assign should be left out"
+
+    assert job.diff(member(), 499) is None, "Below the first reward with no roles is already correct"
+    assert job.diff(member(), 500) == ({10}, set()), "Reaching a reward level should add its role"
+    assert job.diff(member(10, 50), 1500) == ({11}, set()), "Rewards stack and other roles are ignored"
+    assert job.diff(member(10, 11, 50), 1500) is None, "A member with the right roles needs no edit"
+    assert job.diff(member(10, 11), 700) == (set(), {11}), "Roles above the member's level should be removed"
+    assert job.diff(member(11), 0) == (set(), {11})
+    assert job.diff(member(10, 11, UNASSIGNABLE), 5000) is None, "Unassignable rewards should never show up"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_reward_table()
+    test_diff()
@@ -0,0 +1,43 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the tests for the duplicate message spam detector"""
+from utils.spam_detector import SpamDetector
+
+GUILD_ID = 123456789
+
+
+def test_spam_detector() -> None:
+    """Tests tripping, window expiry and the memory bound"""
+    detector = SpamDetector(window_seconds=10, author_threshold=3, max_entries=50, withhold_seconds=60)
+
+    assert detector.observe(GUILD_ID, 1, "JOIN MY SERVER discord.gg/raid", now=0) is None
+    assert detector.observe(GUILD_ID, 1, "join my  server discord.gg/raid", now=1) is None
+    assert detector.observe(GUILD_ID, 2, "j̵o̵i̵n̵ my server discord.gg/raid", now=2) is None
+    hit = detector.observe(GUILD_ID, 3, "Join my server discord.gg/raid", now=3)
+    assert hit is not None and hit.first_trip, "Three distinct authors should trip the detector"
+    assert hit.author_ids == {1, 2, 3}, "Every author in the wave should be reported"
+    assert detector.is_flagged(GUILD_ID, 2, now=4), "Spammers should have XP withheld"
+    assert not detector.is_flagged(GUILD_ID, 4, now=4), "Other users should not be flagged"
+
+    follow_up = detector.observe(GUILD_ID, 4, "join my server discord.gg/raid", now=5)
+    assert follow_up is not None and not follow_up.first_trip and follow_up.author_ids == {4}
+
+    assert detector.observe(GUILD_ID, 5, "join my server discord.gg/raid", now=100) is None, \
+        "The window should have expired"
+    assert not detector.is_flagged(GUILD_ID, 1, now=100), "Flags should expire"
+
+    for i in range(1000):
+        detector.observe(GUILD_ID, i, f"unique message number {i}", now=200 + i / 1000)
+    window = detector._guilds[GUILD_ID] # pylint: disable=W0212
+    assert len(window.entries) == 50, "The window should never grow past max_entries"
+    assert len(window.authors) == 50, "Evicted fingerprints should be dropped"
+
+    detector.prune(now=1000)
+    assert GUILD_ID not in detector._guilds # pylint: disable=W0212
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_spam_detector()
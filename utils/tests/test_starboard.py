@@ -0,0 +1,68 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the tests for the starboard cache and how the cog writes it out"""
+import asyncio
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from cogs import starboard
+from utils.starboard import StarboardCache, StarState
+
+GUILD_ID = 123456789
+
+
+def test_starboard_cache() -> None:
+    """Tests that a reaction storm costs a bounded number of writes and edits"""
+    cache = StarboardCache(max_messages=3, edit_interval=10)
+    state = cache.put(StarState(1, GUILD_ID, 2, 3))
+    writes = edits = 0
+    for second in range(60):
+        for _ in range(100):  # 100 reactions a second on one message
+            cache.apply(state, 1)
+        if second % 5 == 0:  # The cog flushes every 5 seconds
+            writes += len(cache.take_db_dirty())
+            for due in cache.take_due_posts({GUILD_ID: 3}, now=second):
+                due.star_message_id = due.star_message_id or 99
+                edits += 1
+    assert state.stars == 6000
+    assert writes == 12, "One write per flush"
+    assert edits == 6, "One edit per edit interval"
+
+    quiet = cache.put(StarState(2, GUILD_ID, 2, 3))
+    cache.apply(quiet, 1)
+    assert quiet not in cache.take_due_posts({GUILD_ID: 3}, now=100), "Under the threshold should not be posted"
+
+    cache.take_db_dirty()
+    cache.take_due_posts({GUILD_ID: 3}, now=1000)
+    for message_id in range(10, 15):
+        cache.put(StarState(message_id, GUILD_ID, 2, 3))
+    assert len(cache) == 3, "Clean states should be evicted past the limit"
+    print("All tests passed!")
+
+
+def test_chunked_flush() -> None:
+    """Tests that a big flush is split into statements under the parameter limit and only failed chunks retry"""
+    cog = starboard.Starboard(SimpleNamespace()) # type: ignore
+    for message_id in range(2500):
+        cog.cache.apply(cog.cache.put(StarState(message_id, GUILD_ID, 2, 3)), 1)
+    writes: List[int] = []
+
+    async def upsert_entries(entries: List[Dict[str, Optional[int]]]) -> bool:
+        writes.append(len(entries))
+        return len(writes) != 2  # The second chunk fails
+    original = starboard.StarboardDb.upsert_entries
+    starboard.StarboardDb.upsert_entries = upsert_entries # type: ignore
+    try:
+        asyncio.run(cog._flush()) # pylint: disable=W0212
+    finally:
+        starboard.StarboardDb.upsert_entries = original # type: ignore
+    assert writes == [starboard.UPSERT_CHUNK, starboard.UPSERT_CHUNK, 500], writes
+    retried = sorted(state.message_id for state in cog.cache.take_db_dirty())
+    assert retried == list(range(1000, 2000)), "Only the failed chunk should be written again"
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_starboard_cache()
+    test_chunked_flush()
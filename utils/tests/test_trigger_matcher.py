@@ -0,0 +1,94 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file tests the custom command trigger matcher and who the trigger listener answers"""
+import asyncio
+from types import SimpleNamespace
+from typing import Any, List
+from cogs import custom_commands
+from utils.eligibility import UserFlags
+from utils.trigger_matcher import TriggerMatcher
+
+
+def brute_force(triggers: list[str], text: str) -> set[str]:
+    """Checks every trigger one by one, the matcher has to agree with this"""
+    words = f" {' '.join(text.casefold().split())} "
+    found = set()
+    for trigger in triggers:
+        for i in range(len(words)):
+            if words.startswith(trigger, i) and not words[i - 1].isalnum() and \
+                    (i + len(trigger) >= len(words) or not words[i + len(trigger)].isalnum()):
+                found.add(trigger)
+    return found
+
+
+def test_trigger_matcher() -> None:
+    """Tests matching, whole words, overlaps and incremental edits"""
+    matcher = TriggerMatcher(["hello", "he", "good morning", "she sells"])
+    assert matcher.find("Hello there") == ["hello"], "Should match case insensitively"
+    assert matcher.find("shell") == [], "Triggers inside other words shouldn't match"
+    assert set(matcher.find("she sells he")) == {"she sells", "he"}, "Overlapping triggers should all match"
+    assert matcher.first("GOOD   morning all") == "good morning", "Whitespace should be collapsed"
+
+    matcher.discard("hello")
+    assert matcher.find("hello") == [], "Removed triggers shouldn't match"
+    matcher.add("hell")
+    assert matcher.find("hell hello") == ["hell"], "Added triggers should match right away"
+    assert "hell" in matcher and len(matcher) == 4, "Membership and size should follow edits"
+
+    triggers = ["a", "ab", "bab", "bc", "bca", "c", "caa", "abc"]
+    matcher = TriggerMatcher(triggers)
+    for text in ("abccab", "a b c", "bab bca", "caa abc ab", "xyz"):
+        assert set(matcher.find(text)) == brute_force(triggers, text), f"Mismatch for {text!r}"
+
+    for trigger in triggers[:6]:
+        matcher.discard(trigger)  # Enough dead nodes to force a compaction
+    assert set(matcher.find("caa abc a")) == {"caa", "abc"}, "Compaction should keep the live triggers"
+    print("All tests passed!")
+
+
+def test_trigger_listener() -> None:
+    """Tests that blacklisted users get no reply and a repeated trigger waits out the channel cooldown"""
+    sent: List[Any] = []
+
+    class Outbound:
+        """Records what the cog sends"""
+        async def send(self, target: Any, priority: Any, **kwargs: Any) -> None: # pylint: disable=W0613
+            sent.append(target)
+
+    async def get_flags(user_id: int) -> UserFlags:
+        return UserFlags.KNOWN | UserFlags.BLACKLISTED if user_id == 2 else UserFlags.KNOWN
+
+    async def get_custom_command(guild_id: int, name: str) -> Any: # pylint: disable=W0613
+        return SimpleNamespace(name=name, nsfw=False, text="hi", image_hash=None)
+
+    def message(user_id: int, channel_id: int) -> Any:
+        return SimpleNamespace(guild=SimpleNamespace(id=1), author=SimpleNamespace(id=user_id, bot=False),
+                               content="well hello there", channel=SimpleNamespace(id=channel_id))
+
+    cog = custom_commands.CustomCommands(SimpleNamespace(outbound=Outbound())) # type: ignore
+    cog._triggers[1] = custom_commands._GuildTriggers({"hello": "greet"}) # pylint: disable=W0212
+    originals = custom_commands.get_flags, custom_commands.CcDb.get_custom_command
+    custom_commands.get_flags = get_flags # type: ignore
+    custom_commands.CcDb.get_custom_command = get_custom_command # type: ignore
+
+    async def run() -> None:
+        await cog.on_message(message(2, 10))
+        assert not sent, "Blacklisted users shouldn't get a reply"
+        await cog.on_message(message(1, 10))
+        await cog.on_message(message(3, 10))
+        assert len(sent) == 1, "A trigger shouldn't fire again in the same channel inside the cooldown"
+        await cog.on_message(message(3, 11))
+        assert len(sent) == 2, "Other channels have their own cooldown"
+
+    try:
+        asyncio.run(run())
+    finally:
+        custom_commands.get_flags, custom_commands.CcDb.get_custom_command = originals # type: ignore
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    test_trigger_matcher()
+    test_trigger_listener()
@@ -0,0 +1,125 @@
+# Copyright (c) 2025 SpiritTheWalf and Cytanix
+#
+# This work is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License.
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/ or see the LICENSE file.
+"""This file contains the keyword matcher for custom command triggers"""
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from utils.anti_zalgo import normalise_text
+
+
+class TriggerMatcher:
+    """
+    Aho-Corasick automaton over a guild's triggers, so a message is checked against every trigger in a
+    single pass that is linear in the message length.
+    Adding or removing a trigger only touches its own path in the trie, the failure links are rebuilt lazily
+    on the next match, which costs the total trigger length of this one guild. Triggers only match whole words.
+    """
+    __slots__ = ("_goto", "_fail", "_out", "_terminal", "_triggers", "_dirty", "_dead")
+
+    def __init__(self, triggers: Iterable[str] = ()) -> None:
+        self._reset()
+        for trigger in triggers:
+            self.add(trigger)
+
+    def _reset(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+        self._terminal: List[Optional[str]] = [None]
+        self._triggers: Set[str] = set()
+        self._dirty = False
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._triggers)
+
+    def __contains__(self, trigger: str) -> bool:
+        return normalise_text(trigger) in self._triggers
+
+    def add(self, trigger: str) -> None:
+        """Adds a trigger, matching ignores case, zalgo and repeated whitespace"""
+        trigger = normalise_text(trigger)
+        if not trigger or trigger in self._triggers:
+            return
+        node = 0
+        for char in trigger:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._terminal.append(None)
+            node = child
+        self._terminal[node] = trigger
+        self._triggers.add(trigger)
+        self._dirty = True
+
+    def discard(self, trigger: str) -> None:
+        """Removes a trigger if it is there, its nodes are only reclaimed once enough of the trie is dead"""
+        trigger = normalise_text(trigger)
+        if trigger not in self._triggers:
+            return
+        node = 0
+        for char in trigger:
+            node = self._goto[node][char]
+        self._terminal[node] = None
+        self._triggers.discard(trigger)
+        self._dead += len(trigger)
+        self._dirty = True
+        if self._dead > len(self._goto) // 2:
+            remaining = self._triggers
+            self._reset()
+            for kept in remaining:
+                self.add(kept)
+
+    def _build(self) -> None:
+        """Recomputes failure links and outputs breadth first"""
+        goto, fail, out, terminal = self._goto, self._fail, self._out, self._terminal
+        queue: deque[int] = deque()
+        for child in goto[0].values():
+            fail[child] = 0
+            word = terminal[child]
+            out[child] = (word,) if word else ()
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                link = goto[state].get(char, 0)
+                fail[child] = link if link != child else 0
+                word = terminal[child]
+                own: Tuple[str, ...] = (word,) if word else ()
+                out[child] = own + out[fail[child]]
+                queue.append(child)
+        self._dirty = False
+
+    def find(self, text: str) -> List[str]:
+        """Gets every trigger found in the text as a whole word, in the order they end"""
+        if not self._triggers:
+            return []
+        if self._dirty:
+            self._build()
+        text = normalise_text(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        found: List[str] = []
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for trigger in out[node]:
+                start = end - len(trigger) + 1
+                if (start == 0 or not text[start - 1].isalnum()) and \
+                        (end + 1 == len(text) or not text[end + 1].isalnum()):
+                    found.append(trigger)
+        return found
+
+    def first(self, text: str) -> Optional[str]:
+        """Gets the first trigger found in the text"""
+        found = self.find(text)
+        return found[0] if found else None